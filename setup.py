@@ -14,6 +14,7 @@ setuptools.setup(
     author_email="zadka.moshe@gmail.com",
     packages=setuptools.find_packages(where='src'),
     package_dir={"": "src"},
+    python_requires='>=3.7',
     install_requires=['attrs', 'incremental', 'pyrsistent',
-                      'typing; python_version=="2.7"'],
+                      'tomli; python_version<"3.11"'],
 )
@@ -4,10 +4,35 @@ Captain arguments -- ready for subcommand!
 A more functional way of doing argument parsing.
 """
 
-from caparg._api import command, option, positional, options, ParseError
-from caparg._version import __version__ as _my_version
+from caparg._api import (command, option, positional, options, lazy,
+                         load_cached, ParseError, InvalidCommand)
 
-__version__ = _my_version.short()
+# Loaded on first use, so importing caparg stays cheap
+_LAZY = dict(
+    register_converter=('caparg._converters', 'register_converter'),
+    add_observer=('caparg._instrument', 'add_observer'),
+    remove_observer=('caparg._instrument', 'remove_observer'),
+    collect_timings=('caparg._instrument', 'collect_timings'),
+)
 
-__all__ = ['command', 'option', 'positional', 'options', 'ParseError',
+
+def __getattr__(name):
+    if name == '__version__':
+        from caparg._version import __version__ as my_version
+        value = my_version.short()
+    elif name in _LAZY:
+        import importlib
+        module_name, attribute = _LAZY[name]
+        value = getattr(importlib.import_module(module_name), attribute)
+    else:
+        raise AttributeError(name)
+    globals()[name] = value
+    return value
+
+
+# The names loaded by __getattr__ are not defined until first use
+# pylint: disable=undefined-all-variable
+__all__ = ['command', 'option', 'positional', 'options', 'lazy',
+           'load_cached', 'ParseError', 'InvalidCommand', 'add_observer',
+           'remove_observer', 'collect_timings', 'register_converter',
            '__version__']
@@ -4,18 +4,53 @@ Implementation of argument parsing.
 Should not be imported directly by user code.
 """
 
-import argparse
-import typing
+import importlib
+import itertools
+import threading
+import weakref
 
 import attr
-import pyrsistent
+
+from caparg import _result
 
 
 def _convert(name):
-    return pyrsistent.pvector(name.replace('_', '-').split())
+    return tuple(name.replace('_', '-').split())
+
+
+_COMPILED = weakref.WeakKeyDictionary()
+_VALIDATED = weakref.WeakKeyDictionary()
+_COMPILED_LOCK = threading.Lock()
+
+
+def _check_engine(_instance, _attribute, value):
+    _get_engine(value)
 
 
 @attr.s(frozen=True)
+class _Settings(object):
+
+    """
+    Settings of a command, which are not options
+    """
+
+    engine = attr.ib(default='argparse', validator=_check_engine)
+    response_files = attr.ib(default=False)
+    parser_cache_size = attr.ib(default=256)
+    result_cache_size = attr.ib(default=0)
+    result_cache_bytes = attr.ib(default=None)
+    env_prefix = attr.ib(default=None)
+    config_files = attr.ib(default=(), converter=tuple)
+
+    @property
+    def sources(self):
+        """
+        Whether options can come from outside the command line
+        """
+        return self.env_prefix is not None or bool(self.config_files)
+
+
+@attr.s(frozen=True, cache_hash=True)
 class _Command(object):
 
     """
@@ -25,6 +60,8 @@ class _Command(object):
     _name = attr.ib()
     _args = attr.ib()
     _options = attr.ib()
+    _settings = attr.ib(default=attr.Factory(_Settings))
+    _handler = attr.ib(default=None)
 
     def rename(self, new_name):
         """
@@ -32,15 +69,99 @@ class _Command(object):
         """
         return attr.evolve(self, name=_convert(new_name))
 
-    def _make_parser(self):
-        my_options = self._options
-        subcommands = pyrsistent.m()
-        for thing in self._args:
-            my_options += thing.get_options()
-        for thing in self._args:
-            for name, subcommand in thing.add_to(self._name, my_options):
-                subcommands = subcommands.set(name, subcommand)
-        return _Parser(subcommands)
+    def _make_parser(self, problems=None):
+        # Subcommand names are only made persistent vectors when compiling,
+        # so declaring commands does not import pyrsistent
+        import pyrsistent
+        from caparg import _parser
+        root_name = pyrsistent.pvector(self._name)
+        my_options = _parser.OptionChain(None,
+                                         self._options).extend(self._args)
+        trie = _parser.TrieNode()
+        entries = itertools.chain.from_iterable(
+            thing.add_to(root_name, my_options) for thing in self._args)
+        if problems is not None:
+            entries = _parser.check_entries(entries, problems, set(),
+                                            set())
+        for name, entry in entries:
+            trie.insert(name, name, entry)
+        return _parser.Parser(trie, self._settings)
+
+    def compile(self):
+        """
+        Compile into a reusable parser
+
+        The result is memoized: commands are immutable, so
+        compiling the same command again returns the same parser.
+
+        Returns:
+            something with parse_args
+        """
+        with _COMPILED_LOCK:
+            parser = _COMPILED.get(self)
+        if parser is None:
+            # Built outside the lock: loading lazy subcommands
+            # runs plugin code, which may compile commands too
+            parser = self._make_parser()
+            with _COMPILED_LOCK:
+                parser = _COMPILED.setdefault(self, parser)
+        return parser
+
+    def validate(self):
+        """
+        Check the whole tree, and compile it
+
+        All subcommands are checked, in one pass,
+        and every conflict is reported:
+        subcommands declared twice,
+        options and positionals with the same name in a subcommand,
+        and options and positionals which cannot be parsed.
+        Lazy subcommands are loaded, so they can be checked.
+
+        The result is memoized, and is also what :code:`compile` returns,
+        so the tree is only checked once.
+
+        Returns:
+            something with parse_args
+
+        Raises:
+            InvalidCommand: the tree has conflicts
+        """
+        with _COMPILED_LOCK:
+            parser = _VALIDATED.get(self)
+        if parser is None:
+            problems = []
+            parser = self._make_parser(problems)
+            if problems:
+                raise InvalidCommand(tuple(problems))
+            with _COMPILED_LOCK:
+                parser = _COMPILED[self] = _VALIDATED.setdefault(self,
+                                                                 parser)
+        return parser
+
+    def compile_cached(self, path):
+        """
+        Compile into a reusable parser, through a cache file
+
+        If the file has the compiled table of this command,
+        the parser is loaded from it.
+        Otherwise, the command is compiled, and the table saved to the file.
+        Like :code:`compile`, the result is memoized.
+
+        Args:
+            path (str): the cache file
+
+        Returns:
+            something with parse_args
+        """
+        from caparg import _cache
+        with _COMPILED_LOCK:
+            parser = _COMPILED.get(self)
+        if parser is None:
+            parser = _cache.compile_cached(self, path)
+            with _COMPILED_LOCK:
+                parser = _COMPILED.setdefault(self, parser)
+        return parser
 
     def get_options(self):
         """
@@ -49,7 +170,7 @@ class _Command(object):
         Returns:
             empty immutable iterable
         """
-        return pyrsistent.v()
+        return ()
 
     def add_to(self, parent_name, my_options):
         """
@@ -57,32 +178,155 @@ class _Command(object):
 
         Args:
             parent_name (List[str]): name of parent
-            my_options (Dict[str,thing]): inherited options
+            my_options (caparg._parser.OptionChain): inherited options
 
         Returns:
-           a tuple: (full_name, options)
+           a tuple: (full_name, entry with options)
         """
+        from caparg import _parser
         full_name = parent_name + self._name
+        my_options = my_options.extend(self._args)
         for thing in self._args:
-            my_options += thing.get_options()
-        for thing in self._args:
-            for name, suboptions in thing.add_to(full_name, my_options):
-                yield name, suboptions
+            for name, entry in thing.add_to(full_name, my_options):
+                yield name, entry
         if self._name:
-            yield full_name, my_options + self._options
+            yield full_name, _parser.Entry(my_options, self._options,
+                                           self._handler)
 
     def parse(self, args):
         """
         Parse command-line
 
         Args:
-            args (List[str]): command-line arguments
+            args (Iterable[str]): command-line arguments
 
         Returns:
             immutable map with __caparg_subcommand__ as one of the keys
         """
-        parser = self._make_parser()
-        return parser.parse_args(args)
+        return self.compile().parse_args(args)
+
+    def dispatch(self, args):
+        """
+        Parse command-line, and run the subcommand's handler
+
+        Args:
+            args (Iterable[str]): command-line arguments
+
+        Returns:
+            whatever the handler returns
+        """
+        return self.compile().dispatch(args)
+
+    def parse_many(self, argvs, processes=None, chunksize=256):
+        """
+        Parse many command-lines
+
+        Invalid command-lines do not stop the stream:
+        their :code:`ParseError` is returned in their place,
+        as is any other error parsing them.
+
+        Args:
+            argvs (Iterable[List[str]]): command-lines
+            processes (int): if given, parse in a pool of this many
+                             processes (0 means one per core)
+            chunksize (int): command-lines sent to a process at a time
+
+        Returns:
+            iterator of immutable maps or exceptions
+            (usually :code:`ParseError` instances)
+        """
+        from caparg import _batch
+        return _batch.parse_many(self, argvs, processes, chunksize)
+
+    def complete(self, words):
+        """
+        Complete a partial command line
+
+        Args:
+            words (List[str]): the arguments so far,
+                               the last of which is being completed
+                               (an empty string to complete a new one)
+
+        Returns:
+            a named tuple of candidate subcommand :code:`words`,
+            candidate :code:`options` (including inherited ones),
+            and the name of the :code:`positional` being completed
+            (or None)
+        """
+        return self.compile().complete(words)
+
+    def completion_script(self, shell, prog, index_path):
+        """
+        A shell completion script
+
+        The script completes from an index file,
+        without running the command-line tool.
+        The index is (re)written if it is not the index of this command.
+
+        Args:
+            shell (str): :code:`'bash'` or :code:`'zsh'`
+            prog (str): the name of the command-line tool
+            index_path (str): where to save the index
+
+        Returns:
+            the script, to be sourced by the shell
+        """
+        from caparg import _cache, _complete
+        # pylint: disable=protected-access
+        _complete.write_index(self.compile()._trie, _cache.fingerprint(self),
+                              index_path)
+        return _complete.script(shell, prog, index_path)
+
+    def service(self, workers=4, processes=False, max_pending=1024,
+                batch_size=64):
+        """
+        A parsing service for asyncio applications
+
+        Coroutines :code:`await service.parse(args)`;
+        their command lines are parsed in batches, in a pool of workers.
+        Each worker has its own compiled parser,
+        so concurrent parses share no argparse state.
+
+        Args:
+            workers (int): how many worker threads or processes
+            processes (bool): whether the workers are processes
+            max_pending (int): how many command lines can wait to be parsed
+                               before submitting more waits
+            batch_size (int): most command lines sent to a worker at once
+
+        Returns:
+            a :code:`ParseService`, which should be closed when done
+        """
+        from caparg import _service
+        return _service.ParseService(self, workers, processes, max_pending,
+                                     batch_size)
+
+    def server(self, path, workers=4, idle_timeout=10):
+        """
+        A server answering parse and dispatch requests on a Unix socket
+
+        Tools invoked many times, such as by shell scripts,
+        can send their command lines to a long-lived server
+        instead of starting Python, importing caparg
+        and building the command tree each time.
+        Clients run :code:`caparg/_client.py SOCKET parse ARGS...`
+        (or :code:`dispatch`), which only imports the standard library,
+        and print the result as JSON.
+
+        Args:
+            path (str): where to create the socket
+            workers (int): how many worker threads,
+                           each with its own compiled parser
+            idle_timeout (float): seconds a connection can be idle
+                                  before it is closed,
+                                  so idle clients do not keep workers
+
+        Returns:
+            a :code:`socketserver` server, with :code:`serve_forever`,
+            :code:`shutdown` and :code:`server_close`
+        """
+        from caparg import _server
+        return _server.ParseServer(self, path, workers, idle_timeout)
 
 
 @attr.s(frozen=True)
@@ -94,50 +338,56 @@ class ParseError(ValueError):
 
     message = attr.ib()
 
+    def __reduce__(self):
+        return ParseError, (self.message,)
 
-class _RaisingArgumentParser(argparse.ArgumentParser):
 
-    def error(self, message):
-        raise ParseError(message)
+@attr.s(frozen=True)
+class InvalidCommand(ValueError):
 
+    """
+    A command tree has conflicts
 
-@attr.s(frozen=True)
-class _Parser(object):
+    Attributes:
+        problems (Tuple[str]): every conflict found
+    """
 
-    _subcommands = attr.ib()
+    problems = attr.ib()
 
-    def parse_args(self, args):
-        """
-        Parse arguments
+    def __reduce__(self):
+        return InvalidCommand, (self.problems,)
 
-        Args:
-            args (List[str]): command-line arguments
+    def __str__(self):
+        return '\n'.join(self.problems)
 
-        Returns:
-            immutable map, where one of the keys is __caparg_subcommand__
-        """
-        args = pyrsistent.pvector(args)
-        candidates = [i
-                      for i in range(1, len(args)+1)
-                      if args[:i] in self._subcommands]
-        if not candidates:
-            raise ParseError(self._make_help())
-        parts = max(candidates)
-        subcommand, rest = self._subcommands[args[:parts]], args[parts:]
-        parser = _RaisingArgumentParser(' '.join(args[:parts]))
-        for thing in subcommand:
-            thing.add_argument(parser)
-        namespace = parser.parse_args(rest)
-        ret = pyrsistent.m(__caparg_subcommand__=args[:parts])
-        for thing in subcommand:
-            ret = ret.update(thing.get_value(namespace))
-        return ret
 
-    def _make_help(self):
-        parts = ["Usage:\n"]
-        for key in sorted(self._subcommands):
-            parts.append("    " + " ".join(key) + "\n")
-        return ''.join(parts)
+def _prepare_parser(name, subcommand):
+    from caparg import _argparse
+    return _argparse.prepare(name, subcommand)
+
+
+def _prepare_native(name, subcommand):
+    from caparg import _native
+    return _native.prepare(name, subcommand)
+
+
+def _prepare_codegen(name, subcommand):
+    from caparg import _codegen
+    return _codegen.prepare(name, subcommand)
+
+
+_ENGINES = {
+    'argparse': _prepare_parser,
+    'native': _prepare_native,
+    'codegen': _prepare_codegen,
+}
+
+
+def _get_engine(name):
+    try:
+        return _ENGINES[name]
+    except KeyError:
+        raise ValueError("unknown engine", name)
 
 
 @attr.s(frozen=True)
@@ -164,7 +414,63 @@ class _PreOption(object):
         _required = attr.ib()
         _have_default = attr.ib()
         _name = attr.ib()
-        _MISSING = object()
+
+        @property
+        def name(self):
+            """
+            The name of the option
+            """
+            return self._name
+
+        def usage(self):
+            """
+            Usage fragment for the option
+
+            Returns:
+                a string, like :code:`[--name NAME]`
+            """
+            opt_name = '--' + self._name.replace('_', '-')
+            if self._type == bool:
+                return '[{}]'.format(opt_name)
+            ret = '{} {}'.format(opt_name, self._name.upper())
+            if getattr(self._type, '__origin__', None) in (list, dict):
+                ret += ' ...'
+            if not self._required:
+                ret = '[{}]'.format(ret)
+            return ret
+
+        def problems(self):
+            """
+            Why the option cannot be parsed
+
+            Returns:
+                list of problems, empty if there are none
+            """
+            from caparg import _converters
+            if self._type == bool:
+                return []
+            description = 'option --' + self._name.replace('_', '-')
+            try:
+                conversion = _converters.for_type(self._type)
+            except NotImplementedError:
+                return ['{}: no converter for {!r}'.format(
+                    description, self._type)]
+            if self._have_default and conversion.default is None:
+                return ['{}: {!r} has no default'.format(
+                    description, self._type)]
+            return []
+
+        def add_completion(self, record):
+            """
+            Add ourselves to a completion index record
+
+            Args:
+                record (dict): the record of the subcommand
+            """
+            opt_name = '--' + self._name.replace('_', '-')
+            record['options'].append(opt_name)
+            if self._type != bool:
+                record['values'].append(opt_name)
 
         def add_argument(self, parser):
             """
@@ -173,20 +479,60 @@ class _PreOption(object):
             Args:
                 parser (argparse.ArgumentParser): the parser to add to
             """
+            from caparg import _converters
             opt_name = '--' + self._name.replace('_', '-')
-            if self._type == str:
-                parser.add_argument(opt_name,
-                                    type=str,
-                                    required=self._required,
-                                    default=self._MISSING)
-            elif self._type == bool:
+            if self._type == bool:
                 parser.add_argument(opt_name, action='store_true',
                                     default=False)
-            elif self._type == typing.List[str]:
+            elif _converters.for_type(self._type).collect:
                 parser.add_argument(opt_name, action='append')
             else:
-                raise NotImplementedError("cannot add to parser",
-                                          self, parser)  # pragma: no cover
+                parser.add_argument(opt_name,
+                                    type=str,
+                                    required=self._required,
+                                    default=_result.MISSING)
+
+        def add_source(self, spec):
+            """
+            Add ourselves to the options which can come from sources
+
+            Args:
+                spec (caparg._sources._Spec): the specification to add to
+            """
+            spec.add_option(self._name, self._type, self._required,
+                            self._have_default)
+
+        def relaxed(self):
+            """
+            This option, neither required nor defaulted
+
+            Used when sources check requirements and fill defaults.
+
+            Returns:
+                an option
+            """
+            return attr.evolve(self, required=False, have_default=False)
+
+        def add_native(self, spec):
+            """
+            Add ourselves to a native parser specification
+
+            Args:
+                spec (caparg._native._Spec): the specification to add to
+            """
+            from caparg import _converters
+            if self._type == bool:
+                spec.add_option(self._name, 'bool', default=lambda: False)
+                return
+            conversion = _converters.for_type(self._type)
+            default = conversion.default if self._have_default else None
+            convert = None if conversion.identity else conversion
+            if conversion.collect:
+                spec.add_option(self._name, 'list', default=default,
+                                convert=convert)
+            else:
+                spec.add_option(self._name, 'str', required=self._required,
+                                default=default, convert=convert)
 
         def get_value(self, namespace):
             """
@@ -196,23 +542,24 @@ class _PreOption(object):
                 namespace (argparse.Namespace): the namespace
 
             Returns:
-                a value
+                a value, or :code:`MISSING`
             """
-            value = getattr(namespace, self._name, self._MISSING)
-            ret = pyrsistent.m()
-            if value is None and self._type == typing.List[str]:
-                value = self._MISSING
-            if value is not self._MISSING:
-                ret = ret.set(self._name, value)
-            elif self._have_default is True:
-                if self._type == str:
-                    ret = ret.set(self._name, '')
-                elif self._type == typing.List[str]:
-                    ret = ret.set(self._name, pyrsistent.v())
-                else:  # pragma: no cover
+            from caparg import _converters
+            value = getattr(namespace, self._name, _result.MISSING)
+            if self._type == bool:
+                return value
+            conversion = _converters.for_type(self._type)
+            if value is None and conversion.collect:
+                value = _result.MISSING
+            if value is not _result.MISSING:
+                return conversion.convert(
+                    value, '--' + self._name.replace('_', '-'))
+            if self._have_default is True:
+                if conversion.default is None:  # pragma: no cover
                     raise NotImplementedError("cannot default value",
                                               self._name, self._type)
-            return ret
+                return conversion.default()
+            return _result.MISSING
 
     def with_name(self, name):
         """
@@ -238,11 +585,173 @@ def command(_name, *args, **kwargs):
         _name (str): the name of the subcommand (for top-level, '')
         *args (tuple): commands and options
         **kwargs (dict): options by name
+
+    Keyword arguments starting with an underscore are settings,
+    rather than options.
+    Only the settings of the top-level command are used.
+
+    * :code:`_engine` (str): :code:`'argparse'` (the default),
+      :code:`'native'`, which parses caparg's own option types directly,
+      in one pass over the arguments, or :code:`'codegen'`,
+      which parses like :code:`'native'` with a function generated
+      for each subcommand.
+    * :code:`_response_files` (bool): whether an argument :code:`@path`
+      stands for the arguments in the file at :code:`path`
+      (:code:`@-` for standard input), separated by NUL characters
+      or by newlines. Defaults to :code:`False`.
+    * :code:`_parser_cache_size` (int): how many prepared subcommand
+      parsers to keep, evicting the least recently used ones
+      (None for no limit). Defaults to 256.
+    * :code:`_result_cache_size` (int): how many parse results
+      (or errors) to keep, by command line,
+      evicting the least recently used ones
+      (None for no limit). Results are shared between equal command
+      lines, so they must not be changed.
+      Defaults to 0: parse results are not cached.
+      Not used with :code:`_response_files`, :code:`_env_prefix`
+      or :code:`_config_files`, since the files and environment
+      can change.
+    * :code:`_result_cache_bytes` (int): most (approximate) bytes
+      of cached command lines and results
+      (None for no limit). Defaults to None.
+    * :code:`_env_prefix` (str): options missing from the command line
+      are taken from environment variables named by this prefix
+      and the option's name in upper case
+      (:code:`_env_prefix='TOOL_'` reads :code:`--dry-run` from
+      :code:`TOOL_DRY_RUN`). Defaults to None: the environment is not read.
+    * :code:`_config_files` (List[str]): options missing from the
+      command line and the environment are taken from these files,
+      the first file with a value winning.
+      Files are INI, or JSON or TOML by extension, and missing files
+      are skipped. A value is looked up in the section (or table)
+      named by the subcommand, like :code:`[remote add]`,
+      then at the top level (the :code:`DEFAULT` section of INI files).
+      Lists and maps can be comma-separated strings,
+      and arrays and tables in JSON and TOML.
+      Required options and defaults apply after the values are merged.
+      Defaults to none.
+
+    Unlike the settings, each command can have its own handler:
+
+    * :code:`_handler` (callable or str): what :code:`dispatch` calls
+      with the parsed map, when this subcommand is parsed.
+      Either the callable, or an import path like
+      :code:`'package.module:function'`, which is only imported when
+      the subcommand is dispatched.
     """
     _name = _convert(_name)
-    my_options = pyrsistent.pvector(value.with_name(key)
-                                    for key, value in kwargs.items())
-    return _Command(_name, args, my_options)
+    handler = kwargs.pop('_handler', None)
+    settings = _Settings(**{key[1:]: kwargs.pop(key)
+                            for key in list(kwargs)
+                            if key.startswith('_')})
+    my_options = tuple(value.with_name(key) for key, value in kwargs.items())
+    return _Command(_name, args, my_options, settings, handler)
+
+
+def _load_target(target):
+    """
+    Import what an import path names
+
+    Args:
+        target (str or object): an import path
+                                like :code:`'package.module:attribute'`,
+                                or the object itself
+
+    Returns:
+        the object
+    """
+    if not isinstance(target, str):
+        return target
+    module_name, _ignored, attribute = target.partition(':')
+    return getattr(importlib.import_module(module_name), attribute)
+
+
+@attr.s(frozen=True)
+class _LazyCommand(object):
+
+    """
+    A subcommand which is only loaded when it is parsed
+    """
+
+    _name = attr.ib()
+    _target = attr.ib()
+
+    def load(self):
+        """
+        Load the command
+
+        Returns:
+            the command, named as this lazy command
+        """
+        target = self._target
+        if not callable(target):
+            loaded = _load_target(target)
+        else:
+            loaded = target()
+        return attr.evolve(loaded, name=self._name)
+
+    def get_options(self):
+        """
+        Options that should only be inherited
+
+        Returns:
+            empty immutable iterable
+        """
+        return ()
+
+    def add_to(self, parent_name, my_options):
+        """
+        Command-line details to add to subparser
+
+        The subtree is only loaded when the subcommand is parsed.
+
+        Args:
+            parent_name (List[str]): name of parent
+            my_options (caparg._parser.OptionChain): inherited options
+
+        Returns:
+           a tuple: (full_name, lazy entry)
+        """
+        from caparg import _parser
+        yield parent_name + self._name, _parser.LazyEntry(self, parent_name,
+                                                          my_options)
+
+
+def load_cached(path, build, sources=None):
+    """
+    Load a compiled command from a cache file
+
+    The cache file records the modification time and size of the files
+    the command is declared in. While they are unchanged, the parser is
+    loaded from the cache without building the command. Otherwise,
+    :code:`build` is called, and the cache is checked against a
+    fingerprint of the command, and rewritten if it is stale.
+
+    Args:
+        path (str): the cache file
+        build (callable): zero-argument function returning the command
+        sources (List[str]): files the command is declared in
+                             (default: the module defining :code:`build`)
+
+    Returns:
+        something with parse_args
+    """
+    from caparg import _cache
+    return _cache.load_cached(path, build, sources)
+
+
+def lazy(_name, target):
+    """
+    A subcommand which is only loaded when it is parsed
+
+    Args:
+        _name (str): the name of the subcommand
+        target (str or callable): either a zero-argument function returning
+                                  a command, or an import path of a command
+                                  like :code:`'package.module:attribute'`.
+                                  The command is renamed to :code:`_name`.
+    """
+    return _LazyCommand(_convert(_name), target)
 
 
 # pylint: disable=redefined-builtin
@@ -269,8 +778,7 @@ class _OptionList(object):
     """List of options"""
 
     _options = attr.ib(converter=lambda x:
-                       pyrsistent.pvector(value.with_name(key)
-                                          for key, value in x.items()))
+                       tuple(value.with_name(key) for key, value in x.items()))
 
     def get_options(self):
         """
@@ -292,7 +800,7 @@ class _OptionList(object):
         Returns:
             empty immutable iterable
         """
-        return pyrsistent.v()
+        return ()
 
 
 def options(**kwargs):
@@ -306,7 +814,7 @@ def options(**kwargs):
     Args:
         **kwargs (Dict[str, option]): Mapping
     """
-    return _OptionList(pyrsistent.pmap(kwargs))
+    return _OptionList(kwargs)
 
 
 @attr.s(frozen=True)
@@ -320,7 +828,13 @@ class _Positional(object):
     _type = attr.ib()
     _required = attr.ib()
     _have_default = attr.ib()
-    _MISSING = object()
+
+    @property
+    def name(self):
+        """
+        The name of the positional
+        """
+        return self._name
 
     def get_options(self):
         """
@@ -329,7 +843,7 @@ class _Positional(object):
         Returns:
             immutable iterable containing self
         """
-        return pyrsistent.v(self)
+        return (self,)
 
     def add_to(self, _parent_name, _options):
         """
@@ -342,7 +856,48 @@ class _Positional(object):
         Returns:
             empty immutable iterable
         """
-        return pyrsistent.v()
+        return ()
+
+    def usage(self):
+        """
+        Usage fragment for the positional
+
+        Returns:
+            the name
+        """
+        return self._name
+
+    def add_completion(self, record):
+        """
+        Add ourselves to a completion index record
+
+        Args:
+            record (dict): the record of the subcommand
+        """
+        record['positionals'].append(self._name)
+
+    def problems(self):
+        """
+        Why the positional cannot be parsed
+
+        Returns:
+            list of problems, empty if there are none
+        """
+        from caparg import _converters
+        description = 'positional ' + self._name
+        ret = []
+        if self._have_default:
+            ret.append(description + ': positionals cannot have defaults')
+        try:
+            conversion = _converters.for_type(self._type)
+        except NotImplementedError:
+            ret.append('{}: no converter for {!r}'.format(
+                description, self._type))
+        else:
+            if conversion.collect:
+                ret.append('{}: positionals cannot collect values'.format(
+                    description))
+        return ret
 
     def add_argument(self, parser):
         """
@@ -354,14 +909,50 @@ class _Positional(object):
         Args:
             parser (argparse.ArgumentParser): the parser
         """
+        from caparg import _converters
         if self._have_default:
             raise NotImplementedError("cannot have defaults in positionals",
                                       self._name)  # pragma: no cover
-        if self._type == str:
-            parser.add_argument(self._name, type=str, default=self._MISSING)
-            return
-        raise NotImplementedError("cannot add to parser",
-                                  self, parser)  # pragma: no cover
+        if _converters.for_type(self._type).collect:
+            raise NotImplementedError("cannot add to parser",
+                                      self, parser)  # pragma: no cover
+        parser.add_argument(self._name, type=str, default=_result.MISSING)
+
+    def add_source(self, spec):
+        """
+        Positionals only come from the command line
+
+        Args:
+            spec (caparg._sources._Spec): the specification not to add to
+        """
+
+    def relaxed(self):
+        """
+        Positionals stay required
+
+        Returns:
+            this positional
+        """
+        return self
+
+    def add_native(self, spec):
+        """
+        Add ourselves to a native parser specification
+
+        Args:
+            spec (caparg._native._Spec): the specification to add to
+        """
+        from caparg import _converters
+        if self._have_default:
+            raise NotImplementedError("cannot have defaults in positionals",
+                                      self._name)  # pragma: no cover
+        conversion = _converters.for_type(self._type)
+        if conversion.collect:
+            raise NotImplementedError("cannot add to parser",
+                                      self, spec)  # pragma: no cover
+        spec.add_positional(self._name,
+                            convert=None if conversion.identity
+                            else conversion)
 
     def get_value(self, namespace):
         """
@@ -371,20 +962,12 @@ class _Positional(object):
             namespace (object): something with potentially the named attribute
 
         Returns:
-            an immutable mapping which is either empty, or has one element
+            the value, or :code:`MISSING`
         """
-        value = getattr(namespace, self._name, self._MISSING)
-        ret = pyrsistent.m()
-        if value is not self._MISSING:
-            ret = ret.set(self._name, value)
+        from caparg import _converters
         # argparse doesn't allow positionals to have defaults
-        # elif self._have_default is True:
-        #     if self._type == str:
-        #         ret = ret.set(self._name, '')
-        #     else:
-        #         raise NotImplementedError("cannot default value",
-        #                                   self._name, self._type)
-        return ret
+        return _converters.for_type(self._type).convert(
+            getattr(namespace, self._name, _result.MISSING), self._name)
 
 
 # pylint: disable=redefined-builtin
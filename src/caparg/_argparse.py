@@ -0,0 +1,110 @@
+"""
+The argparse parsing engine.
+
+This is the default engine.
+It is only imported when a subcommand is parsed,
+so declaring commands does not import argparse.
+
+Should not be imported directly by user code.
+"""
+
+import argparse
+
+import attr
+
+from caparg import _result
+from caparg._api import ParseError
+
+
+class _RaisingArgumentParser(argparse.ArgumentParser):
+
+    def error(self, message):
+        raise ParseError(message)
+
+
+class _HelpAction(argparse.Action):
+
+    """
+    Raise ParseError with the usage, like the other engines
+
+    argparse's own help action prints to stdout and exits.
+    """
+
+    def __init__(self, option_strings, dest, name, subcommand, **kwargs):
+        super(_HelpAction, self).__init__(option_strings, dest, nargs=0,
+                                          default=argparse.SUPPRESS, **kwargs)
+        self._name = name
+        self._subcommand = subcommand
+
+    def __call__(self, parser, namespace, values, option_string=None):
+        from caparg import _native
+        raise ParseError(_native.prepare(self._name,
+                                         self._subcommand).usage())
+
+
+@attr.s(frozen=True)
+class _ArgparseParser(object):
+
+    """
+    A subcommand parser backed by argparse
+    """
+
+    _name = attr.ib()
+    _parser = attr.ib()
+    _subcommand = attr.ib()
+    _record = attr.ib()
+    _indices = attr.ib()
+    _suggestions = attr.ib(default=attr.Factory(list), eq=False, repr=False)
+
+    def parse(self, args):
+        """
+        Parse the command line, after the subcommand
+
+        Args:
+            args (Iterable[str]): the rest of the command line
+
+        Returns:
+            immutable map of option and positional values,
+            and __caparg_subcommand__
+        """
+        # argparse makes its own list of the arguments
+        namespace, extras = self._parser.parse_known_args(args)
+        if extras:
+            from caparg import _suggest
+            # pylint: disable=protected-access
+            if not self._suggestions:
+                self._suggestions.append(_suggest.Index(
+                    option_string
+                    for option_string in self._parser._option_string_actions
+                    if option_string.startswith('--')))
+            raise ParseError(_suggest.unrecognized(extras,
+                                                   self._suggestions[0]))
+        values = [_result.MISSING] * len(self._record._fields)
+        values[0] = self._name
+        for index, thing in zip(self._indices, self._subcommand):
+            value = thing.get_value(namespace)
+            if value is not _result.MISSING:
+                values[index] = value
+        return self._record(values)
+
+
+def prepare(name, subcommand):
+    """
+    Prepare an argparse parser for a subcommand
+
+    Args:
+        name (List[str]): the name of the subcommand
+        subcommand (List[option]): the options and positionals
+
+    Returns:
+        something with :code:`parse`
+    """
+    parser = _RaisingArgumentParser(' '.join(name), add_help=False)
+    parser.add_argument('-h', '--help', action=_HelpAction,
+                        name=name, subcommand=subcommand)
+    for thing in subcommand:
+        thing.add_argument(parser)
+    record = _result.record_class(_result.fields_for(subcommand))
+    # pylint: disable=protected-access
+    indices = [record._indices[thing.name] for thing in subcommand]
+    return _ArgparseParser(name, parser, subcommand, record, indices)
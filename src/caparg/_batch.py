@@ -0,0 +1,74 @@
+"""
+Parsing many command lines against one command.
+
+Should not be imported directly by user code.
+"""
+
+import multiprocessing
+
+_WORKER_PARSER = None
+
+
+def parse_or_error(parser, args):
+    """
+    Parse a command line, returning rather than raising errors
+
+    Errors other than invalid arguments,
+    such as a lazy subcommand failing to load,
+    are returned too: they only fail this command line.
+
+    Args:
+        parser (caparg._parser.Parser): a compiled parser
+        args (List[str]): command-line arguments
+
+    Returns:
+        the parsed immutable map, or the exception
+        (usually a :code:`ParseError`)
+    """
+    try:
+        return parser.parse_args(args)
+    except Exception as exc:  # pylint: disable=broad-except
+        return exc
+
+
+# These run in the pool's processes, out of sight of coverage
+
+def _init_worker(command):  # pragma: no cover
+    global _WORKER_PARSER  # pylint: disable=global-statement
+    _WORKER_PARSER = command.compile()
+
+
+def _parse_in_worker(args):  # pragma: no cover
+    return parse_or_error(_WORKER_PARSER, args)
+
+
+def parse_many(command, argvs, processes=None, chunksize=256):
+    """
+    Parse many command lines, lazily
+
+    Args:
+        command (caparg._api._Command): the command
+        argvs (Iterable[List[str]]): command lines
+        processes (int): if not None, parse in a pool of this many
+                         processes (0 means one per core)
+        chunksize (int): how many command lines to send to a process at once
+
+    Returns:
+        iterator of parsed immutable maps or exceptions
+        (usually :code:`ParseError` instances),
+        in the order of the command lines
+    """
+    if processes is None:
+        parser = command.compile()
+        for args in argvs:
+            yield parse_or_error(parser, args)
+        return
+    pool = multiprocessing.Pool(processes or None,
+                                initializer=_init_worker,
+                                initargs=(command,))
+    try:
+        for result in pool.imap(_parse_in_worker, argvs, chunksize):
+            yield result
+    finally:
+        pool.terminate()
+        pool.join()
@@ -0,0 +1,380 @@
+"""
+Compiled parser tables, cached on disk.
+
+A compiled parser is saved as its subcommand table:
+the name of each subcommand, and its option specifications.
+Loading the table rebuilds a ready-to-run parser without walking
+the :code:`command()` and :code:`option()` declarations again.
+
+The file is keyed by a fingerprint of the command tree,
+so a cache from a different tree is detected and rebuilt.
+
+Should not be imported directly by user code.
+"""
+
+import hashlib
+import importlib
+import marshal
+import os
+import sys
+import tempfile
+import typing
+
+import attr
+import pyrsistent
+
+from caparg import _api, _parser
+
+# pylint: disable=protected-access
+
+_FORMAT = 5
+
+_CLASSES = pyrsistent.pmap({
+    cls.__name__: cls
+    for cls in [_parser.Entry, _parser.LazyEntry, _api._LazyCommand,
+                _parser.OptionChain, _api._PreOption.Option,
+                _api._Positional, _api._Settings]
+})
+
+
+def _qualified_name(thing):
+    return '{}:{}'.format(thing.__module__,
+                          getattr(thing, '__qualname__', thing.__name__))
+
+
+def _import(qualified_name):
+    module_name, _ignored, name = qualified_name.partition(':')
+    ret = importlib.import_module(module_name)
+    for part in name.split('.'):
+        ret = getattr(ret, part)
+    return ret
+
+
+def _describe(thing):
+    """
+    Describe a command tree as a stable string
+
+    The description does not depend on object identities,
+    so it is the same in every process.
+    """
+    if attr.has(type(thing)):
+        return '{}({})'.format(type(thing).__name__, ', '.join(
+            _describe(value)
+            for value in attr.astuple(thing, recurse=False)))
+    if isinstance(thing, (tuple, list, pyrsistent.PVector)):
+        return '[{}]'.format(', '.join(_describe(value) for value in thing))
+    if isinstance(thing, (type, type(_describe))):
+        return _qualified_name(thing)
+    return repr(thing)
+
+
+def fingerprint(command):
+    """
+    Fingerprint of a command tree
+
+    Args:
+        command (caparg._api._Command): the command
+
+    Returns:
+        a string, which changes when the tree changes
+    """
+    description = '{}\n{}\n{}'.format(_FORMAT, sys.version_info[:2],
+                                      _describe(command))
+    return hashlib.sha256(description.encode('utf-8')).hexdigest()
+
+
+def _type_tag(type_):
+    name = getattr(type_, '_name', None)
+    if name is not None and getattr(type_, '__module__', None) == 'typing':
+        return ('typing', name,
+                tuple(_type_tag(arg) for arg in type_.__args__))
+    origin = getattr(type_, '__origin__', None)
+    if origin is not None:
+        # Other generic aliases, like list[str], subscript their origin
+        return ('generic', _type_tag(origin),
+                tuple(_type_tag(arg) for arg in type_.__args__))
+    return ('class', _qualified_name(type_))
+
+
+def _from_type_tag(tag):
+    if tag[0] == 'typing':
+        _ignored, name, args = tag
+        return getattr(typing, name)[tuple(_from_type_tag(arg)
+                                           for arg in args)]
+    if tag[0] == 'generic':
+        _ignored, origin, args = tag
+        return _from_type_tag(origin)[tuple(_from_type_tag(arg)
+                                            for arg in args)]
+    return _import(tag[1])
+
+
+class _Encoder(object):
+
+    """
+    Encodes the subcommand table into marshal-able objects
+
+    Objects are written once, in order,
+    and referred to by their index, so shared chains stay shared.
+    """
+
+    def __init__(self):
+        self.objects = []
+        self._indices = {}
+
+    def encode(self, thing):
+        """
+        Encode an object
+
+        Args:
+            thing (object): part of the subcommand table
+
+        Returns:
+            something marshal can dump
+        """
+        if type(thing).__name__ in _CLASSES:
+            index = self._indices.get(id(thing))
+            if index is None:
+                fields = tuple(self.encode(value)
+                               for value in attr.astuple(thing, recurse=False))
+                index = self._indices[id(thing)] = len(self.objects)
+                self.objects.append((type(thing).__name__, fields))
+            return ('ref', index)
+        if isinstance(thing, pyrsistent.PVector):
+            return ('vector', tuple(self.encode(value) for value in thing))
+        if isinstance(thing, tuple):
+            return ('tuple', tuple(self.encode(value) for value in thing))
+        if isinstance(thing, type) or getattr(thing, '__origin__', None):
+            return ('type', _type_tag(thing))
+        if callable(thing):
+            raise ValueError("cannot cache a function, "
+                             "give its import path instead", thing)
+        return ('value', thing)
+
+
+class _Decoder(object):
+
+    """
+    Decodes objects of the subcommand table, on demand
+
+    Each object is decoded at most once,
+    so shared chains stay shared.
+    """
+
+    def __init__(self, encoded):
+        self._encoded = encoded
+        self._objects = {}
+
+    def class_name(self, index):
+        """
+        The class of an encoded object, without decoding it
+
+        Args:
+            index (int): the object's index
+
+        Returns:
+            the class name
+        """
+        return self._encoded[index][0]
+
+    def get(self, index):
+        """
+        Decode an object
+
+        Args:
+            index (int): the object's index
+
+        Returns:
+            the object
+        """
+        ret = self._objects.get(index)
+        if ret is None:
+            class_name, fields = self._encoded[index]
+            ret = self._objects[index] = _CLASSES[class_name](
+                *[self.decode(field) for field in fields])
+        return ret
+
+    def decode(self, thing):
+        """
+        Decode something an encoder encoded
+
+        Args:
+            thing (tuple): the encoded thing
+
+        Returns:
+            the decoded thing
+        """
+        kind, value = thing
+        if kind == 'ref':
+            return self.get(value)
+        if kind == 'vector':
+            return pyrsistent.pvector(self.decode(item) for item in value)
+        if kind == 'tuple':
+            return tuple(self.decode(item) for item in value)
+        if kind == 'type':
+            return _from_type_tag(value)
+        return value
+
+
+class _EncodedEntry(object):
+
+    """
+    A subcommand's entry, decoded when the subcommand is parsed
+    """
+
+    __slots__ = ('_decoder', '_index', 'lazy')
+
+    def __init__(self, decoder, index):
+        self._decoder = decoder
+        self._index = index
+        self.lazy = decoder.class_name(index) == 'LazyEntry'
+
+    def get_options(self):
+        """
+        All options of the subcommand
+
+        Returns:
+            immutable iterable of things with add_argument and get_value
+        """
+        return self._decoder.get(self._index).get_options()
+
+    @property
+    def handler(self):
+        """
+        The subcommand's handler, or its import path
+        """
+        return self._decoder.get(self._index).handler
+
+    def expand(self):
+        """
+        Load the lazy subcommand
+
+        Returns:
+            iterable of (full_name, entry) for the subcommand and its subtree
+        """
+        return self._decoder.get(self._index).expand()
+
+
+def _stamps(sources):
+    ret = []
+    for source in sources:
+        try:
+            stat = os.stat(source)
+        except (IOError, OSError):
+            return None
+        ret.append((source, stat.st_mtime_ns, stat.st_size))
+    return tuple(ret)
+
+
+def dumps(command, parser, stamps=()):
+    """
+    Save a compiled parser's table
+
+    Args:
+        command (caparg._api._Command): the command
+        parser (caparg._parser.Parser): the command, compiled
+        stamps (Tuple[Tuple[str, int, int]]): source files the command
+                                              was declared in, with their
+                                              modification time and size
+
+    Returns:
+        bytes
+    """
+    encoder = _Encoder()
+    entries = tuple((tuple(node.name), encoder.encode(node.entry))
+                    for node in parser.nodes())
+    return marshal.dumps((_FORMAT, fingerprint(command), stamps,
+                          encoder.encode(command._settings),
+                          tuple(encoder.objects), entries))
+
+
+def _read(path):
+    try:
+        with open(path, 'rb') as fpin:
+            table = marshal.loads(fpin.read())
+    except (IOError, OSError, EOFError, ValueError, TypeError):
+        return None
+    if not isinstance(table, tuple) or table[:1] != (_FORMAT,):
+        return None
+    return table
+
+
+def _rebuild(table):
+    settings, encoded, entries = table[3:]
+    decoder = _Decoder(encoded)
+    trie = _parser.TrieNode()
+    for name, (_ref, index) in entries:
+        name = pyrsistent.pvector(name)
+        trie.insert(name, name, _EncodedEntry(decoder, index))
+    return _parser.Parser(trie, decoder.decode(settings))
+
+
+def compile_cached(command, path, stamps=()):
+    """
+    Compile a command, through a cache file
+
+    If the file has the table of this command, it is loaded.
+    Otherwise, the command is compiled and the file is (re)written.
+    Failing to write the file is not an error.
+
+    Args:
+        command (caparg._api._Command): the command
+        path (str): the cache file
+        stamps (Tuple[Tuple[str, int, int]]): source stamps to save
+
+    Returns:
+        a compiled parser
+    """
+    table = _read(path)
+    if table is not None and table[1] == fingerprint(command):
+        if table[2] != stamps:
+            _write(path, marshal.dumps(table[:2] + (stamps,) + table[3:]))
+        return _rebuild(table)
+    parser = command._make_parser()
+    try:
+        data = dumps(command, parser, stamps)
+    except ValueError:
+        return parser
+    _write(path, data)
+    return parser
+
+
+def load_cached(path, build, sources=None):
+    """
+    Load a compiled parser, building the command only if needed
+
+    This works like Python's own bytecode cache,
+    except that changed sources are checked against the fingerprint
+    before the table is thrown away.
+
+    Args:
+        path (str): the cache file
+        build (callable): zero-argument function returning the command
+        sources (List[str]): files the command is declared in
+                             (default: the module defining :code:`build`)
+
+    Returns:
+        something with parse_args
+    """
+    if sources is None:
+        sources = [sys.modules[build.__module__].__file__]
+    stamps = _stamps(sources)
+    table = _read(path)
+    if stamps is not None and table is not None and table[2] == stamps:
+        return _rebuild(table)
+    return compile_cached(build(), path, stamps or ())
+
+
+def _write(path, data):
+    # Written to a temporary file and renamed,
+    # so concurrent processes never see a partial table
+    try:
+        fdesc, temporary = tempfile.mkstemp(
+            dir=os.path.dirname(os.path.abspath(path)))
+    except (IOError, OSError):
+        return
+    try:
+        with os.fdopen(fdesc, 'wb') as fpout:
+            fpout.write(data)
+        os.rename(temporary, path)
+    except (IOError, OSError):  # pragma: no cover
+        os.remove(temporary)
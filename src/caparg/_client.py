@@ -0,0 +1,159 @@
+"""
+Client of the parse server.
+
+Sends a command line to a server over its Unix socket,
+and receives the parsed values, or the handler's result.
+Messages are a 4-byte length followed by a :code:`marshal` payload.
+
+Run as a script, the client prints the result as JSON,
+so shell scripts get parses without starting a tool
+which imports caparg and builds its command tree.
+That is why this module only imports the standard library.
+
+Should not be imported directly by user code.
+"""
+
+import json
+import marshal
+import socket
+import struct
+import sys
+
+_HEADER = struct.Struct('!I')
+
+# Largest message accepted, in bytes
+MAX_MESSAGE = 1 << 24
+
+
+class RemoteError(ValueError):
+
+    """
+    The server could not answer a request
+
+    Attributes:
+        kind (str): :code:`'parse'` for an invalid command line,
+                    :code:`'handler'` when the handler raised,
+                    :code:`'request'` for a malformed request
+        message (str): what went wrong
+    """
+
+    def __init__(self, kind, message):
+        super(RemoteError, self).__init__(kind, message)
+        self.kind = kind
+        self.message = message
+
+
+def send_message(sock, payload):
+    """
+    Send a message
+
+    Args:
+        sock (socket.socket): a connected socket
+        payload (object): something :code:`marshal` can dump
+    """
+    data = marshal.dumps(payload)
+    sock.sendall(_HEADER.pack(len(data)) + data)
+
+
+def _receive_exactly(sock, size):
+    chunks = []
+    while size:
+        chunk = sock.recv(min(size, 1 << 16))
+        if not chunk:
+            return None
+        chunks.append(chunk)
+        size -= len(chunk)
+    return b''.join(chunks)
+
+
+def receive_message(sock):
+    """
+    Receive a message
+
+    Args:
+        sock (socket.socket): a connected socket
+
+    Returns:
+        the payload, or None if the other end closed the connection
+
+    Raises:
+        ValueError: the message is too long, cut short, or corrupt
+    """
+    header = _receive_exactly(sock, _HEADER.size)
+    if header is None:
+        return None
+    [size] = _HEADER.unpack(header)
+    if size > MAX_MESSAGE:
+        raise ValueError("message too long", size)
+    data = _receive_exactly(sock, size)
+    if data is None:
+        raise ValueError("message cut short")
+    try:
+        return marshal.loads(data)
+    except (EOFError, TypeError) as exc:
+        raise ValueError("corrupt message", exc)
+
+
+def request(path, kind, args, timeout=None):
+    """
+    Ask the server to parse, or dispatch, a command line
+
+    Args:
+        path (str): the server's socket
+        kind (str): :code:`'parse'` or :code:`'dispatch'`
+        args (Iterable[str]): command-line arguments
+        timeout (float): seconds to wait for the server, or None
+
+    Returns:
+        the parsed values as a dict,
+        or the result of the subcommand's handler
+
+    Raises:
+        RemoteError: the server could not answer
+        OSError: the server could not be reached
+    """
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.settimeout(timeout)
+        sock.connect(path)
+        send_message(sock, (kind, list(args)))
+        reply = receive_message(sock)
+    if reply is None:
+        raise RemoteError('request', 'the server closed the connection')
+    status, value = reply
+    if status != 'ok':
+        raise RemoteError(status, value)
+    return value
+
+
+def main(argv, stdout, stderr):
+    """
+    Print the answer of the server, as JSON
+
+    Args:
+        argv (List[str]): the socket, :code:`parse` or :code:`dispatch`,
+                          then the command line
+        stdout (file): where to print the answer
+        stderr (file): where to print errors
+
+    Returns:
+        exit code: 0 on success, 2 for invalid command lines,
+        1 for other errors
+    """
+    if len(argv) < 2:
+        stderr.write('usage: SOCKET parse|dispatch [ARG ...]\n')
+        return 1
+    try:
+        value = request(argv[0], argv[1], argv[2:])
+    except RemoteError as exc:
+        stderr.write(exc.message + '\n')
+        return 2 if exc.kind == 'parse' else 1
+    except (OSError, ValueError) as exc:
+        stderr.write('cannot reach server: {}\n'.format(exc))
+        return 1
+    json.dump(value, stdout, sort_keys=True)
+    stdout.write('\n')
+    return 0
+
+
+if __name__ == '__main__':  # pragma: no cover
+    sys.exit(main(sys.argv[1:], sys.stdout, sys.stderr))
@@ -0,0 +1,265 @@
+"""
+Code-generating parsing engine.
+
+Each subcommand gets its own parse function, written as Python source
+from the native engine's specification and compiled once.
+Option strings, required checks, conversions and defaults are inlined,
+so parsing does no per-option dispatch on types.
+It accepts and rejects exactly the command lines the native engine does,
+with the same messages.
+
+Should not be imported directly by user code.
+"""
+
+import threading
+
+from caparg import _native, _result, _suggest
+from caparg._api import ParseError
+
+# Compiled code, by source: equal subcommands share their code
+_CODE = {}
+
+_LOCK = threading.Lock()
+
+
+class _Writer(object):
+
+    """
+    Lines of source, with indentation
+    """
+
+    def __init__(self):
+        self.lines = []
+        self.depth = 0
+
+    def __call__(self, line, *args):
+        self.lines.append('    ' * self.depth + line.format(*args))
+
+    def indent(self, depth=1):
+        """
+        Indent (or dedent, with a negative depth) the following lines
+        """
+        self.depth += depth
+
+    def source(self):
+        """
+        The source written so far
+        """
+        return '\n'.join(self.lines) + '\n'
+
+
+def _write_positional(write, variables):
+    """
+    Write the code storing a positional token
+
+    Args:
+        write (_Writer): where to write
+        variables (List[str]): variables of the positionals, in order
+    """
+    if not variables:
+        write('extras.append(token)')
+        return
+    for index, variable in enumerate(variables):
+        write('{} given == {}:', 'elif' if index else 'if', index)
+        write('    {} = token', variable)
+        write('    after = True')
+    write('else:')
+    write('    extras.append(token)')
+    write('given += 1')
+
+
+def _write_option(write, option, variable):
+    """
+    Write the code storing the value of an option
+
+    Args:
+        write (_Writer): where to write
+        option (caparg._native._Option): the option
+        variable (str): its variable
+    """
+    if option.kind == 'bool':
+        write('if explicit is not None:')
+        write('    raise error({!r} + repr(explicit), args)',
+              'argument {}: ignored explicit argument '.format(
+                  option.option_string))
+        write('{} = True', variable)
+        return
+    write('if explicit is None:')
+    write('    explicit = next(args, None)')
+    write('    if (explicit is None or explicit == "--" or')
+    write('            lookup(explicit) is not None):')
+    write('        raise error({!r}, () if explicit == "--" else args)',
+          'argument {}: expected one argument'.format(option.option_string))
+    if option.kind == 'list':
+        write('if {} is MISSING:', variable)
+        write('    {} = [explicit]', variable)
+        write('else:')
+        write('    {}.append(explicit)', variable)
+    else:
+        write('{} = explicit', variable)
+
+
+def _write_loop(write, spec, variables):
+    """
+    Write the loop over the tokens of the command line
+
+    Args:
+        write (_Writer): where to write
+        spec (caparg._native._Spec): the subcommand's specification
+        variables (Dict[str, str]): the variable of each field
+    """
+    positionals = [variables[name] for name in spec.positionals]
+    write('extras = []')
+    write('given = 0')
+    write('after = False')
+    write('args = iter(args)')
+    write('for token in args:')
+    write.indent()
+    write('if token == "--":')
+    write('    if not after and given >= {}:', len(positionals))
+    write('        extras.append(token)')
+    write('    for token in args:')
+    write.indent(2)
+    _write_positional(write, positionals)
+    write.indent(-2)
+    write('    break')
+    write('after = False')
+    write('explicit = None')
+    write('if token not in OPTION_STRINGS:')
+    write.indent()
+    write('found = lookup(token)')
+    write('if found is None:')
+    write.indent()
+    _write_positional(write, positionals)
+    write('continue')
+    write.indent(-1)
+    write('option, explicit = found')
+    write('if option is None:')
+    write('    extras.append(token)')
+    write('    continue')
+    write('if option is HELP:')
+    write('    if explicit is not None:')
+    write('        raise error(HELP_EXPLICIT.format(explicit), args)')
+    write('    raise error(USAGE, args)')
+    write('token = option.option_string')
+    write.indent(-1)
+    write('if token == "--help":')
+    write('    raise error(USAGE, args)')
+    for option in spec.options:
+        write('elif token == {!r}:', option.option_string)
+        write.indent()
+        _write_option(write, option, variables[option.name])
+        write.indent(-1)
+    write.indent(-1)
+
+
+def _write_finish(write, spec, variables, namespace):
+    """
+    Write the checks, conversions and defaults after the loop
+
+    Args:
+        write (_Writer): where to write
+        spec (caparg._native._Spec): the subcommand's specification
+        variables (Dict[str, str]): the variable of each field
+        namespace (dict): the namespace of the source,
+                          to add converters and defaults to
+    """
+    # pylint: disable=protected-access
+    write('missing = []')
+    for name, display in spec.required:
+        write('if {} is MISSING:', variables[name])
+        write('    missing.append({!r})', display)
+    write('if missing:')
+    write('    raise ParseError("the following arguments are required: " +')
+    write('                     ", ".join(missing))')
+    write('if extras:')
+    write('    raise ParseError(unrecognized(extras, suggestions()))')
+    for index, (name, display, conversion) in enumerate(spec.conversions):
+        convert = 'convert{}'.format(index)
+        namespace[convert] = conversion.convert
+        write('if {} is not MISSING:', variables[name])
+        write('    {0} = {1}({0}, {2!r})', variables[name], convert, display)
+    for index, option in enumerate(spec.options):
+        if option.default is not None:
+            default = 'default{}'.format(index)
+            namespace[default] = option.default
+            write('if {} is MISSING:', variables[option.name])
+            write('    {} = {}()', variables[option.name], default)
+    write('return Record((NAME, {}))', ''.join(
+        variables[name] + ', ' for name in spec.record._fields[1:]))
+
+
+def generate(spec):
+    """
+    Generate the source of a parse function
+
+    Values which cannot be written as literals,
+    such as converters and defaults,
+    are names in the namespace the source must be run in.
+
+    Args:
+        spec (caparg._native._Spec): the subcommand's specification
+
+    Returns:
+        a tuple: (the source, the namespace)
+    """
+    # pylint: disable=protected-access
+    variables = {name: 'v{}'.format(index)
+                 for index, name in enumerate(spec.record._fields)}
+    namespace = dict(MISSING=_result.MISSING, ParseError=ParseError,
+                     HELP=_native._HELP, HELP_EXPLICIT=_native._HELP_EXPLICIT,
+                     NAME=spec.name, Record=spec.record,
+                     OPTION_STRINGS=frozenset(spec.by_option_string),
+                     USAGE=spec.usage(), lookup=spec._lookup,
+                     error=spec._error,
+                     suggestions=spec._suggestions,
+                     unrecognized=_suggest.unrecognized)
+    write = _Writer()
+    write('def parse(args):')
+    write.indent()
+    for name in spec.record._fields[1:]:
+        write('{} = MISSING', variables[name])
+    _write_loop(write, spec, variables)
+    _write_finish(write, spec, variables, namespace)
+    return write.source(), namespace
+
+
+class _Generated(object):
+
+    """
+    A subcommand parser, generated as Python source
+
+    Attributes:
+        source (str): the source of :code:`parse`
+        parse (callable): parses the command line, after the subcommand
+    """
+
+    def __init__(self, source, parse):
+        self.source = source
+        self.parse = parse
+
+
+def prepare(name, subcommand):
+    """
+    Prepare a generated parser for a subcommand
+
+    Args:
+        name (List[str]): the name of the subcommand
+        subcommand (List[option]): the options and positionals
+
+    Returns:
+        something with :code:`parse`
+    """
+    # pylint: disable=protected-access
+    spec = _native._Spec(name,
+                         _result.record_class(_result.fields_for(subcommand)))
+    for thing in subcommand:
+        thing.add_native(spec)
+    source, namespace = generate(spec)
+    code = _CODE.get(source)
+    if code is None:
+        code = compile(source, '<caparg {}>'.format(' '.join(name)), 'exec')
+        with _LOCK:
+            code = _CODE.setdefault(source, code)
+    exec(code, namespace)  # pylint: disable=exec-used
+    return _Generated(source, namespace['parse'])
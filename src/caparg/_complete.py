@@ -0,0 +1,261 @@
+"""
+Shell completion.
+
+Completion is answered from a prefix index of the subcommand table:
+for each node of the subcommand trie,
+the sorted words which can follow it,
+and for subcommands, their sorted option strings and their positionals.
+
+In a process, the index is built one node at a time, as it is needed.
+For shells, the whole index is saved to a file,
+and the completion script runs this module directly on it,
+so the command-line tool is not imported on each TAB press.
+That is why this module only imports the standard library.
+
+Should not be imported directly by user code.
+"""
+
+import bisect
+import collections
+import json
+import os
+import shlex
+import sys
+import tempfile
+
+_FORMAT = 1
+
+Completion = collections.namedtuple('Completion',
+                                    ['words', 'options', 'positional'])
+
+
+def _starting_with(sorted_words, prefix):
+    start = bisect.bisect_left(sorted_words, prefix)
+    end = bisect.bisect_right(sorted_words, prefix + u'\U0010ffff')
+    return sorted_words[start:end]
+
+
+def _contains(sorted_words, word):
+    index = bisect.bisect_left(sorted_words, word)
+    return index < len(sorted_words) and sorted_words[index] == word
+
+
+def record_for(node):
+    """
+    The index record of a trie node
+
+    Lazy subcommands are loaded, since completion goes into them.
+
+    Args:
+        node (caparg._parser.TrieNode): the node
+
+    Returns:
+        a dict of sorted :code:`words`, whether it is a :code:`command`,
+        sorted option strings in :code:`options`,
+        sorted option strings taking a value in :code:`values`,
+        and the names of the :code:`positionals`
+    """
+    if node.entry is not None and node.entry.lazy:
+        node.expand()
+    record = dict(words=sorted(node.children), command=node.entry is not None,
+                  options=[], values=[], positionals=[])
+    if node.entry is not None:
+        for thing in node.entry.get_options():
+            thing.add_completion(record)
+    record['options'].sort()
+    record['values'].sort()
+    return record
+
+
+class TrieIndex(object):
+
+    """
+    Index of a compiled parser's trie, built as it is used
+
+    Args:
+        trie (caparg._parser.TrieNode): the root of the trie
+        records (dict): where records are kept, by path
+    """
+
+    def __init__(self, trie, records):
+        self._trie = trie
+        self._records = records
+
+    def __call__(self, path):
+        record = self._records.get(path)
+        if record is None:
+            node, _depth = self._trie.walk(path)
+            record = self._records.setdefault(path, record_for(node))
+        return record
+
+
+def _next_positional(record, rest):
+    count = 0
+    tokens = iter(rest)
+    for token in tokens:
+        if token == '--':
+            count += sum(1 for _token in tokens)
+        elif _contains(record['values'], token):
+            next(tokens, None)
+        elif not token.startswith('-') or token == '-':
+            count += 1
+    positionals = record['positionals']
+    return positionals[count] if count < len(positionals) else None
+
+
+def complete(index, words):
+    """
+    Complete a partial command line
+
+    Args:
+        index (callable): returns the record of a path in the trie
+        words (List[str]): the arguments so far,
+                           the last of which is being completed
+
+    Returns:
+        a :code:`Completion` of subcommand words and option strings
+        starting with the last word, and the name of the positional
+        it would be (or None)
+    """
+    words = list(words) or ['']
+    before, current = words[:-1], words[-1]
+    path, record = (), index(())
+    found, found_record = None, None
+    for word in before:
+        if not _contains(record['words'], word):
+            break
+        path += (word,)
+        record = index(path)
+        if record['command']:
+            found, found_record = path, record
+    subcommands = []
+    if len(path) == len(before) and not current.startswith('-'):
+        subcommands = _starting_with(record['words'], current)
+    if found is None:
+        return Completion(subcommands, [], None)
+    rest = before[len(found):]
+    if rest and _contains(found_record['values'], rest[-1]):
+        # Completing the value of an option
+        return Completion([], [], None)
+    if current.startswith('-'):
+        return Completion([], _starting_with(found_record['options'],
+                                             current), None)
+    return Completion(subcommands, [],
+                      _next_positional(found_record, rest))
+
+
+def _all_records(trie):
+    nodes = [((), trie)]
+    while nodes:
+        path, node = nodes.pop()
+        record = record_for(node)
+        yield path, record
+        for word in record['words']:
+            nodes.append((path + (word,), node.children[word]))
+
+
+def write_index(trie, fingerprint, path):
+    """
+    Save the whole index of a trie, unless it is already saved
+
+    All lazy subcommands are loaded.
+
+    Args:
+        trie (caparg._parser.TrieNode): the root of the trie
+        fingerprint (str): fingerprint of the command tree
+        path (str): the index file
+    """
+    try:
+        with open(path) as fpin:
+            if json.load(fpin).get('fingerprint') == fingerprint:
+                return
+    except (IOError, OSError, ValueError, AttributeError):
+        pass
+    data = dict(format=_FORMAT, fingerprint=fingerprint,
+                nodes={' '.join(path): record
+                       for path, record in _all_records(trie)})
+    fdesc, temporary = tempfile.mkstemp(
+        dir=os.path.dirname(os.path.abspath(path)))
+    with os.fdopen(fdesc, 'w') as fpout:
+        json.dump(data, fpout, sort_keys=True)
+    os.rename(temporary, path)
+
+
+def _load_index(path):
+    with open(path) as fpin:
+        data = json.load(fpin)
+    if data.get('format') != _FORMAT:
+        raise ValueError("unknown index format", path)
+    nodes = data['nodes']
+    return lambda words: nodes[' '.join(words)]
+
+
+_BASH = u"""\
+_caparg_complete_{function}() {{
+    local IFS=$'\\n'
+    COMPREPLY=($({python} -S {module} {index} \\
+        "${{COMP_WORDS[@]:1:COMP_CWORD}}"))
+}}
+complete -o default -F _caparg_complete_{function} {prog}
+"""
+
+_ZSH = u"""\
+#compdef {prog}
+_caparg_complete_{function}() {{
+    local -a candidates
+    candidates=("${{(@f)$({python} -S {module} {index} \\
+        "${{(@)words[2,CURRENT]}}")}}")
+    compadd -- ${{candidates:#}}
+}}
+compdef _caparg_complete_{function} {prog}
+"""
+
+_SCRIPTS = dict(bash=_BASH, zsh=_ZSH)
+
+
+def script(shell, prog, index_path):
+    """
+    A shell completion script
+
+    Args:
+        shell (str): :code:`'bash'` or :code:`'zsh'`
+        prog (str): the name of the command-line tool
+        index_path (str): the saved index
+
+    Returns:
+        the script
+    """
+    try:
+        template = _SCRIPTS[shell]
+    except KeyError:
+        raise ValueError("unknown shell", shell)
+    function = ''.join(char if char.isalnum() else '_' for char in prog)
+    module = os.path.splitext(os.path.abspath(__file__))[0] + '.py'
+    return template.format(function=function,
+                           prog=shlex.quote(prog),
+                           python=shlex.quote(sys.executable),
+                           module=shlex.quote(module),
+                           index=shlex.quote(os.path.abspath(index_path)))
+
+
+def main(argv, stdout):
+    """
+    Print completions of a command line, from a saved index
+
+    A missing or broken index completes nothing.
+
+    Args:
+        argv (List[str]): the index file, then the command line
+        stdout (file): where to print candidates, one per line
+    """
+    try:
+        index = _load_index(argv[0])
+        completion = complete(index, argv[1:])
+    except (IOError, OSError, ValueError, KeyError):
+        return
+    for candidate in completion.words + completion.options:
+        stdout.write(candidate + '\n')
+
+
+if __name__ == '__main__':  # pragma: no cover
+    main(sys.argv[1:], sys.stdout)
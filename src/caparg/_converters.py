@@ -0,0 +1,274 @@
+"""
+Converters from command-line strings to option types.
+
+Each type has a converter for one value,
+and, for lists of that type, a converter for all values at once.
+Numeric lists are converted in one pass into compact arrays,
+with NumPy when it is installed and the list is long.
+
+Should not be imported directly by user code.
+"""
+
+import array
+import sys
+import threading
+
+import attr
+
+from caparg import _result
+from caparg._api import ParseError
+
+_ERRORS = (ValueError, TypeError, LookupError, ArithmeticError)
+
+# Below this many values, importing NumPy costs more than it saves
+_NUMPY_THRESHOLD = 4096
+
+_NUMPY = []
+
+_LOCK = threading.Lock()
+
+
+@attr.s(frozen=True)
+class _Converter(object):
+
+    """
+    How to convert values of a registered type
+    """
+
+    convert = attr.ib()
+    convert_many = attr.ib()
+    default = attr.ib()
+
+
+_CONVERTERS = {}
+
+_CONVERSIONS = {}
+
+
+# pylint: disable=redefined-builtin
+def register_converter(type, convert, convert_many=None, default=None):
+    """
+    Teach options and positionals to convert a type
+
+    Args:
+        type (type): the type, as given to :code:`option()`
+        convert (callable): converts one string,
+                            raising :code:`ValueError` if it is invalid
+        convert_many (callable): converts a list of strings at once,
+                                 for :code:`typing.List[type]`
+                                 (default: :code:`convert` on each string)
+        default (callable): zero-argument function returning the value
+                            of options with :code:`have_default`
+                            (default: none, such options are not supported)
+    """
+    with _LOCK:
+        _CONVERTERS[type] = _Converter(convert, convert_many, default)
+        _CONVERSIONS.clear()
+# pylint: enable=redefined-builtin
+
+
+def _numpy():
+    if not _NUMPY:
+        try:
+            import numpy
+            # A module standing in for NumPy, without arrays, is no use
+            numpy.ndarray  # pylint: disable=pointless-statement
+        # Which branch runs depends on whether NumPy is installed
+        except (ImportError, AttributeError):  # pragma: no cover
+            numpy = None
+        _NUMPY.append(numpy)
+    return _NUMPY[0]
+
+
+def _numbers(typecode, convert, numpy_type):
+    """
+    A batch converter of numbers into an array
+
+    Args:
+        typecode (str): the :code:`array` type code
+        convert (callable): converts one string
+        numpy_type (str): the equivalent NumPy type
+
+    Returns:
+        a function converting a list of strings
+    """
+    def convert_many(texts):
+        numpy = _numpy() if len(texts) >= _NUMPY_THRESHOLD else None
+        if numpy is not None:  # pragma: no cover
+            try:
+                converted = numpy.array(texts).astype(numpy_type)
+            except _ERRORS:
+                # Convert again below, to report the error the same way
+                pass
+            else:
+                return array.array(typecode, converted.tobytes())
+        try:
+            return array.array(typecode, map(convert, texts))
+        except OverflowError:
+            # Too big for the array, but still valid
+            return list(map(convert, texts))
+    return convert_many
+
+
+register_converter(str, None, default=str)
+register_converter(bool, None, default=bool)
+register_converter(int, int, _numbers('q', int, 'int64'), default=int)
+register_converter(float, float, _numbers('d', float, 'float64'),
+                   default=float)
+
+
+def _convert_enum(enum):
+    by_name = enum.__members__
+    by_value = {str(member.value): member for member in enum}
+
+    def convert(text):
+        ret = by_name.get(text)
+        if ret is None:
+            ret = by_value[text]
+        return ret
+    return convert
+
+
+def _lookup(type_):
+    ret = _CONVERTERS.get(type_)
+    if ret is not None:
+        return ret
+    # Enums and paths can only be options if their module was imported
+    enum = sys.modules.get('enum')
+    if (enum is not None and isinstance(type_, enum.EnumMeta) and
+            issubclass(type_, enum.Enum)):
+        return _Converter(_convert_enum(type_), None, None)
+    pathlib = sys.modules.get('pathlib')
+    if (pathlib is not None and isinstance(type_, type) and
+            issubclass(type_, pathlib.PurePath)):
+        return _Converter(type_, None, None)
+    raise NotImplementedError("no converter for type", type_)
+
+
+def _key_value(key, value):
+    def convert(text):
+        name, equals, text = text.partition('=')
+        if not equals:
+            raise ValueError("expected KEY=VALUE", name)
+        return ((name if key is None else key(name)),
+                (text if value is None else value(text)))
+    return convert
+
+
+def _each(convert):
+    def convert_many(texts):
+        return list(map(convert, texts))
+    return convert_many
+
+
+def _describe(type_):
+    return getattr(type_, '__name__', None) or repr(type_)
+
+
+@attr.s(frozen=True)
+class Conversion(object):
+
+    """
+    How to convert the strings given to an option or positional
+
+    Attributes:
+        name (str): the type, in error messages
+        collect (bool): whether the option collects repeated values
+        identity (bool): whether values are used as they are
+        default (callable): zero-argument function returning the default,
+                            or None
+    """
+
+    name = attr.ib()
+    collect = attr.ib()
+    _one = attr.ib()
+    _many = attr.ib()
+    default = attr.ib()
+
+    @property
+    def identity(self):
+        """
+        Whether values are used as they are
+        """
+        return self._one is None and self._many is None
+
+    def _convert_one(self, text, display):
+        try:
+            return self._one(text)
+        except _ERRORS:
+            raise ParseError("argument {}: invalid {} value: {!r}".format(
+                display, self.name, text))
+
+    def convert(self, value, display):
+        """
+        Convert a value
+
+        Args:
+            value (str or List[str]): the string, or the collected strings
+            display (str): the option string or positional name,
+                           for errors
+
+        Returns:
+            the converted value
+        """
+        if value is _result.MISSING or self.identity:
+            return value
+        if not self.collect:
+            return self._convert_one(value, display)
+        try:
+            return self._many(value)
+        except _ERRORS:
+            # Convert one at a time, to find the bad one
+            for text in value:
+                self._convert_one(text, display)
+            raise  # pragma: no cover
+
+
+def _empty_vector():
+    import pyrsistent
+    return pyrsistent.pvector()
+
+
+def _empty_map():
+    import pyrsistent
+    return pyrsistent.pmap()
+
+
+def _make_conversion(type_):
+    origin = getattr(type_, '__origin__', None)
+    if origin is list:
+        [element] = type_.__args__
+        converter = _lookup(element)
+        one, many = converter.convert, converter.convert_many
+        if many is None and one is not None:
+            many = _each(one)
+        return Conversion(_describe(element), True, one, many,
+                          _empty_vector)
+    if origin is dict:
+        key, value = [_lookup(arg).convert for arg in type_.__args__]
+        one = _key_value(key, value)
+        return Conversion('KEY=VALUE', True, one,
+                          lambda texts: dict(map(one, texts)),
+                          _empty_map)
+    converter = _lookup(type_)
+    return Conversion(_describe(type_), False, converter.convert, None,
+                      converter.default)
+
+
+def for_type(type_):
+    """
+    How to convert strings for options of a type
+
+    Args:
+        type_ (type): the type given to :code:`option()`
+                      or :code:`positional()`
+
+    Returns:
+        a :code:`Conversion`
+    """
+    ret = _CONVERSIONS.get(type_)
+    if ret is None:
+        ret = _make_conversion(type_)
+        with _LOCK:
+            ret = _CONVERSIONS.setdefault(type_, ret)
+    return ret
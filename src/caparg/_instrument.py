@@ -0,0 +1,218 @@
+"""
+Instrumentation of parsing.
+
+Observers are called after every parse with a :code:`ParseEvent`.
+While there are no observers, parsing only pays for checking that.
+
+Should not be imported directly by user code.
+"""
+
+import contextlib
+import sys
+import threading
+import time
+
+import attr
+
+OBSERVERS = ()
+
+_OBSERVERS_LOCK = threading.Lock()
+
+_PHASES = ('resolve', 'prepare', 'parse')
+
+_allocated_blocks = getattr(sys, 'getallocatedblocks', lambda: 0)
+
+
+@attr.s(frozen=True)
+class ParseEvent(object):
+
+    """
+    What happened in one parse
+
+    Attributes:
+        subcommand (Tuple[str]): the subcommand, or None if none was found
+        tokens (int): the number of arguments read
+        phases (Dict[str, float]): seconds spent in each phase
+                                   (:code:`resolve`, :code:`prepare`
+                                   and :code:`parse`)
+        allocated_blocks (int): change in the number of memory blocks
+                                allocated by the interpreter
+                                (0 where this is not known)
+        error (Exception): what the parse raised, or None
+    """
+
+    subcommand = attr.ib()
+    tokens = attr.ib()
+    phases = attr.ib()
+    allocated_blocks = attr.ib()
+    error = attr.ib()
+
+
+def add_observer(observer):
+    """
+    Call a function after every parse
+
+    Args:
+        observer (callable): called with a :code:`ParseEvent`
+    """
+    global OBSERVERS  # pylint: disable=global-statement
+    with _OBSERVERS_LOCK:
+        OBSERVERS = OBSERVERS + (observer,)
+
+
+def remove_observer(observer):
+    """
+    Stop calling a function after every parse
+
+    Args:
+        observer (callable): an observer which was added
+    """
+    global OBSERVERS  # pylint: disable=global-statement
+    with _OBSERVERS_LOCK:
+        observers = list(OBSERVERS)
+        observers.remove(observer)
+        OBSERVERS = tuple(observers)
+
+
+class _Counting(object):
+
+    """
+    Iterator counting the arguments read through it
+    """
+
+    def __init__(self, args):
+        self._args = iter(args)
+        self.count = 0
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        ret = next(self._args)
+        self.count += 1
+        return ret
+
+    next = __next__
+
+
+def observe(args, parser):
+    """
+    Parse, and tell the observers about it
+
+    Args:
+        args (Iterable[str]): command-line arguments
+        parser (caparg._parser.Parser): the compiled parser
+
+    Returns:
+        the parse result
+    """
+    observers = OBSERVERS
+    clock = time.perf_counter
+    phases = {}
+    node = error = None
+    args = _Counting(args)
+    blocks = _allocated_blocks()
+    phase, start = 'resolve', clock()
+    try:
+        node, rest = parser.resolve(args)
+        phases[phase], phase, start = clock() - start, 'prepare', clock()
+        subcommand_parser = parser.subcommand_parser(node)
+        phases[phase], phase, start = clock() - start, 'parse', clock()
+        return parser.parse_rest(node, subcommand_parser, rest)
+    except Exception as exc:
+        error = exc
+        raise
+    finally:
+        # The phase which raised is timed too
+        phases[phase] = clock() - start
+        event = ParseEvent(
+            subcommand=None if node is None else tuple(node.name),
+            tokens=args.count,
+            phases=phases,
+            allocated_blocks=_allocated_blocks() - blocks,
+            error=error)
+        for observer in observers:
+            observer(event)
+
+
+def _bucket(seconds):
+    """
+    Histogram bucket of a duration
+
+    Buckets are powers of two, in microseconds.
+
+    Returns:
+        the bucket's upper bound, in microseconds
+    """
+    bound = 1
+    microseconds = seconds * 1e6
+    while bound < microseconds:
+        bound *= 2
+    return bound
+
+
+class Timings(object):
+
+    """
+    Aggregate of many parses
+
+    Attributes:
+        count (int): number of parses
+        errors (int): number of parses which raised
+        tokens (int): total arguments read
+        allocated_blocks (int): total change in allocated memory blocks
+        subcommands (Dict[Tuple[str], int]): parses of each subcommand
+        histograms (Dict[str, Dict[int, int]]): for each phase,
+                                                the number of parses whose
+                                                phase took at most
+                                                that many microseconds
+                                                (powers of two)
+        totals (Dict[str, float]): for each phase, total seconds
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.count = 0
+        self.errors = 0
+        self.tokens = 0
+        self.allocated_blocks = 0
+        self.subcommands = {}
+        self.histograms = {phase: {} for phase in _PHASES}
+        self.totals = {phase: 0.0 for phase in _PHASES}
+
+    def record(self, event):
+        """
+        Add a parse
+
+        Args:
+            event (ParseEvent): the parse
+        """
+        with self._lock:
+            self.count += 1
+            self.errors += event.error is not None
+            self.tokens += event.tokens
+            self.allocated_blocks += event.allocated_blocks
+            if event.subcommand is not None:
+                self.subcommands[event.subcommand] = \
+                    self.subcommands.get(event.subcommand, 0) + 1
+            for phase, seconds in event.phases.items():
+                histogram = self.histograms[phase]
+                bucket = _bucket(seconds)
+                histogram[bucket] = histogram.get(bucket, 0) + 1
+                self.totals[phase] += seconds
+
+
+@contextlib.contextmanager
+def collect_timings():
+    """
+    Collect timings of all parses in a block
+
+    Yields:
+        a :code:`Timings`, updated as parses happen
+    """
+    timings = Timings()
+    add_observer(timings.record)
+    try:
+        yield timings
+    finally:
+        remove_observer(timings.record)
@@ -0,0 +1,129 @@
+"""
+Bounded caches, evicting the least recently used entries.
+
+Should not be imported directly by user code.
+"""
+
+import collections
+import threading
+
+import attr
+
+
+@attr.s(frozen=True)
+class CacheStats(object):
+
+    """
+    Statistics of a cache
+
+    Attributes:
+        hits (int): lookups which found an entry
+        misses (int): lookups which did not
+        evictions (int): entries dropped to make room
+        size (int): entries in the cache
+        max_size (int): most entries in the cache, or None for no limit
+        size_bytes (int): approximate bytes used by the entries,
+                          if the cache measures them
+        max_bytes (int): most bytes used by the entries,
+                         or None for no limit
+    """
+
+    hits = attr.ib()
+    misses = attr.ib()
+    evictions = attr.ib()
+    size = attr.ib()
+    max_size = attr.ib()
+    size_bytes = attr.ib(default=0)
+    max_bytes = attr.ib(default=None)
+
+    @property
+    def hit_rate(self):
+        """
+        Fraction of lookups which found an entry (0 before any lookup)
+        """
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+
+class LRUCache(object):
+
+    """
+    A thread-safe cache, keeping the most recently used entries
+
+    Args:
+        max_size (int): most entries, or None for no limit
+        max_bytes (int): most bytes used by the entries,
+                         or None for no limit
+        sizeof (callable): approximate bytes of an entry,
+                           given its key and value
+                           (required with :code:`max_bytes`)
+    """
+
+    def __init__(self, max_size=None, max_bytes=None, sizeof=None):
+        self._max_size = max_size
+        self._max_bytes = max_bytes
+        self._sizeof = sizeof
+        self._entries = collections.OrderedDict()
+        self._sizes = {}
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._hits = self._misses = self._evictions = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key, make):
+        """
+        Get an entry, making it if it is missing
+
+        Entries are made outside the lock,
+        so racing threads at worst make the same entry twice.
+
+        Args:
+            key (Hashable): the key
+            make (callable): zero-argument function making the entry
+
+        Returns:
+            the entry
+        """
+        with self._lock:
+            try:
+                value = self._entries[key]
+            except KeyError:
+                self._misses += 1
+            else:
+                self._hits += 1
+                self._entries.move_to_end(key)
+                return value
+        value = make()
+        size = 0 if self._sizeof is None else self._sizeof(key, value)
+        with self._lock:
+            if key in self._entries:  # pragma: no cover
+                # Another thread made it first
+                return self._entries[key]
+            self._entries[key] = value
+            self._sizes[key] = size
+            self._bytes += size
+            while self._entries and self._over():
+                old_key, _old_value = self._entries.popitem(last=False)
+                self._bytes -= self._sizes.pop(old_key)
+                self._evictions += 1
+        return value
+
+    def _over(self):
+        return ((self._max_size is not None and
+                 len(self._entries) > self._max_size) or
+                (self._max_bytes is not None and
+                 self._bytes > self._max_bytes))
+
+    def stats(self):
+        """
+        Statistics of the cache
+
+        Returns:
+            a :code:`CacheStats`
+        """
+        with self._lock:
+            return CacheStats(self._hits, self._misses, self._evictions,
+                              len(self._entries), self._max_size,
+                              self._bytes, self._max_bytes)
@@ -0,0 +1,316 @@
+"""
+Native parsing engine.
+
+Parses caparg's own option and positional types in one linear pass,
+without going through argparse.
+It accepts the same command lines as the argparse engine,
+and rejects the same ones with :code:`ParseError`.
+
+Should not be imported directly by user code.
+"""
+
+import re
+
+from caparg import _result, _suggest
+from caparg._api import ParseError
+
+_NEGATIVE_NUMBER = re.compile(r'^-\d+$|^-\d*\.\d+$')
+
+_HELP = object()
+
+_HELP_EXPLICIT = "argument -h/--help: ignored explicit argument {!r}"
+
+
+class _Spec(object):  # pylint: disable=too-many-instance-attributes
+
+    """
+    Options and positionals of one subcommand
+
+    Filled in by the options and positionals themselves,
+    through :code:`add_native`.
+    """
+
+    def __init__(self, name, record):
+        self.name = name
+        self.record = record
+        self.by_option_string = {'--help': _HELP}
+        self.options = []
+        self.positionals = []
+        self.required = []
+        self.conversions = []
+        self._suggestion_index = None
+
+    def add_option(self, name, kind, required=False, default=None,
+                   convert=None):
+        """
+        Add an option
+
+        Args:
+            name (str): the name of the option
+            kind (str): one of :code:`'str'`, :code:`'bool'`, :code:`'list'`
+            required (bool): whether the option must be given
+            default (callable): zero-argument function returning
+                                the value if the option is missing,
+                                or None to leave it out of the result
+            convert (caparg._converters.Conversion): converts the value,
+                                                     or None to keep it
+        """
+        option = _Option(name, kind, required, default)
+        self.by_option_string[option.option_string] = option
+        self.options.append(option)
+        if required:
+            self.required.append((name, option.option_string))
+        if convert is not None:
+            self.conversions.append((name, option.option_string, convert))
+
+    def add_positional(self, name, convert=None):
+        """
+        Add a (required) positional argument
+
+        Args:
+            name (str): the name of the positional
+            convert (caparg._converters.Conversion): converts the value,
+                                                     or None to keep it
+        """
+        self.positionals.append(name)
+        self.required.append((name, name))
+        if convert is not None:
+            self.conversions.append((name, name, convert))
+
+    def usage(self):
+        """
+        Usage line for the subcommand
+
+        Returns:
+            a string
+        """
+        parts = [' '.join(self.name)]
+        for option in self.options:
+            parts.append(option.usage())
+        parts.extend(self.positionals)
+        return 'usage: ' + ' '.join(parts)
+
+    def _suggestions(self):
+        if self._suggestion_index is None:
+            self._suggestion_index = _suggest.Index(
+                option_string for option_string in self.by_option_string
+                if option_string.startswith('--'))
+        return self._suggestion_index
+
+    def _lookup(self, token):
+        """
+        Classify a token the way argparse does
+
+        Returns:
+            None for positional tokens, or a tuple (option, explicit value)
+            where option is None for unknown options
+        """
+        if not token.startswith('-') or token == '-':
+            return None
+        found = self.by_option_string.get(token)
+        if found is not None:
+            return found, None
+        if token.startswith('-h') and not token.startswith('--'):
+            # Like argparse, -hx and -h=x are -h with an explicit value
+            if token.startswith('-h='):
+                return _HELP, token[3:]
+            return _HELP, token[2:] or None
+        return self._lookup_prefix(token)
+
+    def _lookup_prefix(self, token):
+        """
+        Classify a token which is not exactly an option string
+
+        Returns:
+            like :code:`_lookup`
+        """
+        prefix, equals, explicit = token.partition('=')
+        if not equals:
+            explicit = None
+        found = self.by_option_string.get(prefix)
+        if found is not None:
+            return found, explicit
+        if prefix.startswith('--'):
+            matches = [option_string
+                       for option_string in self.by_option_string
+                       if option_string.startswith(prefix)]
+            if len(matches) > 1:
+                raise ParseError('ambiguous option: {} could match {}'.format(
+                    token, ', '.join(matches)))
+            if matches:
+                return self.by_option_string[matches[0]], explicit
+        if _NEGATIVE_NUMBER.match(token) or ' ' in token:
+            return None
+        return None, explicit
+
+    def _error(self, message, args):
+        """
+        An error, unless the rest of the command line has an ambiguous
+        option: argparse looks for those before anything else
+
+        Returns:
+            the ParseError to raise
+
+        Raises:
+            ParseError: an ambiguous option
+        """
+        for token in args:
+            if token == '--':
+                break
+            self._lookup(token)
+        return ParseError(message)
+
+    def parse(self, args):
+        """
+        Parse the command line, after the subcommand
+
+        Args:
+            args (Iterable[str]): the rest of the command line
+
+        Returns:
+            immutable map of option and positional values,
+            and __caparg_subcommand__
+        """
+        values = {'__caparg_subcommand__': self.name}
+        positionals = iter(self.positionals)
+        extras = []
+        args = iter(args)
+        after_positional = False
+        for token in args:
+            if token == '--':
+                # Like argparse, which keeps it unless it is
+                # next to a positional
+                if not after_positional and (not self.positionals or
+                                             self.positionals[-1] in values):
+                    extras.append(token)
+                for token in args:
+                    _add_positional(values, positionals, extras, token)
+                break
+            found = self._lookup(token)
+            if found is None:
+                after_positional = _add_positional(values, positionals,
+                                                   extras, token)
+                continue
+            after_positional = False
+            option, explicit = found
+            if option is None:
+                extras.append(token)
+            else:
+                self._add_option(values, option, explicit, args)
+        return self._finish(values, extras)
+
+    def _add_option(self, values, option, explicit, args):
+        """
+        Add the value of an option, taking it from the command line
+        unless it is explicit
+
+        Args:
+            values (dict): the values so far
+            option (_Option): the option, or :code:`_HELP`
+            explicit (str): the value after '=', or None
+            args (Iterator[str]): the rest of the command line
+        """
+        if option is _HELP:
+            if explicit is not None:
+                raise self._error(_HELP_EXPLICIT.format(explicit), args)
+            raise self._error(self.usage(), args)
+        if option.kind == 'bool':
+            if explicit is not None:
+                raise self._error(
+                    "argument {}: ignored explicit argument {!r}".format(
+                        option.option_string, explicit), args)
+            values[option.name] = True
+            return
+        if explicit is None:
+            explicit = next(args, None)
+            if (explicit is None or explicit == '--' or
+                    self._lookup(explicit) is not None):
+                # Nothing after a '--' is an option
+                raise self._error("argument {}: expected one argument"
+                                  .format(option.option_string),
+                                  () if explicit == '--' else args)
+        if option.kind == 'list':
+            values.setdefault(option.name, []).append(explicit)
+        else:
+            values[option.name] = explicit
+
+    def _finish(self, values, extras):
+        """
+        Check, convert and fill in defaults, once every token is read
+
+        Args:
+            values (dict): the values given
+            extras (List[str]): the unrecognized tokens
+
+        Returns:
+            the result record
+        """
+        missing = [display for name, display in self.required
+                   if name not in values]
+        if missing:
+            raise ParseError('the following arguments are required: ' +
+                             ', '.join(missing))
+        if extras:
+            raise ParseError(_suggest.unrecognized(extras,
+                                                   self._suggestions()))
+        for name, display, conversion in self.conversions:
+            if name in values:
+                values[name] = conversion.convert(values[name], display)
+        for option in self.options:
+            if option.name not in values and option.default is not None:
+                values[option.name] = option.default()
+        # pylint: disable=protected-access
+        return self.record(values.get(field, _result.MISSING)
+                           for field in self.record._fields)
+
+
+def _add_positional(values, positionals, extras, token):
+    name = next(positionals, None)
+    if name is None:
+        extras.append(token)
+        return False
+    values[name] = token
+    return True
+
+
+class _Option(object):
+
+    __slots__ = ('name', 'kind', 'required', 'default', 'option_string')
+
+    def __init__(self, name, kind, required, default):
+        self.name = name
+        self.kind = kind
+        self.required = required
+        self.default = default
+        self.option_string = '--' + name.replace('_', '-')
+
+    def usage(self):
+        """
+        Usage fragment for the option
+
+        Returns:
+            a string
+        """
+        if self.kind == 'bool':
+            return '[{}]'.format(self.option_string)
+        ret = '{} {}'.format(self.option_string, self.name.upper())
+        if not self.required:
+            ret = '[{}]'.format(ret)
+        return ret
+
+
+def prepare(name, subcommand):
+    """
+    Prepare a native parser for a subcommand
+
+    Args:
+        name (List[str]): the name of the subcommand
+        subcommand (List[option]): the options and positionals
+
+    Returns:
+        something with :code:`parse`
+    """
+    spec = _Spec(name, _result.record_class(_result.fields_for(subcommand)))
+    for thing in subcommand:
+        thing.add_native(spec)
+    return spec
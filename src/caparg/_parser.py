@@ -0,0 +1,650 @@
+"""
+Compiled parsers: the subcommand trie, and parsing through it.
+
+A command is compiled into a trie of its subcommand names,
+with the options of each subcommand at its node.
+Parsing walks the trie to find the subcommand,
+and hands the rest of the command line to the subcommand's parser,
+which is prepared by the engine on first use.
+
+Should not be imported directly by user code.
+"""
+
+import collections.abc
+import functools
+import itertools
+import sys
+import threading
+
+import attr
+
+from caparg import _instrument, _lru
+from caparg._api import ParseError, _Settings, _get_engine, _load_target
+
+_EXPAND_LOCK = threading.RLock()
+# Bumped whenever a lazy subcommand is loaded,
+# since that changes the help and the suggestions
+_HELP_GENERATION = 0
+# Most lines of help in an error
+_HELP_LINES = 20
+
+
+@attr.s(frozen=True, slots=True)
+class OptionChain(object):
+
+    """
+    Inherited options, as a chain of segments
+
+    Each command adds a segment to its parent's chain,
+    so subcommands share their parents' options instead of copying them.
+    """
+
+    _parent = attr.ib()
+    _segment = attr.ib()
+
+    def extend(self, things):
+        """
+        Add the options inherited from some things
+
+        Args:
+            things (Iterable[thing]): things with get_options
+
+        Returns:
+            a chain, which is this one if there are no new options
+        """
+        segment = ()
+        for thing in things:
+            segment += thing.get_options()
+        if not segment:
+            return self
+        return OptionChain(self, segment)
+
+    def flatten(self):
+        """
+        All the options in the chain, from the root down
+
+        Returns:
+            immutable iterable of things with add_argument and get_value
+        """
+        segments = []
+        chain = self
+        while chain is not None:
+            segments.append(chain._segment)
+            chain = chain._parent
+        ret = ()
+        for segment in reversed(segments):
+            ret += segment
+        return ret
+
+
+@attr.s(frozen=True)
+class Entry(object):
+
+    """
+    A subcommand's options: inherited ones, and its own
+
+    They are only put together when the subcommand is parsed.
+    """
+
+    lazy = False
+
+    _inherited = attr.ib()
+    _own = attr.ib()
+    handler = attr.ib(default=None)
+
+    def get_options(self):
+        """
+        All options of the subcommand
+
+        Returns:
+            immutable iterable of things with add_argument and get_value
+        """
+        return self._inherited.flatten() + self._own
+
+
+@attr.s(frozen=True)
+class LazyEntry(object):
+
+    """
+    A subcommand which has not been loaded yet
+    """
+
+    lazy = True
+
+    _command = attr.ib()
+    _parent_name = attr.ib()
+    _inherited = attr.ib()
+
+    def expand(self):
+        """
+        Load the subcommand
+
+        Returns:
+            iterable of (full_name, entry) for the subcommand and its subtree
+        """
+        return self._command.load().add_to(self._parent_name,
+                                           self._inherited)
+
+
+def check_entries(entries, problems, seen, checked):
+    """
+    Check subcommand entries, on their way into the trie
+
+    Args:
+        entries (Iterable[Tuple[List[str], entry]]): full names and entries
+        problems (List[str]): where to add problems
+        seen (Set[Tuple[str]]): names of subcommands already checked
+        checked (Set[int]): ids of options already checked
+
+    Returns:
+        iterator of the entries, with lazy subcommands loaded
+    """
+    for name, entry in entries:
+        if entry.lazy:
+            for item in check_entries(entry.expand(), problems, seen,
+                                      checked):
+                yield item
+            continue
+        key = tuple(name)
+        if key in seen:
+            problems.append("duplicate subcommand: " + " ".join(name))
+        seen.add(key)
+        names = set()
+        for thing in entry.get_options():
+            if thing.name in names:
+                problems.append("{}: duplicate name: {}".format(
+                    " ".join(name), thing.name))
+            names.add(thing.name)
+            if id(thing) not in checked:
+                checked.add(id(thing))
+                problems.extend(thing.problems())
+        yield name, entry
+
+
+class TrieNode(object):
+
+    """
+    A node in the subcommand trie
+
+    Each edge is one word of a subcommand name.
+    Nodes which end a full subcommand name record that name,
+    and the entry with its options.
+    Each node also caches the help text of its subtree,
+    and an index of its children's words for suggestions.
+    """
+
+    __slots__ = ('children', 'name', 'entry', 'help', 'suggestions')
+
+    def __init__(self):
+        self.children = {}
+        self.name = None
+        self.entry = None
+        self.help = None
+        self.suggestions = None
+
+    def insert(self, words, name, entry):
+        """
+        Add a subcommand below this node
+
+        Args:
+            words (List[str]): the words leading from this node
+            name (List[str]): the full name of the subcommand
+            entry (Entry or LazyEntry): the subcommand's options
+        """
+        node = self
+        for word in words:
+            node = node.children.setdefault(word, TrieNode())
+        node.name = name
+        node.entry = entry
+
+    def expand(self):
+        """
+        Load a lazy subcommand, and add its subtree below this node
+        """
+        global _HELP_GENERATION  # pylint: disable=global-statement
+        with _EXPAND_LOCK:
+            entry = self.entry
+            if not entry.lazy:  # pragma: no cover
+                # Another thread loaded it first
+                return
+            depth = len(self.name)
+            for name, subentry in entry.expand():
+                self.insert(name[depth:], name, subentry)
+            _HELP_GENERATION += 1
+
+    def nodes(self):
+        """
+        All subcommand nodes at or below this node
+
+        Lazy subcommands are not loaded.
+
+        Returns:
+            iterator of nodes
+        """
+        with _EXPAND_LOCK:
+            nodes = [self]
+            while nodes:
+                node = nodes.pop()
+                if node.name is not None:
+                    yield node
+                nodes.extend(node.children.values())
+
+    def longest_match(self, args):
+        """
+        Find the longest subcommand which prefixes the arguments
+
+        Only looks at as many arguments as the trie is deep.
+        Lazy subcommands on the way are loaded.
+
+        Args:
+            args (Iterable[str]): command-line arguments
+
+        Returns:
+            the node of the subcommand, or None
+        """
+        node, found = self, None
+        for word in args:
+            node = node.children.get(word)
+            if node is None:
+                break
+            if node.entry is not None:
+                if node.entry.lazy:
+                    node.expand()
+                found = node
+        return found
+
+    def walk(self, words):
+        """
+        Follow words down the trie, as far as they go
+
+        Lazy subcommands are not loaded.
+
+        Args:
+            words (Iterable[str]): subcommand words
+
+        Returns:
+            a tuple: (the last node reached, how many words led to it)
+        """
+        node, depth = self, 0
+        for word in words:
+            child = node.children.get(word)
+            if child is None:
+                break
+            node, depth = child, depth + 1
+        return node, depth
+
+    def help_text(self):
+        """
+        Usage lines of the subcommands at or below this node
+
+        The text is rendered once, from the cached text of the children,
+        and rendered again only after a lazy subcommand is loaded.
+
+        Returns:
+            one line per subcommand, with its options, sorted by name
+        """
+        cached = self.help
+        if cached is not None and cached[0] == _HELP_GENERATION:
+            return cached[1]
+        with _EXPAND_LOCK:
+            generation = _HELP_GENERATION
+            parts = []
+            if self.name is not None:
+                parts.append(_usage_line(self.name, self.entry))
+            for word in sorted(self.children):
+                parts.append(self.children[word].help_text())
+            text = ''.join(parts)
+            self.help = generation, text
+        return text
+
+    def suggest(self, word):
+        """
+        Words following this node which are close to a typo
+
+        Args:
+            word (str): the typo
+
+        Returns:
+            list of words, closest first
+        """
+        from caparg import _suggest
+        cached = self.suggestions
+        if cached is None or cached[0] != _HELP_GENERATION:
+            with _EXPAND_LOCK:
+                cached = self.suggestions = (
+                    _HELP_GENERATION, _suggest.Index(list(self.children)))
+        return cached[1].suggest(word)
+
+
+def _usage_line(name, entry):
+    parts = list(name)
+    if not entry.lazy:
+        # Lazy subcommands are listed without loading them
+        parts.extend(thing.usage() for thing in entry.get_options())
+    return "    " + " ".join(parts) + "\n"
+
+
+def _outcome(parse, args):
+    """
+    The result of parsing, or the error
+    """
+    try:
+        return parse(args)
+    except ParseError as exc:
+        # Only the message is kept, not the frames of the traceback
+        return ParseError(exc.message)
+
+
+def _outcome_size(args, outcome):
+    """
+    Approximate bytes used by a cached outcome and its command line
+
+    Values are only measured one level deep.
+    """
+    ret = sys.getsizeof(args) + sum(map(sys.getsizeof, args))
+    if isinstance(outcome, ParseError):
+        return ret + sys.getsizeof(outcome.message)
+    return (ret + sys.getsizeof(outcome) +
+            sum(map(sys.getsizeof, tuple.__iter__(outcome))))
+
+
+def _recording(tokens, recorded):
+    for token in tokens:
+        recorded.append(token)
+        yield token
+
+
+@attr.s(frozen=True)
+class Parser(object):
+
+    """
+    A compiled command
+
+    Made by :code:`compile`, and shared by all parses of the command.
+    """
+
+    _trie = attr.ib(repr=False)
+    _settings = attr.ib(default=attr.Factory(_Settings))
+    _parsers = attr.ib(
+        default=attr.Factory(
+            lambda self: _lru.LRUCache(self._settings.parser_cache_size),
+            takes_self=True),
+        eq=False, repr=False)
+    _completions = attr.ib(default=attr.Factory(dict), eq=False,
+                           repr=False)
+    _handlers = attr.ib(default=attr.Factory(dict), eq=False, repr=False)
+    _results = attr.ib(
+        default=attr.Factory(
+            lambda self: _lru.LRUCache(self._settings.result_cache_size,
+                                       self._settings.result_cache_bytes,
+                                       _outcome_size),
+            takes_self=True),
+        eq=False, repr=False)
+
+    def nodes(self):
+        """
+        Subcommand nodes of the trie
+
+        Returns:
+            iterator of nodes, each with a name and an entry
+        """
+        return self._trie.nodes()
+
+    def subcommand_parser(self, node):
+        """
+        The prepared parser of a subcommand
+
+        Parsers are prepared on first use,
+        since only some subcommands are ever parsed,
+        and kept in a cache of the most recently used ones.
+        Racing threads at worst prepare the same parser twice.
+
+        Args:
+            node (TrieNode): the subcommand's node
+
+        Returns:
+            something with :code:`parse`
+        """
+        return self._parsers.get(node.name,
+                                 functools.partial(self._prepare, node))
+
+    def _prepare(self, node):
+        prepare = _get_engine(self._settings.engine)
+        if self._settings.sources:
+            from caparg import _sources
+            return _sources.Sourced(prepare, node.name,
+                                    node.entry.get_options(), self._settings)
+        return prepare(node.name, node.entry.get_options())
+
+    def parser_cache_stats(self):
+        """
+        Statistics of the cache of prepared subcommand parsers
+
+        Returns:
+            something with :code:`hits`, :code:`misses`, :code:`evictions`,
+            :code:`size` and :code:`max_size`
+        """
+        return self._parsers.stats()
+
+    def resolve(self, args):
+        """
+        Find the subcommand
+
+        Sequences are not copied:
+        the subcommand is matched on the sequence itself,
+        and the remaining arguments are a view from its end.
+
+        Args:
+            args (Iterable[str]): command-line arguments
+
+        Returns:
+            a tuple: (subcommand node, iterator of the remaining arguments)
+        """
+        if (not self._settings.response_files and
+                isinstance(args, collections.abc.Sequence)):
+            node = self._trie.longest_match(args)
+            if node is None:
+                raise ParseError(self._unknown(args))
+            return node, itertools.islice(args, len(node.name), None)
+        tokens = iter(args)
+        if self._settings.response_files:
+            from caparg import _response
+            tokens = _response.expand(tokens)
+        looked_at = []
+        node = self._trie.longest_match(_recording(tokens, looked_at))
+        if node is None:
+            raise ParseError(self._unknown(looked_at))
+        return node, itertools.chain(looked_at[len(node.name):], tokens)
+
+    def parse_args(self, args):
+        """
+        Parse arguments
+
+        Args:
+            args (Iterable[str]): command-line arguments
+
+        Returns:
+            immutable map, where one of the keys is __caparg_subcommand__
+        """
+        if (self._settings.result_cache_size != 0 and
+                not self._settings.response_files and
+                not self._settings.sources):
+            return self._cached_parse(args)
+        return self._parse(args)
+
+    def _parse(self, args):
+        if _instrument.OBSERVERS:
+            return _instrument.observe(args, parser=self)
+        node, rest = self.resolve(args)
+        return self.parse_rest(node, self.subcommand_parser(node), rest)
+
+    def parse_rest(self, node, subcommand_parser, rest):
+        """
+        Parse the arguments following a subcommand
+
+        If the subcommand has subcommands of its own,
+        and the arguments are invalid,
+        a first argument close to one of them is taken as a typo of it.
+
+        Args:
+            node (TrieNode): the subcommand's node
+            subcommand_parser: the subcommand's parser
+            rest (Iterator[str]): the arguments following its name
+
+        Returns:
+            immutable map, where one of the keys is __caparg_subcommand__
+        """
+        if not node.children:
+            return subcommand_parser.parse(rest)
+        word = next(rest, None)
+        if word is not None:
+            rest = itertools.chain([word], rest)
+        try:
+            return subcommand_parser.parse(rest)
+        except ParseError as exc:
+            if word is None or word.startswith('-'):
+                raise
+            suggestions = node.suggest(word)
+            if not suggestions:
+                raise
+            raise ParseError("{}\ndid you mean: {}".format(
+                exc.message, ", ".join(" ".join(list(node.name) + [suggestion])
+                                       for suggestion in suggestions)))
+
+    def handler(self, subcommand):
+        """
+        The handler of a subcommand
+
+        Handlers are looked up in a table by subcommand name.
+        A handler given as an import path is imported
+        the first time its subcommand is dispatched,
+        so only the modules of the handlers which run are imported.
+
+        Args:
+            subcommand (Iterable[str]): the full name of the subcommand,
+                                        like :code:`__caparg_subcommand__`
+
+        Returns:
+            the handler
+
+        Raises:
+            LookupError: the subcommand has no handler
+        """
+        path = tuple(subcommand)
+        ret = self._handlers.get(path)
+        if ret is None:
+            node = self._trie.longest_match(path)
+            if node is None or len(node.name) != len(path):
+                raise LookupError("unknown subcommand", ' '.join(path))
+            if node.entry.handler is None:
+                raise LookupError("subcommand has no handler",
+                                  ' '.join(path))
+            ret = self._handlers.setdefault(
+                path, _load_target(node.entry.handler))
+        return ret
+
+    def dispatch(self, args):
+        """
+        Parse arguments, and run the subcommand's handler
+
+        Args:
+            args (Iterable[str]): command-line arguments
+
+        Returns:
+            whatever the handler returns,
+            when called with the parsed immutable map
+        """
+        parsed = self.parse_args(args)
+        return self.handler(parsed['__caparg_subcommand__'])(parsed)
+
+    def _cached_parse(self, args):
+        """
+        Parse arguments, through the cache of results
+
+        Results are shared between equal command lines,
+        and errors are remembered by their message.
+        Observers only see the parses which miss the cache.
+        """
+        args = tuple(args)
+        outcome = self._results.get(args, functools.partial(_outcome,
+                                                            self._parse,
+                                                            args))
+        if isinstance(outcome, ParseError):
+            raise ParseError(outcome.message)
+        return outcome
+
+    def result_cache_stats(self):
+        """
+        Statistics of the cache of parse results
+
+        Returns:
+            something with :code:`hits`, :code:`misses`, :code:`evictions`,
+            :code:`size`, :code:`max_size`, :code:`size_bytes`,
+            :code:`max_bytes` and :code:`hit_rate`
+        """
+        return self._results.stats()
+
+    def help(self, words=()):
+        """
+        Help for the subcommands starting with some words
+
+        Only the branch of the trie that the words lead to is rendered,
+        and the rendering is cached,
+        so a typo in :code:`remote ...` only lists the :code:`remote`
+        subcommands.
+
+        Args:
+            words (Iterable[str]): leading words of a subcommand
+                                   (by default, none: all subcommands)
+
+        Returns:
+            usage text, with one line per subcommand and its options
+        """
+        node, _depth = self._trie.walk(words)
+        return "Usage:\n" + node.help_text()
+
+    def _unknown(self, words):
+        """
+        Message for words which are not a subcommand
+
+        Suggests the closest subcommands,
+        and lists (some of) the subcommands of the branch the words reach.
+        """
+        node, depth = self._trie.walk(words)
+        # Only the words shown are copied
+        words = list(words[:depth + 1])
+        parts = []
+        if depth < len(words):
+            from caparg import _suggest
+            parts.append("unknown command: {}\n".format(
+                " ".join(_suggest.shown(word)
+                         for word in words[:depth + 1])))
+            suggestions = node.suggest(words[depth])
+            if suggestions:
+                parts.append("did you mean: {}\n".format(", ".join(
+                    " ".join(words[:depth] + [suggestion])
+                    for suggestion in suggestions)))
+        lines = node.help_text().split("\n", _HELP_LINES)
+        if len(lines) > _HELP_LINES:
+            lines[_HELP_LINES:] = ["    ...\n"]
+        parts.append("Usage:\n" + "\n".join(lines))
+        return "".join(parts)
+
+    def complete(self, words):
+        """
+        Complete a partial command line
+
+        The prefix index is built as completion reaches parts of the trie.
+
+        Args:
+            words (List[str]): the arguments so far,
+                               the last of which is being completed
+
+        Returns:
+            a named tuple of candidate subcommand :code:`words`,
+            candidate :code:`options` and the name of the
+            :code:`positional` being completed (or None)
+        """
+        from caparg import _complete
+        return _complete.complete(
+            _complete.TrieIndex(self._trie, self._completions), words)
@@ -0,0 +1,135 @@
+"""
+Response files: command-line arguments read from files.
+
+An argument :code:`@path` stands for the arguments in the file at
+:code:`path`, and :code:`@-` for the arguments on standard input.
+Arguments are separated by NUL characters if there are any,
+and by newlines otherwise.
+
+Files are memory-mapped, and arguments are produced one at a time,
+so huge argument lists are never read into memory all at once.
+With the native engine, each argument is then only kept in the result.
+
+Should not be imported directly by user code.
+"""
+
+import mmap
+import os
+import sys
+
+from caparg._api import ParseError
+
+_ENCODING = sys.getfilesystemencoding()
+
+
+def _decode(token, separator):
+    if separator == b'\n' and token.endswith(b'\r'):
+        token = token[:-1]
+    return token.decode(_ENCODING, 'surrogateescape')
+
+
+def _split(data):
+    """
+    Split the contents of a memory-mapped response file
+
+    Args:
+        data (mmap.mmap): the contents
+
+    Returns:
+        iterator of arguments, as strings
+    """
+    separator = b'\0' if data.find(b'\0') != -1 else b'\n'
+    start, end = 0, len(data)
+    while start < end:
+        stop = data.find(separator, start)
+        if stop == -1:
+            stop = end
+        yield _decode(data[start:stop], separator)
+        start = stop + 1
+
+
+def _split_stream(stream, size=65536):
+    """
+    Split a stream of arguments, one block at a time
+
+    Since streams cannot be scanned ahead,
+    the separator is decided by the first block.
+
+    Args:
+        stream (file): binary stream
+        size (int): block size
+
+    Returns:
+        iterator of arguments, as strings
+    """
+    block = stream.read(size)
+    separator = b'\0' if b'\0' in block else b'\n'
+    pending = b''
+    while block:
+        parts = (pending + block).split(separator)
+        pending = parts.pop()
+        for part in parts:
+            yield _decode(part, separator)
+        block = stream.read(size)
+    if pending:
+        yield _decode(pending, separator)
+
+
+def read(path):
+    """
+    Arguments from a response file
+
+    Args:
+        path (str): the file, or :code:`'-'` for standard input
+
+    Returns:
+        iterator of arguments
+    """
+    if path == '-':
+        stdin = getattr(sys.stdin, 'buffer', sys.stdin)
+        for token in _split_stream(stdin):
+            yield token
+        return
+    try:
+        fpin = open(path, 'rb')
+    except (IOError, OSError) as exc:
+        raise ParseError("cannot read arguments from {}: {}".format(
+            path, exc))
+    with fpin:
+        try:
+            data = mmap.mmap(fpin.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # Empty files cannot be mapped
+            return
+        with data:
+            for token in _split(data):
+                yield token
+
+
+def expand(args, prefix='@', _expanding=frozenset()):
+    """
+    Expand response files in arguments
+
+    Response files can refer to other response files,
+    but not to one they are included from.
+
+    Args:
+        args (Iterable[str]): the arguments
+        prefix (str): the prefix marking response files
+
+    Returns:
+        iterator of arguments
+
+    Raises:
+        ParseError: a response file includes itself
+    """
+    for token in args:
+        if token.startswith(prefix):
+            path = token[len(prefix):]
+            key = path if path == '-' else os.path.realpath(path)
+            if key in _expanding:
+                raise ParseError("response file includes itself: " + path)
+            for subtoken in expand(read(path), prefix, _expanding | {key}):
+                yield subtoken
+        else:
+            yield token
@@ -0,0 +1,144 @@
+"""
+Results of parsing.
+
+Each subcommand has a record class, with one slot per option.
+A result is built in one allocation,
+and is a read-only mapping from option names to values.
+Options which were not given, and have no default,
+are not in the mapping.
+
+Should not be imported directly by user code.
+"""
+
+import threading
+
+try:
+    from collections.abc import Mapping
+except ImportError:  # pragma: no cover
+    from collections import Mapping
+
+MISSING = object()
+
+_CLASSES = {}
+_CLASSES_LOCK = threading.Lock()
+
+
+class _Record(tuple):
+
+    """
+    Base class of result records
+
+    A record is a tuple of values, one per field,
+    with :code:`MISSING` for fields with no value.
+    """
+
+    __slots__ = ()
+
+    _fields = ()
+    _indices = {}
+
+    def __getitem__(self, key):
+        value = tuple.__getitem__(self, self._indices[key])
+        if value is MISSING:
+            raise KeyError(key)
+        return value
+
+    def __iter__(self):
+        for name, value in zip(self._fields, tuple.__iter__(self)):
+            if value is not MISSING:
+                yield name
+
+    def __len__(self):
+        return tuple.__len__(self) - tuple.count(self, MISSING)
+
+    def __contains__(self, key):
+        index = self._indices.get(key)
+        return (index is not None and
+                tuple.__getitem__(self, index) is not MISSING)
+
+    def __eq__(self, other):
+        if not isinstance(other, Mapping):
+            return NotImplemented
+        return dict(self.items()) == dict(other.items())
+
+    def __ne__(self, other):
+        ret = self.__eq__(other)
+        if ret is NotImplemented:
+            return ret
+        return not ret
+
+    def __hash__(self):
+        return hash(frozenset(self.items()))
+
+    def __repr__(self):
+        return 'Result({})'.format(', '.join(
+            '{}={!r}'.format(name, value) for name, value in self.items()))
+
+    def __reduce__(self):
+        return _rebuild, (self._fields, dict(self.items()))
+
+    # Mapping methods, since tuple's count and index mean something else
+    keys = Mapping.keys
+    items = Mapping.items
+    values = Mapping.values
+    get = Mapping.get
+
+
+Mapping.register(_Record)
+
+
+def _make_getter(index, name):
+    def getter(self):
+        value = tuple.__getitem__(self, index)
+        if value is MISSING:
+            raise AttributeError(name)
+        return value
+    return property(getter)
+
+
+def fields_for(subcommand):
+    """
+    Fields of the result of parsing a subcommand
+
+    Args:
+        subcommand (List[option]): the options and positionals
+
+    Returns:
+        tuple of unique names, starting with __caparg_subcommand__
+    """
+    fields = ['__caparg_subcommand__']
+    for thing in subcommand:
+        if thing.name not in fields:
+            fields.append(thing.name)
+    return tuple(fields)
+
+
+def record_class(fields):
+    """
+    The record class for some fields
+
+    Classes are shared between subcommands with the same fields.
+
+    Args:
+        fields (Tuple[str]): the field names, without duplicates
+
+    Returns:
+        a class, which is called with a tuple of values
+    """
+    ret = _CLASSES.get(fields)
+    if ret is not None:
+        return ret
+    namespace = dict(__slots__=(), _fields=fields,
+                     _indices={name: index
+                               for index, name in enumerate(fields)})
+    for index, name in enumerate(fields):
+        if name.isidentifier() and not hasattr(_Record, name):
+            namespace[name] = _make_getter(index, name)
+    with _CLASSES_LOCK:
+        return _CLASSES.setdefault(fields,
+                                   type('Result', (_Record,), namespace))
+
+
+def _rebuild(fields, values):
+    return record_class(fields)(values.get(name, MISSING)
+                                for name in fields)
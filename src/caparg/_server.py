@@ -0,0 +1,197 @@
+"""
+Parse server, over a Unix socket.
+
+A long-lived process holds the compiled command,
+and answers parse and dispatch requests from clients,
+so each invocation of a tool does not pay for starting Python,
+importing caparg and building the command tree.
+Connections are handled by a pool of worker threads.
+Like the asyncio service, each worker compiles its own parser,
+so concurrent parses share no argparse state;
+workers are started, and their subcommand parsers prepared,
+before the server accepts connections.
+
+Should not be imported directly by user code.
+"""
+
+import array
+import collections.abc
+import concurrent.futures
+import errno
+import os
+import socket
+import socketserver
+import stat
+import threading
+
+from caparg import _client
+from caparg._api import ParseError
+
+_LOCAL = threading.local()
+
+# How long workers wait for each other when warming up
+_WARM_TIMEOUT = 60
+
+
+def plain(value):
+    """
+    Turn a value into something :code:`marshal` can dump
+
+    Maps become dicts, sequences and sets become lists,
+    and values of other types become their string.
+
+    Args:
+        value (object): a parsed value, or a handler's result
+
+    Returns:
+        the plain value
+    """
+    if value is None or isinstance(value, (str, bytes, bool, int, float)):
+        return value
+    if isinstance(value, collections.abc.Mapping):
+        return {plain(key): plain(item) for key, item in value.items()}
+    if isinstance(value, (collections.abc.Sequence, collections.abc.Set,
+                          array.array)):
+        return [plain(item) for item in value]
+    return str(value)
+
+
+def _init_worker(command):
+    # pylint: disable=protected-access
+    parser = _LOCAL.parser = command._make_parser()
+    for node in parser.nodes():
+        if not node.entry.lazy:
+            parser.subcommand_parser(node)
+
+
+def _remove_stale(path):
+    """
+    Remove a socket left behind by a server which is gone
+
+    Raises:
+        OSError: a server is answering on the socket,
+                 or the path is not a socket
+    """
+    try:
+        mode = os.stat(path).st_mode
+    except FileNotFoundError:
+        return
+    if not stat.S_ISSOCK(mode):
+        raise OSError(errno.EEXIST, "not a socket", path)
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        try:
+            sock.connect(path)
+        except ConnectionRefusedError:
+            os.unlink(path)
+            return
+    raise OSError(errno.EADDRINUSE, "a server is running", path)
+
+
+class _Handler(socketserver.BaseRequestHandler):
+
+    def setup(self):
+        # An idle client must not keep a worker forever
+        self.request.settimeout(self.server.idle_timeout)
+
+    def handle(self):
+        try:
+            while True:
+                try:
+                    message = _client.receive_message(self.request)
+                except ValueError as exc:
+                    _client.send_message(self.request, ('request', str(exc)))
+                    return
+                if message is None:
+                    return
+                _client.send_message(self.request, answer(message))
+        except OSError:
+            # The client went away, or was idle for too long
+            return
+
+
+def answer(message):
+    """
+    Answer a request, with the worker's parser
+
+    Args:
+        message (tuple): :code:`'parse'` or :code:`'dispatch'`,
+                         and the command line
+
+    Returns:
+        a tuple: (:code:`'ok'`, the plain result),
+        or (the kind of error, its message)
+    """
+    try:
+        kind, args = message
+        args = [str(arg) for arg in args]
+    except (TypeError, ValueError):
+        return 'request', 'malformed request'
+    parser = _LOCAL.parser
+    try:
+        if kind == 'parse':
+            return 'ok', plain(parser.parse_args(args))
+        if kind == 'dispatch':
+            return 'ok', plain(parser.dispatch(args))
+    except ParseError as exc:
+        return 'parse', exc.message
+    except Exception as exc:  # pylint: disable=broad-except
+        return 'handler', repr(exc)
+    return 'request', 'unknown request: {!r}'.format(kind)
+
+
+class ParseServer(socketserver.UnixStreamServer):
+
+    """
+    Answers parse and dispatch requests on a Unix socket
+
+    The socket is only accessible to the user running the server.
+    Call :code:`serve_forever` to answer requests,
+    and :code:`server_close` when done.
+
+    Args:
+        command (caparg._api._Command): the command
+        path (str): where to create the socket
+        workers (int): how many worker threads
+        idle_timeout (float): seconds a connection can be idle
+                              before it is closed
+    """
+
+    def __init__(self, command, path, workers=4, idle_timeout=10):
+        _remove_stale(path)
+        self.idle_timeout = idle_timeout
+        barrier = threading.Barrier(workers)
+        self._executor = concurrent.futures.ThreadPoolExecutor(
+            workers, initializer=_init_worker, initargs=(command,))
+        # Keep every worker busy until all are started and warm
+        for future in [self._executor.submit(barrier.wait, _WARM_TIMEOUT)
+                       for _ in range(workers)]:
+            future.result()
+        self._path = path
+        old_umask = os.umask(0o177)
+        try:
+            super(ParseServer, self).__init__(path, _Handler)
+        finally:
+            os.umask(old_umask)
+
+    def process_request(self, request, client_address):
+        self._executor.submit(self._process, request, client_address)
+
+    def _process(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        # Handlers answer their own errors, so this is a bug
+        except Exception:  # pylint: disable=broad-except # pragma: no cover
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+    def server_close(self):
+        """
+        Stop accepting connections, and finish the ones being answered
+        """
+        super(ParseServer, self).server_close()
+        self._executor.shutdown()
+        try:
+            os.unlink(self._path)
+        except FileNotFoundError:
+            pass
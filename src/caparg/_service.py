@@ -0,0 +1,152 @@
+"""
+Parsing for asyncio applications.
+
+Command lines from many coroutines are batched,
+and parsed in a pool of worker threads or processes.
+Each worker compiles its own parser,
+so no argparse state is shared between concurrent parses,
+and each worker pays for preparing a subcommand's parser only once.
+
+Should not be imported directly by user code.
+"""
+
+import asyncio
+import concurrent.futures
+import functools
+import threading
+
+from caparg import _batch
+
+_LOCAL = threading.local()
+
+
+def _init_worker(command):
+    # pylint: disable=protected-access
+    _LOCAL.parser = command._make_parser()
+
+
+def _parse_batch(argvs):
+    parser = _LOCAL.parser
+    # Only a failing command line's future fails, not the whole batch
+    return [_batch.parse_or_error(parser, args) for args in argvs]
+
+
+def _deliver(batch, work):
+    """
+    Resolve the futures of a batch, once it is parsed
+
+    Args:
+        batch (List[Tuple[List[str], asyncio.Future]]): the batch
+        work (asyncio.Future): the parsing of the batch
+    """
+    error = work.exception()
+    if error is not None:
+        results = [error] * len(batch)
+    else:
+        results = work.result()
+    for (_args, future), result in zip(batch, results):
+        if future.done():
+            continue
+        if isinstance(result, BaseException):
+            future.set_exception(result)
+        else:
+            future.set_result(result)
+
+
+class ParseService(object):
+
+    """
+    Parses command lines for coroutines
+
+    All methods must be called from the event loop's thread.
+
+    Args:
+        command (caparg._api._Command): the command
+        workers (int): how many worker threads or processes
+        processes (bool): whether the workers are processes
+        max_pending (int): how many command lines can be submitted
+                           and not yet parsed, before :code:`submit` waits
+        batch_size (int): most command lines sent to a worker at once
+    """
+
+    def __init__(self, command, workers=4, processes=False,
+                 max_pending=1024, batch_size=64):
+        if processes:
+            executor_class = concurrent.futures.ProcessPoolExecutor
+        else:
+            executor_class = concurrent.futures.ThreadPoolExecutor
+        self._executor = executor_class(workers, initializer=_init_worker,
+                                        initargs=(command,))
+        self._max_pending = max_pending
+        self._batch_size = batch_size
+        self._slots = None
+        self._pending = []
+
+    async def submit(self, args):
+        """
+        Submit a command line
+
+        Waits while too many command lines are pending.
+
+        Args:
+            args (Iterable[str]): command-line arguments
+
+        Returns:
+            future of the immutable map,
+            or of the :code:`ParseError`
+        """
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self._max_pending)
+        await self._slots.acquire()
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        future.add_done_callback(lambda _future: self._slots.release())
+        self._pending.append((list(args), future))
+        if len(self._pending) == 1:
+            # Everything submitted until the loop comes around is one batch
+            loop.call_soon(self._flush)
+        return future
+
+    async def parse(self, args):
+        """
+        Parse a command line
+
+        Args:
+            args (Iterable[str]): command-line arguments
+
+        Returns:
+            immutable map, where one of the keys is __caparg_subcommand__
+
+        Raises:
+            ParseError: the command line is invalid
+        """
+        return await (await self.submit(args))
+
+    def _flush(self):
+        loop = asyncio.get_running_loop()
+        pending, self._pending = self._pending, []
+        for start in range(0, len(pending), self._batch_size):
+            batch = pending[start:start + self._batch_size]
+            try:
+                work = loop.run_in_executor(self._executor, _parse_batch,
+                                            [args for args, _future in batch])
+            except RuntimeError as exc:
+                # The service was closed
+                work = loop.create_future()
+                work.set_exception(exc)
+            work.add_done_callback(functools.partial(_deliver, batch))
+
+    async def close(self):
+        """
+        Stop the workers, after they finish what was submitted
+        """
+        if self._pending:
+            self._flush()
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, self._executor.shutdown)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *_exc_info):
+        await self.close()
@@ -0,0 +1,282 @@
+"""
+Option values from the environment and configuration files.
+
+Options missing from the command line are looked up,
+in order, in environment variables and in configuration files
+(INI, JSON or TOML, by extension).
+Subcommands are parsed with required options and defaults relaxed,
+and required options are checked, and defaults filled in,
+after the values from the sources are merged.
+
+Parsed files are cached by path, modification time and size,
+so a long-running process does not read unchanged files again.
+
+Should not be imported directly by user code.
+"""
+
+import configparser
+import json
+import os
+import threading
+
+from caparg import _converters, _result
+from caparg._api import ParseError
+
+# Parsed configuration files, by path: ((mtime, size), contents)
+_FILES = {}
+
+_LOCK = threading.Lock()
+
+_TRUE = frozenset(['1', 'yes', 'true', 'on'])
+_FALSE = frozenset(['0', 'no', 'false', 'off'])
+
+
+def _load_toml(fpin):
+    try:
+        import tomllib
+    except ImportError:  # pragma: no cover
+        try:
+            import tomli as tomllib
+        except ImportError:
+            raise ValueError("reading TOML needs Python 3.11, or tomli")
+    return tomllib.load(fpin)
+
+
+def _load_ini(fpin):
+    parser = configparser.ConfigParser(interpolation=None)
+    parser.optionxform = str
+    parser.read_file(fpin)
+    ret = dict(parser.defaults())
+    for section in parser.sections():
+        ret[section] = dict(parser[section])
+    return ret
+
+
+def _parse_file(path):
+    """
+    Parse a configuration file, by its extension
+
+    Returns:
+        dict of the file's top-level values and sections
+    """
+    extension = os.path.splitext(path)[1].lower()
+    if extension == '.json':
+        with open(path) as fpin:
+            ret = json.load(fpin)
+    elif extension == '.toml':
+        with open(path, 'rb') as fpin:
+            ret = _load_toml(fpin)
+    else:
+        with open(path) as fpin:
+            ret = _load_ini(fpin)
+    if not isinstance(ret, dict):
+        raise ValueError("not a table of values")
+    return ret
+
+
+def read(path):
+    """
+    The contents of a configuration file
+
+    Files are parsed again only when their modification time
+    or size change.
+
+    Args:
+        path (str): the file
+
+    Returns:
+        dict of the file's top-level values and sections,
+        empty if the file does not exist
+
+    Raises:
+        ParseError: the file cannot be read or parsed
+    """
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return {}
+    stamp = stat.st_mtime_ns, stat.st_size
+    cached = _FILES.get(path)
+    if cached is not None and cached[0] == stamp:
+        return cached[1]
+    try:
+        contents = _parse_file(path)
+    except (OSError, ValueError, configparser.Error) as exc:
+        raise ParseError("cannot read configuration {}: {}".format(path,
+                                                                   exc))
+    with _LOCK:
+        _FILES[path] = stamp, contents
+    return contents
+
+
+def _text(value):
+    return value if isinstance(value, str) else str(value)
+
+
+def _boolean(value, display):
+    if isinstance(value, bool):
+        return value
+    text = _text(value).strip().lower()
+    if text in _TRUE:
+        return True
+    if text in _FALSE:
+        return False
+    raise ParseError("argument {}: invalid bool value: {!r}".format(
+        display, value))
+
+
+class _Option(object):
+
+    __slots__ = ('name', 'type', 'required', 'have_default', 'display')
+
+    def __init__(self, name, type_, required, have_default):
+        self.name = name
+        self.type = type_
+        self.required = required
+        self.have_default = have_default
+        self.display = '--' + name.replace('_', '-')
+
+    def convert(self, value, origin):
+        """
+        Convert a value from a source
+
+        Lists and maps can be given as comma-separated strings,
+        and, in JSON and TOML, as arrays and tables.
+
+        Args:
+            value (object): the value
+            origin (str): where the value is from, for errors
+
+        Returns:
+            the converted value
+        """
+        try:
+            if self.type == bool:
+                return _boolean(value, self.display)
+            conversion = _converters.for_type(self.type)
+            if not conversion.collect:
+                return conversion.convert(_text(value), self.display)
+            if isinstance(value, dict):
+                items = ['{}={}'.format(key, _text(item))
+                         for key, item in value.items()]
+            elif isinstance(value, list):
+                items = [_text(item) for item in value]
+            else:
+                items = [item.strip() for item in _text(value).split(',')
+                         if item.strip()]
+            return conversion.convert(items, self.display)
+        except ParseError as exc:
+            raise ParseError("{} (from {})".format(exc.message, origin))
+
+    def default(self):
+        """
+        The value if no source has one
+
+        Returns:
+            the value, or :code:`MISSING`
+        """
+        if self.type == bool:
+            return False
+        if self.have_default:
+            return _converters.for_type(self.type).default()
+        return _result.MISSING
+
+
+class _Spec(object):
+
+    """
+    Options of one subcommand which can come from sources
+
+    Filled in by the options themselves, through :code:`add_source`.
+    """
+
+    def __init__(self):
+        self.options = []
+
+    def add_option(self, name, type_, required, have_default):
+        """
+        Add an option
+
+        Args:
+            name (str): the name of the option
+            type_ (type): the type of the option
+            required (bool): whether the option must have a value
+            have_default (bool): whether the option defaults to
+                                 the default of its type
+        """
+        self.options.append(_Option(name, type_, required, have_default))
+
+
+class Sourced(object):
+
+    """
+    A subcommand parser, taking missing options from sources
+
+    Args:
+        prepare (callable): prepares the engine's parser
+        name (List[str]): the name of the subcommand
+        subcommand (List[option]): the options and positionals
+        settings (caparg._api._Settings): the settings with the sources
+    """
+
+    def __init__(self, prepare, name, subcommand, settings):
+        spec = _Spec()
+        for thing in subcommand:
+            thing.add_source(spec)
+        self._parser = prepare(name, [thing.relaxed()
+                                      for thing in subcommand])
+        self._options = spec.options
+        self._section = ' '.join(name)
+        self._env_prefix = settings.env_prefix
+        self._config_files = settings.config_files
+
+    def _lookup(self, option):
+        if self._env_prefix is not None:
+            variable = self._env_prefix + option.name.upper()
+            value = os.environ.get(variable)
+            if value is not None:
+                return option.convert(value, variable)
+        keys = (option.name, option.name.replace('_', '-'))
+        for path in self._config_files:
+            contents = read(path)
+            for table in (contents.get(self._section), contents):
+                if not isinstance(table, dict):
+                    continue
+                for key in keys:
+                    if key in table:
+                        return option.convert(table[key],
+                                              '{} in {}'.format(key, path))
+        return _result.MISSING
+
+    def parse(self, args):
+        """
+        Parse the command line, after the subcommand
+
+        Args:
+            args (Iterable[str]): the rest of the command line
+
+        Returns:
+            immutable map of option and positional values,
+            and __caparg_subcommand__
+        """
+        parsed = self._parser.parse(args)
+        # pylint: disable=protected-access
+        indices = parsed._indices
+        values = list(tuple.__iter__(parsed))
+        missing = []
+        for option in self._options:
+            index = indices[option.name]
+            # Boolean options are False when they are not given
+            if values[index] is not _result.MISSING and (
+                    option.type != bool or values[index]):
+                continue
+            value = self._lookup(option)
+            if value is _result.MISSING:
+                value = option.default()
+            if value is _result.MISSING and option.required:
+                missing.append(option.display)
+            values[index] = value
+        if missing:
+            raise ParseError('the following arguments are required: ' +
+                             ', '.join(missing))
+        return type(parsed)(values)
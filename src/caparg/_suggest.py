@@ -0,0 +1,158 @@
+"""
+"Did you mean" suggestions.
+
+Suggestions come from a symmetric-delete index:
+every word is stored under each string obtained by deleting
+up to two of its characters.
+A typo is looked up under its own deletions,
+so only words sharing a deletion are compared to it,
+instead of every word.
+
+Should not be imported directly by user code.
+"""
+
+import itertools
+
+_MAX_DISTANCE = 2
+
+_LIMIT = 3
+
+# Most unrecognized arguments shown in an error
+_SHOWN = 10
+
+# Most characters of an argument shown in an error
+_ECHOED = 60
+
+
+def _deletions(word, most):
+    """
+    All strings made by deleting up to some characters of a word
+
+    Args:
+        word (str): the word
+        most (int): most characters to delete
+
+    Returns:
+        set of strings, including the word
+    """
+    ret = {word}
+    for count in range(1, min(most, len(word)) + 1):
+        for positions in itertools.combinations(range(len(word)), count):
+            ret.add(''.join(char for index, char in enumerate(word)
+                            if index not in positions))
+    return ret
+
+
+def shown(word):
+    """
+    A word as shown in an error, cut short if long
+
+    Args:
+        word (str): the word
+
+    Returns:
+        the word, or its start followed by :code:`...`
+    """
+    if len(word) <= _ECHOED:
+        return word
+    return word[:_ECHOED] + '...'
+
+
+def distance(first, second):
+    """
+    Edit distance, counting a swap of neighbours as one edit
+
+    Args:
+        first (str): a word
+        second (str): another word
+
+    Returns:
+        the least number of insertions, deletions, substitutions
+        and swaps turning one word into the other
+    """
+    previous, current = None, list(range(len(second) + 1))
+    for index, char in enumerate(first, 1):
+        before, previous = previous, current
+        current = [index]
+        for other_index, other_char in enumerate(second, 1):
+            cost = int(char != other_char)
+            value = min(previous[other_index] + 1,
+                        current[other_index - 1] + 1,
+                        previous[other_index - 1] + cost)
+            if (index > 1 and other_index > 1 and
+                    char == second[other_index - 2] and
+                    first[index - 2] == other_char):
+                value = min(value, before[other_index - 2] + 1)
+            current.append(value)
+    return current[-1]
+
+
+class Index(object):
+
+    """
+    Symmetric-delete index of words, for suggestions
+
+    Args:
+        words (Iterable[str]): the words which can be suggested
+    """
+
+    def __init__(self, words):
+        self._variants = {}
+        self._longest = 0
+        for word in words:
+            self._longest = max(self._longest, len(word))
+            for variant in _deletions(word, _MAX_DISTANCE):
+                self._variants.setdefault(variant, set()).add(word)
+
+    def suggest(self, word, limit=_LIMIT):
+        """
+        The closest words to a typo
+
+        Short words only get suggestions one edit away,
+        since with two edits they could be anything.
+        Words too long to be close to any word
+        are not looked up at all.
+
+        Args:
+            word (str): the typo
+            limit (int): most suggestions
+
+        Returns:
+            list of words, closest first
+        """
+        most = 1 if len(word) <= 4 else _MAX_DISTANCE
+        if len(word) > self._longest + most:
+            return []
+        candidates = set()
+        for variant in _deletions(word, most):
+            candidates.update(self._variants.get(variant, ()))
+        scored = sorted((distance(word, candidate), candidate)
+                        for candidate in candidates)
+        return [candidate for score, candidate in scored
+                if score <= most][:limit]
+
+
+def unrecognized(extras, options):
+    """
+    Message for unrecognized arguments, with suggestions
+
+    Args:
+        extras (List[str]): the unrecognized arguments
+        options (Index): index of the option strings
+
+    Returns:
+        the message
+    """
+    message = 'unrecognized arguments: ' + ' '.join(
+        shown(extra) for extra in extras[:_SHOWN])
+    if len(extras) > _SHOWN:
+        message += ' ...'
+    suggestions = []
+    for extra in extras[:_LIMIT]:
+        if extra.startswith('--'):
+            for suggestion in options.suggest(extra.partition('=')[0]):
+                if suggestion not in suggestions:
+                    suggestions.append(suggestion)
+    if suggestions:
+        message += '\ndid you mean: ' + ', '.join(suggestions[:_LIMIT])
+    return message
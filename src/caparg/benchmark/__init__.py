@@ -0,0 +1,7 @@
+"""
+Benchmarks for Captain Arguments.
+
+Run the suite of micro-benchmarks, writing JSON results,
+with :code:`python -m caparg.benchmark`.
+Run a focused benchmark with :code:`python -m caparg.benchmark.<name>`.
+"""
@@ -0,0 +1,43 @@
+"""
+Run the benchmark suite, and write the results as JSON.
+
+Usage: :code:`python -m caparg.benchmark [--depth N] [--width N]
+[--options N] [--repeat N] [--output FILE]`
+"""
+import argparse
+import functools
+import sys
+
+from caparg.benchmark import suite, trees
+
+
+def main(argv):
+    """
+    Run the benchmark suite
+
+    Args:
+        argv (List[str]): command-line arguments
+    """
+    parser = argparse.ArgumentParser(prog='python -m caparg.benchmark')
+    parser.add_argument('--depth', type=int, default=3)
+    parser.add_argument('--width', type=int, default=5)
+    parser.add_argument('--options', type=int, default=5)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--output', default='-')
+    args = parser.parse_args(argv)
+    shape = dict(depth=args.depth, width=args.width, options=args.options)
+    name = 'synthetic-d{depth}-w{width}-o{options}'.format(**shape)
+    results = suite.run({
+        name: (functools.partial(trees.make_synthetic, **shape),
+               trees.synthetic_args(**shape)),
+        'helper': (trees.make_helper, trees.HELPER_ARGS),
+    }, repeat=args.repeat)
+    if args.output == '-':
+        suite.write(results, sys.stdout)
+    else:
+        with open(args.output, 'w') as fpout:
+            suite.write(results, fpout)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,53 @@
+"""
+Startup with and without a cache file of the compiled parser.
+
+Startup is building the command, compiling it, and parsing once.
+With a warm cache, the command is not built at all.
+"""
+from __future__ import print_function
+
+import os
+import shutil
+import tempfile
+import timeit
+
+import caparg
+from caparg.benchmark import lazy
+
+
+def startup(path=None):
+    """
+    Measure starting up and parsing once
+
+    Args:
+        path (str): cache file, or None to not use a cache
+
+    Returns:
+        seconds
+    """
+    def run():
+        if path is None:
+            # pylint: disable=protected-access
+            parser = lazy.make_eager()._make_parser()
+        else:
+            parser = caparg.load_cached(path, lazy.make_eager)
+        parser.parse_args(lazy.ARGS)
+    return timeit.timeit(run, number=1)
+
+
+def main():
+    """
+    Print startup time without a cache, and with a warm one
+    """
+    directory = tempfile.mkdtemp()
+    try:
+        path = os.path.join(directory, 'parser.cache')
+        print("uncached: {:.1f}ms".format(startup() * 1e3))
+        startup(path)
+        print("cached: {:.1f}ms".format(startup(path) * 1e3))
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    main()
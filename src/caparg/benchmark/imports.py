@@ -0,0 +1,77 @@
+"""
+Time taken by :code:`import caparg`, from :code:`python -X importtime`.
+
+Each measurement is a fresh interpreter,
+so nothing is already imported.
+Also shows which heavy modules the import loads:
+declaring commands should not need any of them.
+"""
+from __future__ import print_function
+
+import subprocess
+import sys
+
+HEAVY = ('argparse', 'incremental', 'pyrsistent', 'typing')
+
+_SCRIPT = """\
+import sys
+import caparg
+caparg.command('', caparg.command('run', verbose=caparg.option(type=bool)))
+print(' '.join(name for name in {heavy!r} if name in sys.modules))
+"""
+
+
+def _cumulative(stderr, module):
+    """
+    Cumulative microseconds importing a module
+
+    Args:
+        stderr (str): output of :code:`-X importtime`
+        module (str): the module
+
+    Returns:
+        microseconds
+    """
+    for line in stderr.splitlines():
+        fields = [field.strip() for field in line.split('|')]
+        if len(fields) == 3 and fields[2] == module:
+            return int(fields[1])
+    raise ValueError("module not imported", module)
+
+
+def measure(repeat=10):
+    """
+    Measure importing caparg and declaring a command
+
+    Args:
+        repeat (int): how many interpreters to take the best of
+
+    Returns:
+        seconds importing caparg,
+        and the list of heavy modules loaded
+    """
+    best, loaded = None, None
+    for _ in range(repeat):
+        process = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c',
+             _SCRIPT.format(heavy=HEAVY)],
+            stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+            universal_newlines=True, check=True)
+        micros = _cumulative(process.stderr, 'caparg')
+        if best is None or micros < best:
+            best = micros
+        loaded = process.stdout.split()
+    return best / 1e6, loaded
+
+
+def main():
+    """
+    Print import time, and the heavy modules loaded
+    """
+    seconds, loaded = measure()
+    print("import caparg: {:.1f}ms".format(seconds * 1e3))
+    print("heavy modules loaded: {}".format(', '.join(loaded) or 'none'))
+
+
+if __name__ == '__main__':
+    main()
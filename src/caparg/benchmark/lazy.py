@@ -0,0 +1,102 @@
+"""
+Startup time and memory of a 1,000-subcommand tree, eager and lazy.
+
+Startup is building the tree, and parsing one subcommand.
+"""
+from __future__ import print_function
+
+import functools
+import timeit
+import tracemalloc
+
+import caparg
+
+WIDTH = 1000
+
+
+def _make_plugin(index):
+    option = caparg.option
+    return caparg.command('',
+                          caparg.command('start',
+                                         name=option(type=str,
+                                                     required=True)),
+                          caparg.command('stop',
+                                         name=option(type=str,
+                                                     required=True)),
+                          force=option(type=bool),
+                          level=option(type=str, have_default=True),
+                          tag=option(type=str, have_default=index % 2 == 0))
+
+
+def make_eager(width=WIDTH):
+    """
+    Build a tree with every plugin subtree built up front
+
+    Args:
+        width (int): number of plugins
+
+    Returns:
+        a command
+    """
+    plugins = [_make_plugin(index).rename('plugin{}'.format(index))
+               for index in range(width)]
+    return caparg.command('',
+                          caparg.options(verbose=caparg.option(type=bool)),
+                          *plugins)
+
+
+def make_lazy(width=WIDTH):
+    """
+    Build a tree with every plugin subtree built on demand
+
+    Args:
+        width (int): number of plugins
+
+    Returns:
+        a command
+    """
+    return caparg.command('',
+                          caparg.options(verbose=caparg.option(type=bool)),
+                          *[caparg.lazy('plugin{}'.format(index),
+                                        functools.partial(_make_plugin, index))
+                            for index in range(width)])
+
+
+ARGS = ['plugin500', 'start', '--name', 'web', '--verbose']
+
+
+def startup(make):
+    """
+    Measure building a tree and parsing once
+
+    Args:
+        make (callable): builds the tree
+
+    Returns:
+        a tuple: (seconds, peak bytes allocated)
+    """
+    tracemalloc.start()
+    try:
+        seconds = timeit.timeit(lambda: make().parse(ARGS), number=1)
+        _current, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return seconds, peak
+
+
+def main():
+    """
+    Print startup time and memory for eager and lazy trees
+    """
+    # Parse with small trees first, so the modules parsing imports
+    # are not counted against whichever tree is timed first
+    for make in (make_eager, make_lazy):
+        make(1).parse(['plugin0', 'start', '--name', 'web'])
+    for name, make in [('eager', make_eager), ('lazy', make_lazy)]:
+        seconds, peak = startup(make)
+        print("{}: {:.1f}ms, peak {:.0f}KiB".format(
+            name, seconds * 1e3, peak / 1024.0))
+
+
+if __name__ == '__main__':
+    main()
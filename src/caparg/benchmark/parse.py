@@ -0,0 +1,58 @@
+"""
+Cost of the first parse, compared to later parses.
+
+The first parse compiles the command tree;
+later parses reuse the compiled parser.
+"""
+from __future__ import print_function
+
+import timeit
+
+
+def _make_command():
+    # Importing here keeps the import out of the measurement
+    from caparg.test import helper_subcommands
+    # Rebuild an equal tree from scratch, so nothing is compiled yet
+    return helper_subcommands.PARSER.rename('')
+
+
+ARGS = ['remote', 'add', 'origin', 'https://example.com/repo',
+        '--messages', 'messages.log', '--config', 'caparg.cfg']
+
+
+def first_parse():
+    """
+    Time one parse of a freshly built command
+
+    Returns:
+        seconds
+    """
+    parser = _make_command()
+    return timeit.timeit(lambda: parser.parse(ARGS), number=1)
+
+
+def later_parse(number=1000):
+    """
+    Time parses of an already compiled command
+
+    Args:
+        number (int): how many parses to average over
+
+    Returns:
+        seconds per parse
+    """
+    parser = _make_command()
+    parser.parse(ARGS)
+    return timeit.timeit(lambda: parser.parse(ARGS), number=number) / number
+
+
+def main():
+    """
+    Print timings
+    """
+    print("first parse: {:.1f}us".format(first_parse() * 1e6))
+    print("later parse: {:.1f}us".format(later_parse() * 1e6))
+
+
+if __name__ == '__main__':
+    main()
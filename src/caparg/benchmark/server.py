@@ -0,0 +1,78 @@
+"""
+Latency of parsing through the parse server, against a cold start.
+
+* :code:`cold`: a new interpreter imports caparg,
+  builds the command tree and parses
+* :code:`client`: a new interpreter runs the client script,
+  which asks a running server
+* :code:`request`: a request from this process to the server
+"""
+from __future__ import print_function
+
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import timeit
+
+from caparg import _client
+from caparg.test import helper_subcommands
+
+ARGS = ['remote', 'add', 'origin', 'https://example.com',
+        '--messages', 'm', '--config', 'c']
+
+_COLD = """\
+from caparg.test.helper_subcommands import PARSER
+PARSER.parse({!r})
+""".format(ARGS)
+
+
+def _best(function, repeat):
+    return min(timeit.repeat(function, number=1, repeat=repeat))
+
+
+def measure(repeat=10):
+    """
+    Measure parsing a command line, with and without a server
+
+    Args:
+        repeat (int): how many measurements to take the best of
+
+    Returns:
+        dict mapping cases to seconds
+    """
+    directory = tempfile.mkdtemp()
+    path = os.path.join(directory, 'caparg.sock')
+    server = helper_subcommands.PARSER.server(path)
+    thread = threading.Thread(target=server.serve_forever)
+    thread.start()
+    try:
+        client = [sys.executable, '-S', _client.__file__, path, 'parse']
+        client.extend(ARGS)
+        return dict(
+            cold=_best(lambda: subprocess.check_call(
+                [sys.executable, '-c', _COLD]), repeat),
+            client=_best(lambda: subprocess.check_call(
+                client, stdout=subprocess.DEVNULL), repeat),
+            request=_best(lambda: _client.request(path, 'parse', ARGS),
+                          repeat * 100),
+        )
+    finally:
+        server.shutdown()
+        server.server_close()
+        thread.join()
+        shutil.rmtree(directory)
+
+
+def main():
+    """
+    Print the latency of each case
+    """
+    for name, seconds in sorted(measure().items()):
+        print("{}: {:.2f}ms".format(name, seconds * 1e3))
+
+
+if __name__ == '__main__':
+    main()
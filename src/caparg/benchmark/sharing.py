@@ -0,0 +1,77 @@
+"""
+Memory of the compiled subcommand table, per leaf subcommand,
+as the number of inherited options grows.
+
+Inherited options are shared between subcommands,
+so the overhead per leaf should stay flat.
+"""
+from __future__ import print_function
+
+import tracemalloc
+
+import caparg
+
+LEAVES = 500
+
+
+def make_tree(inherited, leaves=LEAVES):
+    """
+    Build a two-level tree with global options
+
+    Args:
+        inherited (int): number of global options
+        leaves (int): number of leaf subcommands
+
+    Returns:
+        a command
+    """
+    option = caparg.option
+    global_options = {'global{}'.format(index): option(type=str)
+                      for index in range(inherited)}
+    groups = []
+    for group in range(leaves // 10):
+        groups.append(caparg.command(
+            'group{}'.format(group),
+            caparg.options(level=option(type=str)),
+            *[caparg.command('leaf{}'.format(leaf), name=option(type=str))
+              for leaf in range(10)]))
+    return caparg.command('', caparg.options(**global_options), *groups)
+
+
+def per_leaf(inherited, leaves=LEAVES):
+    """
+    Measure the compiled table
+
+    Args:
+        inherited (int): number of global options
+        leaves (int): number of leaf subcommands
+
+    Returns:
+        bytes allocated per leaf subcommand
+    """
+    command = make_tree(inherited, leaves)
+    # pylint: disable=protected-access
+    # Compile another tree first, so the modules compiling imports,
+    # and the memory of its first run, are not counted
+    make_tree(1, leaves)._make_parser()
+    tracemalloc.start()
+    try:
+        parser = command._make_parser()
+        current, _peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    del parser
+    return current / float(leaves)
+
+
+def main():
+    """
+    Print per-leaf memory for growing numbers of inherited options
+    """
+    for inherited in [0, 10, 100, 1000]:
+        print("{} inherited options: {:.0f} bytes per leaf".format(
+            inherited, per_leaf(inherited)))
+
+
+if __name__ == '__main__':
+    main()
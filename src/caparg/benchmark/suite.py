@@ -0,0 +1,116 @@
+"""
+Micro-benchmarks of caparg's hot paths.
+
+Each case measures one phase of parsing on its own:
+
+* :code:`construct`: building the tree with :code:`command()`,
+  :code:`option()` and :code:`positional()`
+* :code:`make_parser`: compiling the tree
+* :code:`resolve`: finding the subcommand in the command line
+* :code:`argparse_setup`: preparing the argparse parser of the subcommand
+* :code:`get_value`: extracting values from the argparse namespace
+* :code:`help`: rendering the usage message
+* :code:`parse`: all of the above, through a compiled command
+"""
+# pylint: disable=protected-access
+
+import json
+import platform
+import timeit
+
+import caparg
+from caparg import _api, _parser
+
+
+def _time(function, repeat):
+    """
+    Time a function
+
+    Args:
+        function (callable): zero-argument function
+        repeat (int): how many measurements to take the best of
+
+    Returns:
+        seconds per call
+    """
+    timer = timeit.Timer(function)
+    number, _ignored = timer.autorange()
+    return min(timer.repeat(repeat=repeat, number=number)) / number
+
+
+def measure(make, args, repeat=5):
+    """
+    Measure each phase of parsing, for one tree
+
+    Args:
+        make (callable): zero-argument function building the tree
+        args (List[str]): a valid command line
+        repeat (int): how many measurements to take the best of
+
+    Returns:
+        dict mapping phase names to seconds per call
+    """
+    command = make()
+    parser = command._make_parser()
+    node = parser._trie.longest_match(args)
+    options = node.entry.get_options()
+    argparse_parser = _api._prepare_parser(node.name, options)
+    namespace = argparse_parser._parser.parse_args(args[len(node.name):])
+    compiled = command.compile()
+
+    def get_values():
+        for thing in options:
+            thing.get_value(namespace)
+
+    def render_help():
+        # Invalidate the cached text, as loading a lazy subcommand does,
+        # so each call renders the message rather than looking it up
+        _parser._HELP_GENERATION += 1
+        return parser.help()
+
+    cases = dict(
+        construct=make,
+        make_parser=command._make_parser,
+        resolve=lambda: parser._trie.longest_match(args),
+        argparse_setup=lambda: _api._prepare_parser(node.name, options),
+        get_value=get_values,
+        help=render_help,
+        parse=lambda: compiled.parse_args(args),
+    )
+    return {name: _time(function, repeat)
+            for name, function in sorted(cases.items())}
+
+
+def run(trees, repeat=5):
+    """
+    Measure each phase of parsing, for several trees
+
+    Args:
+        trees (Dict[str, Tuple[callable, List[str]]]): maps tree names
+                                                        to a function
+                                                        building the tree
+                                                        and a command line
+        repeat (int): how many measurements to take the best of
+
+    Returns:
+        JSON-compatible results, with details of the environment
+    """
+    return dict(
+        caparg=caparg.__version__,
+        python=platform.python_version(),
+        implementation=platform.python_implementation(),
+        trees={name: measure(make, args, repeat)
+               for name, (make, args) in sorted(trees.items())},
+    )
+
+
+def write(results, fpout):
+    """
+    Write results as JSON
+
+    Args:
+        results (dict): results of :code:`run`
+        fpout (file): where to write them
+    """
+    json.dump(results, fpout, indent=2, sort_keys=True)
+    fpout.write('\n')
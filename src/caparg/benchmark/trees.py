@@ -0,0 +1,86 @@
+"""
+Command trees to benchmark against.
+"""
+
+import caparg
+
+
+def make_synthetic(depth=3, width=5, options=5):
+    """
+    Build a synthetic command tree
+
+    Every command has :code:`width` subcommands, down to :code:`depth`
+    levels, and :code:`options` string options. The top-level options
+    are inherited by all subcommands.
+
+    Args:
+        depth (int): levels of subcommands
+        width (int): subcommands of each command
+        options (int): options of each command
+
+    Returns:
+        a command
+    """
+    def make_options(level):
+        return {'opt{}_{}'.format(level, index): caparg.option(type=str)
+                for index in range(options)}
+
+    def make_level(name, level):
+        children = []
+        if level < depth:
+            children = [make_level('cmd{}'.format(index), level + 1)
+                        for index in range(width)]
+        return caparg.command(name, *children, **make_options(level))
+
+    return caparg.command('',
+                          caparg.options(**make_options(0)),
+                          *[make_level('cmd{}'.format(index), 1)
+                            for index in range(width)])
+
+
+def synthetic_args(depth=3, width=5, options=5):
+    """
+    A command line for the deepest subcommand of a synthetic tree
+
+    It gives every option available to that subcommand.
+
+    Args:
+        depth (int): levels of subcommands
+        width (int): subcommands of each command
+        options (int): options of each command
+
+    Returns:
+        list of arguments
+    """
+    ret = ['cmd{}'.format(width - 1)] * depth
+    for level in [0, depth]:
+        for index in range(options):
+            ret.extend(['--opt{}-{}'.format(level, index), 'value'])
+    return ret
+
+
+_HELPER_CODE = []
+
+
+def make_helper():
+    """
+    Build the command from the test helper
+
+    The helper module's code is compiled once,
+    and run again on each call.
+
+    Returns:
+        a command
+    """
+    if not _HELPER_CODE:
+        from caparg.test import helper_subcommands
+        with open(helper_subcommands.__file__) as fpin:
+            _HELPER_CODE.append(compile(fpin.read(),
+                                        helper_subcommands.__file__, 'exec'))
+    namespace = {}
+    exec(_HELPER_CODE[0], namespace)  # pylint: disable=exec-used
+    return namespace['PARSER']
+
+
+HELPER_ARGS = ['remote', 'add', 'origin', 'https://example.com/repo',
+               '--messages', 'messages.log', '--config', 'caparg.cfg']
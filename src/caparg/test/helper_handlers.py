@@ -0,0 +1,10 @@
+"""
+Handlers of subcommands, imported by path when they are dispatched.
+"""
+
+
+def eat(parsed):
+    """
+    Handle :code:`eat`
+    """
+    return 'eating ' + parsed['what']
@@ -0,0 +1,183 @@
+"""
+Testing compiled parser tables cached on disk.
+"""
+from typing import List
+import marshal
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+import caparg
+from caparg import _cache
+
+
+def _make_command(**kwargs):
+    command = caparg.command
+    option = caparg.option
+    return command('',
+                   caparg.options(where=option(type=str)),
+                   command('eat',
+                           caparg.positional('what', type=str),
+                           command('lunch',
+                                   sides=option(type=List[str],
+                                                have_default=True))),
+                   caparg.lazy('tool',
+                               'caparg.test.helper_subcommands:PARSER'),
+                   **kwargs)
+
+
+class CacheTester(unittest.TestCase):
+
+    """
+    Tests for caching compiled parser tables
+    """
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.path = os.path.join(self.directory, 'parser.cache')
+
+    def _read(self):
+        with open(self.path, 'rb') as fpin:
+            return fpin.read()
+
+    def test_round_trip(self):
+        """
+        A parser loaded from the cache parses like the original
+        """
+        command = _make_command()
+        _cache.compile_cached(command, self.path)
+        data = self._read()
+        parser = _cache.compile_cached(_make_command(), self.path)
+        self.assertEqual(self._read(), data)
+        for args in [['eat', 'lunch', 'rice', '--where', 'home'],
+                     ['tool', 'remote', 'add', 'a', 'b',
+                      '--messages', 'm', '--config', 'c']]:
+            self.assertEqual(parser.parse_args(args), command.parse(args))
+        with self.assertRaises(caparg.ParseError):
+            parser.parse_args(['drink'])
+
+    @unittest.skipIf(sys.version_info < (3, 9), "needs PEP 585 generics")
+    def test_builtin_generics(self):
+        """
+        Options typed with builtin generics, like list[str], round trip
+        """
+        def make():
+            return caparg.command('', caparg.command(
+                'eat',
+                sides=caparg.option(type=list[str], have_default=True),
+                env=caparg.option(type=dict[str, str], have_default=True)))
+        command = make()
+        _cache.compile_cached(command, self.path)
+        parser = _cache.compile_cached(make(), self.path)
+        args = ['eat', '--sides', 'rice', '--sides', 'beans',
+                '--env', 'a=b']
+        self.assertEqual(parser.parse_args(args), command.parse(args))
+
+    def test_stale(self):
+        """
+        A cache of a different command is rebuilt
+        """
+        _cache.compile_cached(_make_command(), self.path)
+        data = self._read()
+        command = _make_command(_engine='native')
+        parser = _cache.compile_cached(command, self.path)
+        self.assertNotEqual(self._read(), data)
+        self.assertEqual(parser.parse_args(['eat', 'rice'])['what'], 'rice')
+
+    def test_corrupt(self):
+        """
+        A corrupt cache is rebuilt
+        """
+        with open(self.path, 'wb') as fpout:
+            fpout.write(b'\x00garbage')
+        parser = _cache.compile_cached(_make_command(), self.path)
+        self.assertEqual(parser.parse_args(['eat', 'rice'])['what'], 'rice')
+        self.assertNotEqual(self._read(), b'\x00garbage')
+
+    def test_other_format(self):
+        """
+        A cache in another format is rebuilt
+        """
+        with open(self.path, 'wb') as fpout:
+            fpout.write(marshal.dumps((0,)))
+        _cache.compile_cached(_make_command(), self.path)
+        self.assertNotEqual(self._read(), marshal.dumps((0,)))
+
+    def test_lazy_function(self):
+        """
+        Commands with lazy subcommands loaded by functions are not cached
+        """
+        command = caparg.command('', caparg.lazy('eat', _make_command))
+        parser = _cache.compile_cached(command, self.path)
+        self.assertFalse(os.path.exists(self.path))
+        parsed = parser.parse_args(['eat', 'eat', 'rice'])
+        self.assertEqual(parsed['what'], 'rice')
+
+    def test_unwritable(self):
+        """
+        Failing to write the cache is not an error
+        """
+        path = os.path.join(self.directory, 'missing', 'parser.cache')
+        parser = _cache.compile_cached(_make_command(), path)
+        self.assertEqual(parser.parse_args(['eat', 'rice'])['what'], 'rice')
+
+    def test_compile_cached(self):
+        """
+        Commands compile through a cache file, memoized
+        """
+        command = caparg.command('', caparg.command('eat'))
+        parser = command.compile_cached(self.path)
+        self.assertTrue(os.path.exists(self.path))
+        self.assertIs(command.compile(), parser)
+
+    def test_load_cached(self):
+        """
+        While the sources are unchanged, the command is not built
+        """
+        source = os.path.join(self.directory, 'source.py')
+        with open(source, 'w') as fpout:
+            fpout.write('# declarations\n')
+        built = []
+
+        def build():
+            built.append(True)
+            return _make_command()
+
+        parser = caparg.load_cached(self.path, build, sources=[source])
+        self.assertEqual(parser.parse_args(['eat', 'rice'])['what'], 'rice')
+        self.assertEqual(len(built), 1)
+        parser = caparg.load_cached(self.path, build, sources=[source])
+        self.assertEqual(parser.parse_args(['eat', 'rice'])['what'], 'rice')
+        self.assertEqual(len(built), 1)
+        with open(source, 'a') as fpout:
+            fpout.write('# same command\n')
+        caparg.load_cached(self.path, build, sources=[source])
+        self.assertEqual(len(built), 2)
+        caparg.load_cached(self.path, build, sources=[source])
+        self.assertEqual(len(built), 2)
+
+    def test_load_cached_default_sources(self):
+        """
+        By default, the source is the module defining the build function
+        """
+        parser = caparg.load_cached(self.path, _make_command)
+        parser = caparg.load_cached(self.path, _make_command)
+        self.assertEqual(parser.parse_args(['eat', 'rice'])['what'], 'rice')
+
+    def test_load_cached_missing_source(self):
+        """
+        Missing sources mean the command is always built
+        """
+        source = os.path.join(self.directory, 'source.py')
+        built = []
+
+        def build():
+            built.append(True)
+            return _make_command()
+
+        caparg.load_cached(self.path, build, sources=[source])
+        caparg.load_cached(self.path, build, sources=[source])
+        self.assertEqual(len(built), 2)
@@ -0,0 +1,113 @@
+"""
+Testing that the code-generating engine agrees with the native engine.
+"""
+import random
+import unittest
+
+import caparg
+from caparg.test import test_native
+
+_EXTRA_COMMAND_LINES = [
+    ['eat', '--help'],
+    ['eat', '-h'],
+    ['eat', '--alot', '--help'],
+    ['drink', 'water', '--size', 'large', '--nam', 'x'],
+    ['drink', 'water', '--size', 'large', '--size', 'small'],
+    ['remote', 'add', '--', 'origin', 'url'],
+]
+
+# Tokens which random command lines are made of
+_TOKENS = ['--', '-', '-1', '-x', '-h', '--alot', '--alot=1', '--what',
+           '--what=', '--wh', '--how', '--count', '--ids', '--env',
+           '--where', '--size', '--name', '--na', '--names', 'a=b', 'rice',
+           '3', 'x', 'water']
+
+
+def _outcome(command, args):
+    try:
+        return dict(command.parse(args))
+    except caparg.ParseError as exc:
+        return exc.message
+
+
+class CodegenTester(unittest.TestCase):
+
+    """
+    The generated parse functions parse like the native engine
+    """
+
+    def setUp(self):
+        self.native = test_native._make_command('native')
+        self.codegen = test_native._make_command('codegen')
+
+    def assert_same(self, args):
+        """
+        Both engines give the same result, or the same error message
+        """
+        self.assertEqual(_outcome(self.codegen, args),
+                         _outcome(self.native, args), args)
+
+    def test_command_lines(self):
+        """
+        Both engines agree on hand-picked command lines
+        """
+        for args in test_native._COMMAND_LINES + _EXTRA_COMMAND_LINES:
+            self.assert_same(args)
+
+    def test_random_command_lines(self):
+        """
+        Both engines agree on random command lines
+        """
+        chooser = random.Random(0)
+        for _ in range(2000):
+            args = [chooser.choice(['eat', 'drink', 'remote add'])]
+            args = args[0].split()
+            args.extend(chooser.choice(_TOKENS)
+                        for _ in range(chooser.randrange(6)))
+            self.assert_same(args)
+
+    def test_quoted_names(self):
+        """
+        Option names which need quoting in Python source parse the same
+        """
+        def make(engine):
+            return caparg.command(
+                '',
+                caparg.command('say', **{
+                    'quote"it': caparg.option(type=bool),
+                    "it's{}": caparg.option(type=str, required=True)}),
+                _engine=engine)
+        native, codegen = make('native'), make('codegen')
+        for args in (['say', '--quote"it=x'],
+                     ['say', '--quote"it', "--it's{}", 'x'],
+                     ['say', "--it's{}"],
+                     ['say']):
+            self.assertEqual(_outcome(codegen, args), _outcome(native, args),
+                             args)
+
+    def test_source(self):
+        """
+        The generated source inlines option strings and required checks
+        """
+        node = self.codegen.compile()._trie.longest_match(['drink'])
+        parser = self.codegen.compile().subcommand_parser(node)
+        self.assertIn("elif token == '--size':", parser.source)
+        self.assertIn("missing.append('--size')", parser.source)
+
+    def test_code_shared(self):
+        """
+        Equal subcommands share their compiled code
+        """
+        def make(other):
+            return caparg.command(
+                '',
+                caparg.command('remote add',
+                               caparg.positional('name', type=str)),
+                caparg.command(other),
+                _engine='codegen').compile()
+        first_parser, second_parser = [
+            parser.subcommand_parser(
+                parser._trie.longest_match(['remote', 'add']))
+            for parser in (make('fetch'), make('push'))]
+        self.assertIs(first_parser.parse.__code__,
+                      second_parser.parse.__code__)
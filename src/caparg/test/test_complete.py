@@ -0,0 +1,136 @@
+"""
+Testing shell completion.
+"""
+import io
+import os
+import shutil
+import subprocess
+import tempfile
+import unittest
+
+import caparg
+from caparg import _complete
+from caparg.test import helper_subcommands
+
+
+class CompleteTester(unittest.TestCase):
+
+    """
+    Completion tests
+    """
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.index = os.path.join(self.directory, 'index.json')
+
+    def test_subcommands(self):
+        """
+        Subcommand words are completed by prefix, at any depth
+        """
+        command = helper_subcommands.PARSER
+        self.assertEqual(command.complete(['re']).words,
+                         ['remote', 'remove', 'restart', 'restart-all'])
+        self.assertEqual(command.complete(['remote', '']).words,
+                         ['add', 'remove'])
+        self.assertEqual(command.complete(['nothing', '']).words, [])
+
+    def test_options(self):
+        """
+        Option strings are completed, including inherited ones
+        """
+        command = helper_subcommands.PARSER
+        self.assertEqual(command.complete(['remove', '--']).options,
+                         ['--config', '--messages', '--name'])
+        self.assertEqual(command.complete(['remote', 'remove', '--v']),
+                         _complete.Completion([], ['--verbose'], None))
+        self.assertEqual(command.complete(['remove', '--name', '']),
+                         _complete.Completion([], [], None))
+
+    def test_positional(self):
+        """
+        The positional being completed is named
+        """
+        command = helper_subcommands.PARSER
+        self.assertEqual(command.complete(['remote', 'add', '']).positional,
+                         'name')
+        self.assertEqual(command.complete(['remote', 'add', '--config',
+                                           'c', 'origin', '']).positional,
+                         'url')
+        self.assertEqual(command.complete(['remote', 'add', '--', '-o',
+                                           '']).positional,
+                         'url')
+        self.assertIsNone(command.complete(['remote', 'add', 'a', 'b',
+                                            '']).positional)
+
+    def test_lazy(self):
+        """
+        Completing into a lazy subcommand loads it
+        """
+        command = caparg.command(
+            '',
+            caparg.lazy('tool', 'caparg.test.helper_subcommands:PARSER'))
+        self.assertEqual(command.complete(['']).words, ['tool'])
+        self.assertEqual(command.complete(['tool', 'remote', '']).words,
+                         ['add', 'remove'])
+
+    def test_index_file(self):
+        """
+        Completion from the saved index agrees with completion in process
+        """
+        command = helper_subcommands.PARSER
+        command.completion_script('bash', 'tool', self.index)
+        for words in [['re'], ['remote', 'remove', '--'], ['add', '--c']]:
+            stdout = io.StringIO()
+            _complete.main([self.index] + words, stdout)
+            completion = command.complete(words)
+            self.assertEqual(stdout.getvalue().splitlines(),
+                             completion.words + completion.options)
+
+    def test_index_cached(self):
+        """
+        The index is only written again for a different command
+        """
+        command = helper_subcommands.PARSER
+        command.completion_script('zsh', 'tool', self.index)
+        modified = os.stat(self.index).st_mtime_ns
+        command.completion_script('zsh', 'tool', self.index)
+        self.assertEqual(os.stat(self.index).st_mtime_ns, modified)
+        caparg.command('', caparg.command('other')).completion_script(
+            'zsh', 'tool', self.index)
+        stdout = io.StringIO()
+        _complete.main([self.index, 'o'], stdout)
+        self.assertEqual(stdout.getvalue(), 'other\n')
+
+    def test_broken_index(self):
+        """
+        A missing or unknown index completes nothing
+        """
+        stdout = io.StringIO()
+        _complete.main([self.index, ''], stdout)
+        with open(self.index, 'w') as fpout:
+            fpout.write('{"format": 0}')
+        _complete.main([self.index, ''], stdout)
+        self.assertEqual(stdout.getvalue(), '')
+
+    def test_unknown_shell(self):
+        """
+        Asking for a script for an unknown shell raises ValueError
+        """
+        with self.assertRaises(ValueError):
+            helper_subcommands.PARSER.completion_script('fish', 'tool',
+                                                        self.index)
+
+    @unittest.skipIf(shutil.which('bash') is None, "bash is not installed")
+    def test_bash(self):
+        """
+        The bash script completes from the index
+        """
+        script = helper_subcommands.PARSER.completion_script(
+            'bash', 'tool', self.index)
+        output = subprocess.check_output(
+            ['bash', '-c', script + '\n'
+             'COMP_WORDS=(tool remote r); COMP_CWORD=2\n'
+             '_caparg_complete_tool\n'
+             'printf "%s\\n" "${COMPREPLY[@]}"\n'])
+        self.assertEqual(output.decode('ascii').split(), ['remove'])
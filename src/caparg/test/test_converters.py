@@ -0,0 +1,202 @@
+"""
+Testing converting option values to their types.
+"""
+from typing import Dict, List
+import array
+import enum
+import pathlib
+import unittest
+from unittest import mock
+
+import caparg
+from caparg import _converters
+
+try:
+    import numpy
+except ImportError:  # pragma: no cover
+    numpy = None
+
+# Stubs standing in for NumPy, with no arrays, do not count
+_HAVE_NUMPY = getattr(numpy, 'ndarray', None) is not None
+
+# Strings on which int() and float() can disagree with NumPy
+_NUMBERS = [' 12', '\t7\n', '1_000', '\u0661\u0662', '\uff11\uff12',
+            '+5', '-0', '0012', '99999999999999999999', '1.5', '1e3',
+            '-inf', '0x10', '', '  ', '_1', '1__0', 'True', '1,5']
+
+
+class Color(enum.Enum):
+
+    """
+    Colors, for enum options
+    """
+
+    red = 'r'
+    green = 'g'
+
+
+def _parse(args, engine='argparse', **kwargs):
+    return caparg.command('', caparg.command('run', **kwargs),
+                          _engine=engine).parse(['run'] + args)
+
+
+class ConverterTester(unittest.TestCase):
+
+    """
+    Option and positional conversion tests
+    """
+
+    def test_int(self):
+        """
+        Integer options are converted
+        """
+        for engine in ['argparse', 'native']:
+            parsed = _parse(['--uid', '5'], engine,
+                            uid=caparg.option(type=int))
+            self.assertEqual(parsed['uid'], 5)
+
+    def test_float_default(self):
+        """
+        Numeric options with a default are zero when missing
+        """
+        parsed = _parse([], ratio=caparg.option(type=float,
+                                                have_default=True))
+        self.assertEqual(parsed['ratio'], 0.0)
+
+    def test_invalid(self):
+        """
+        An invalid value raises ParseError naming the option
+        """
+        for engine in ['argparse', 'native']:
+            with self.assertRaises(caparg.ParseError) as context:
+                _parse(['--uid', 'root'], engine,
+                       uid=caparg.option(type=int))
+            self.assertEqual(context.exception.message,
+                             "argument --uid: invalid int value: 'root'")
+
+    def test_list_int(self):
+        """
+        Integer lists are converted in one pass into an array
+        """
+        args = []
+        for number in range(5000):
+            args.extend(['--ids', str(number)])
+        parsed = _parse(args, 'native', ids=caparg.option(type=List[int]))
+        self.assertIsInstance(parsed['ids'], array.array)
+        self.assertEqual(list(parsed['ids']), list(range(5000)))
+
+    def test_list_int_invalid(self):
+        """
+        An invalid value in a list is reported by itself
+        """
+        with self.assertRaises(caparg.ParseError) as context:
+            _parse(['--ids', '1', '--ids', 'two', '--ids', '3'],
+                   ids=caparg.option(type=List[int]))
+        self.assertIn("'two'", context.exception.message)
+
+    def test_list_int_huge(self):
+        """
+        Integers too big for an array are still converted
+        """
+        parsed = _parse(['--ids', '1', '--ids', str(2 ** 70)],
+                        ids=caparg.option(type=List[int]))
+        self.assertEqual(list(parsed['ids']), [1, 2 ** 70])
+
+    @unittest.skipUnless(_HAVE_NUMPY, "NumPy is not installed")
+    def test_numpy_same(self):  # pragma: no cover
+        """
+        Converting long lists with NumPy accepts and rejects what
+        converting them one at a time does
+        """
+        def outcome(conversion, texts):
+            try:
+                converted = conversion.convert(texts, '--values')
+            except caparg.ParseError as exc:
+                return exc.message
+            return type(converted), list(converted)
+
+        size = _converters._NUMPY_THRESHOLD
+        for type_ in (int, float):
+            conversion = _converters.for_type(List[type_])
+            for text in _NUMBERS:
+                for texts in ([text] * size, ['1'] * size + [text]):
+                    with_numpy = outcome(conversion, texts)
+                    with mock.patch.object(_converters, '_NUMPY', [None]):
+                        without_numpy = outcome(conversion, texts)
+                    self.assertEqual(with_numpy, without_numpy,
+                                     (type_, text))
+
+    def test_list_float(self):
+        """
+        Float lists are converted too
+        """
+        parsed = _parse(['--ratios', '0.5', '--ratios', '2'], 'native',
+                        ratios=caparg.option(type=List[float]))
+        self.assertEqual(list(parsed['ratios']), [0.5, 2.0])
+
+    def test_dict(self):
+        """
+        Dictionary options collect KEY=VALUE pairs
+        """
+        parsed = _parse(['--env', 'HOME=/', '--env', 'EMPTY='],
+                        env=caparg.option(type=Dict[str, str]))
+        self.assertEqual(parsed['env'], dict(HOME='/', EMPTY=''))
+        parsed = _parse([], env=caparg.option(type=Dict[str, str],
+                                              have_default=True))
+        self.assertEqual(dict(parsed['env']), {})
+
+    def test_dict_invalid(self):
+        """
+        Dictionary values without an equal sign are invalid
+        """
+        with self.assertRaises(caparg.ParseError) as context:
+            _parse(['--env', 'HOME'], env=caparg.option(type=Dict[str, int]))
+        self.assertIn('KEY=VALUE', context.exception.message)
+
+    def test_enum(self):
+        """
+        Enum options take a member's name or value
+        """
+        option = caparg.option(type=Color)
+        self.assertIs(_parse(['--color', 'red'], color=option)['color'],
+                      Color.red)
+        self.assertIs(_parse(['--color', 'g'], color=option)['color'],
+                      Color.green)
+        with self.assertRaises(caparg.ParseError):
+            _parse(['--color', 'blue'], color=option)
+
+    def test_path_positional(self):
+        """
+        Positionals are converted too
+        """
+        for engine in ['argparse', 'native']:
+            parsed = caparg.command(
+                '',
+                caparg.command('cat',
+                               caparg.positional('path',
+                                                 type=pathlib.Path)),
+                _engine=engine).parse(['cat', '/etc/passwd'])
+            self.assertEqual(parsed['path'], pathlib.Path('/etc/passwd'))
+
+    def test_register(self):
+        """
+        Registered converters are used for their type
+        """
+        class Celsius(float):
+            """
+            A temperature
+            """
+        caparg.register_converter(Celsius,
+                                  lambda text: Celsius(text.rstrip('C')))
+        parsed = _parse(['--heat', '40C', '--heats', '1C', '--heats', '2'],
+                        heat=caparg.option(type=Celsius),
+                        heats=caparg.option(type=List[Celsius]))
+        self.assertEqual(parsed['heat'], Celsius(40))
+        self.assertEqual(parsed['heats'], [1.0, 2.0])
+
+    def test_unknown_type(self):
+        """
+        Options of types without a converter cannot be parsed
+        """
+        with self.assertRaises(NotImplementedError):
+            _parse([], thing=caparg.option(type=complex))
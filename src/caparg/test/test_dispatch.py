@@ -0,0 +1,97 @@
+"""
+Testing dispatching subcommands to their handlers.
+"""
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+import caparg
+
+_HANDLERS = 'caparg.test.helper_handlers'
+
+
+def _drink(parsed):
+    return 'drinking ' + parsed['what']
+
+
+def _make_command():
+    command = caparg.command
+    positional = caparg.positional
+    return command('',
+                   command('eat', positional('what', type=str),
+                           _handler=_HANDLERS + ':eat'),
+                   command('drink', positional('what', type=str),
+                           _handler=_drink),
+                   command('sleep'),
+                   caparg.lazy('tool', lambda: command(
+                       '', command('run', _handler=lambda parsed: 'ran'))))
+
+
+class DispatchTester(unittest.TestCase):
+
+    """
+    Tests for subcommand handlers
+    """
+
+    def setUp(self):
+        sys.modules.pop(_HANDLERS, None)
+
+    def test_dispatch(self):
+        """
+        The parsed map is passed to the subcommand's handler
+        """
+        command = _make_command()
+        self.assertEqual(command.dispatch(['drink', 'water']),
+                         'drinking water')
+        self.assertEqual(command.dispatch(['tool', 'run']), 'ran')
+
+    def test_lazy_import(self):
+        """
+        Handlers given by import path are imported when dispatched
+        """
+        parser = _make_command().compile()
+        parser.dispatch(['drink', 'water'])
+        self.assertNotIn(_HANDLERS, sys.modules)
+        self.assertEqual(parser.dispatch(['eat', 'rice']), 'eating rice')
+        self.assertIn(_HANDLERS, sys.modules)
+        self.assertIs(parser.handler(['eat']),
+                      sys.modules[_HANDLERS].eat)
+
+    def test_no_handler(self):
+        """
+        Dispatching a subcommand without a handler raises LookupError
+        """
+        parser = _make_command().compile()
+        with self.assertRaises(LookupError):
+            parser.dispatch(['sleep'])
+        with self.assertRaises(LookupError):
+            parser.handler(['tool'])
+        with self.assertRaises(LookupError):
+            parser.handler(['nap'])
+
+    def test_cached(self):
+        """
+        Handlers given by import path survive the cache file
+        """
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        path = os.path.join(directory, 'parser.cache')
+        command = caparg.command('', caparg.command(
+            'eat', caparg.positional('what', type=str),
+            _handler=_HANDLERS + ':eat'))
+        caparg.load_cached(path, lambda: command, sources=[__file__])
+        parser = caparg.load_cached(path, lambda: None, sources=[__file__])
+        self.assertEqual(parser.dispatch(['eat', 'rice']), 'eating rice')
+
+    def test_cached_function(self):
+        """
+        Commands with handlers given as functions are not cached
+        """
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        path = os.path.join(directory, 'parser.cache')
+        parser = _make_command().compile_cached(path)
+        self.assertFalse(os.path.exists(path))
+        self.assertEqual(parser.dispatch(['drink', 'tea']), 'drinking tea')
@@ -0,0 +1,56 @@
+"""
+Testing what importing caparg loads.
+"""
+import os
+import subprocess
+import sys
+import unittest
+
+import caparg
+
+_SCRIPT = """\
+import sys
+import caparg
+command = caparg.command('', caparg.command(
+    'run', verbose=caparg.option(type=bool)))
+print(' '.join(sorted(name for name in {heavy!r} if name in sys.modules)))
+command.parse(['run', '--verbose'])
+print(' '.join(sorted(name for name in {heavy!r} if name in sys.modules)))
+"""
+
+
+class ImportTester(unittest.TestCase):
+
+    """
+    Tests for deferred imports
+    """
+
+    def test_deferred(self):
+        """
+        Heavy modules are loaded when parsing, not when declaring
+        """
+        heavy = ('argparse', 'incremental', 'pyrsistent')
+        # The child imports the same caparg, even if it is not installed
+        path = os.path.dirname(os.path.dirname(caparg.__file__))
+        env = dict(os.environ, PYTHONPATH=path)
+        output = subprocess.check_output(
+            [sys.executable, '-c', _SCRIPT.format(heavy=heavy)],
+            env=env, universal_newlines=True)
+        declared, parsed = output.splitlines()
+        self.assertEqual(declared, '')
+        self.assertEqual(parsed, 'argparse pyrsistent')
+
+    def test_lazy_attributes(self):
+        """
+        Names loaded on first use are still available
+        """
+        self.assertIsInstance(caparg.__version__, str)
+        self.assertTrue(callable(caparg.register_converter))
+        self.assertIn('register_converter', vars(caparg))
+
+    def test_missing_attribute(self):
+        """
+        Unknown names are still missing
+        """
+        with self.assertRaises(AttributeError):
+            caparg.no_such_thing  # pylint: disable=pointless-statement
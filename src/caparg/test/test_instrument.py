@@ -0,0 +1,98 @@
+"""
+Testing instrumentation of parsing.
+"""
+import unittest
+
+import caparg
+
+
+def _make_command():
+    command = caparg.command
+    return command('',
+                   command('remote add',
+                           caparg.positional('name', type=str),
+                           verbose=caparg.option(type=bool)))
+
+
+class InstrumentTester(unittest.TestCase):
+
+    """
+    Tests for parse observers and timings
+    """
+
+    def setUp(self):
+        self.events = []
+        caparg.add_observer(self.events.append)
+        self.addCleanup(caparg.remove_observer, self.events.append)
+
+    def test_event(self):
+        """
+        Observers are told about the subcommand, tokens and phases
+        """
+        parsed = _make_command().parse(['remote', 'add', 'origin',
+                                        '--verbose'])
+        self.assertEqual(parsed['name'], 'origin')
+        [event] = self.events
+        self.assertEqual(event.subcommand, ('remote', 'add'))
+        self.assertEqual(event.tokens, 4)
+        self.assertEqual(sorted(event.phases),
+                         ['parse', 'prepare', 'resolve'])
+        self.assertIsNone(event.error)
+        self.assertIsInstance(event.allocated_blocks, int)
+
+    def test_result_cache(self):
+        """
+        Observers do not turn off the cache of results,
+        and only see the parses which miss it
+        """
+        command = caparg.command(
+            '', caparg.command('remote add',
+                               caparg.positional('name', type=str)),
+            _result_cache_size=10)
+        with caparg.collect_timings() as timings:
+            for _ in range(3):
+                command.parse(['remote', 'add', 'origin'])
+        stats = command.compile().result_cache_stats()
+        self.assertEqual((stats.hits, stats.misses), (2, 1))
+        self.assertEqual(timings.count, 1)
+
+    def test_error(self):
+        """
+        Observers are told about errors
+        """
+        with self.assertRaises(caparg.ParseError):
+            _make_command().parse(['remote', 'remove'])
+        [event] = self.events
+        self.assertIsNone(event.subcommand)
+        self.assertIsInstance(event.error, caparg.ParseError)
+        self.assertNotIn('prepare', event.phases)
+
+    def test_removed(self):
+        """
+        Removed observers are not told about parses
+        """
+        caparg.remove_observer(self.events.append)
+        self.addCleanup(caparg.add_observer, self.events.append)
+        _make_command().parse(['remote', 'add', 'origin'])
+        self.assertEqual(self.events, [])
+
+    def test_timings(self):
+        """
+        Timings aggregate parses in a block
+        """
+        command = _make_command()
+        with caparg.collect_timings() as timings:
+            command.parse(['remote', 'add', 'origin'])
+            command.parse(['remote', 'add', 'upstream'])
+            with self.assertRaises(caparg.ParseError):
+                command.parse(['remote', 'add'])
+        command.parse(['remote', 'add', 'origin'])
+        self.assertEqual(timings.count, 3)
+        self.assertEqual(timings.errors, 1)
+        self.assertEqual(timings.tokens, 8)
+        self.assertEqual(timings.subcommands, {('remote', 'add'): 3})
+        self.assertEqual(sum(timings.histograms['parse'].values()), 3)
+        self.assertEqual(sum(timings.histograms['resolve'].values()), 3)
+        for bucket in timings.histograms['parse']:
+            self.assertEqual(bucket & (bucket - 1), 0)
+        self.assertGreater(timings.totals['resolve'], 0)
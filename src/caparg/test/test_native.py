@@ -0,0 +1,163 @@
+"""
+Testing that the native engine agrees with the argparse engine.
+"""
+from typing import Dict, List
+import unittest
+
+import caparg
+
+
+def _make_command(engine):
+    command = caparg.command
+    option = caparg.option
+    positional = caparg.positional
+    return command('',
+                   caparg.options(where=option(type=str)),
+                   command('eat',
+                           what=option(type=List[str]),
+                           alot=option(type=bool),
+                           how=option(type=str, have_default=True),
+                           count=option(type=int),
+                           ids=option(type=List[int]),
+                           env=option(type=Dict[str, str],
+                                      have_default=True)),
+                   command('drink',
+                           positional('what', type=str),
+                           size=option(type=str, required=True),
+                           name=option(type=str),
+                           names=option(type=List[str], have_default=True)),
+                   command('remote add',
+                           positional('name', type=str),
+                           positional('url', type=str)),
+                   _engine=engine)
+
+
+_COMMAND_LINES = [
+    [],
+    ['sleep'],
+    ['eat'],
+    ['eat', '--alot'],
+    ['eat', '--alot=yes'],
+    ['eat', '--al'],
+    ['eat', '--what', 'rice', '--what', 'beans'],
+    ['eat', '--what=rice', '--what='],
+    ['eat', '--what'],
+    ['eat', '--what', '--alot'],
+    ['eat', '--what', '--'],
+    ['eat', '--what', '-1'],
+    ['eat', '--what', '-'],
+    ['eat', '--what', '-x y'],
+    ['eat', '--wh', 'rice'],
+    ['eat', '--how', 'fast', '--how', 'slow'],
+    ['eat', '--where', 'cafe'],
+    ['eat', '--wher=cafe'],
+    ['eat', '--wh=cafe'],
+    ['eat', '--unknown'],
+    ['eat', '-x'],
+    ['eat', 'extra'],
+    ['eat', '--', '--alot'],
+    ['eat', '--count', '3'],
+    ['eat', '--count', 'three'],
+    ['eat', '--count', '-3'],
+    ['eat', '--ids', '1', '--ids', '2'],
+    ['eat', '--ids', '1', '--ids', 'x'],
+    ['eat', '--env', 'a=b', '--env', 'c=d=e'],
+    ['eat', '--env', 'a'],
+    ['eat', '--count', 'x', '--ids', 'y'],
+    ['eat', '--help'],
+    ['eat', '-h'],
+    ['eat', '--he'],
+    ['eat', '--alot', '--help'],
+    ['eat', 'extra', '-h'],
+    ['eat', '--what', '--help'],
+    ['eat', '--count', 'three', '--help'],
+    ['drink', '--help'],
+    ['drink', '--help=foo'],
+    ['drink', '--he='],
+    ['eat', '-hx'],
+    ['eat', '-h='],
+    ['eat', '-hx=y'],
+    ['eat', '--alot=it\'s'],
+    ['eat', '--'],
+    ['eat', 'x', '--', 'y'],
+    ['drink', '--name', 'x'],
+    ['drink', '--size', 'l', 'water', '--', 'x'],
+    ['drink', '--size', 'l', 'water', 'extra', '--'],
+    ['drink', 'water', '--size', 'l', '--', 'x'],
+    ['drink', '--size', 'l', '--', '--', 'x'],
+    ['drink', '--size', 'l', '--', 'water', '--', '--'],
+    ['remote', 'add', 'a', '--', 'b', '--'],
+    ['remote', 'add', '--', 'a', '--', 'b'],
+    ['drink', 'water', '--size', 'large', '-h'],
+    ['drink', 'water', '--size', 'large'],
+    ['drink', '--size', 'large', 'water'],
+    ['drink', '--size', 'large'],
+    ['drink', 'water'],
+    ['drink', '-1', '--size', 'large'],
+    ['drink', '--size', 'large', '--', '--water'],
+    ['drink', '--size', 'large', '--', 'water', '--'],
+    ['drink', 'water', 'juice', '--size', 'large'],
+    ['drink', '--size', 'large', '--na', 'x'],
+    ['drink', '--size', 'large', '--name', 'x', 'water'],
+    ['drink', 'water', '--size=', '--names', 'a', '--names', 'b'],
+    ['remote', 'add'],
+    ['remote', 'add', 'origin'],
+    ['remote', 'add', 'origin', 'https://example.com'],
+    ['remote', 'add', 'origin', '--', '-url'],
+    ['remote', 'add', 'origin', 'url', 'more'],
+]
+
+
+def _outcome(command, args):
+    try:
+        return dict(command.parse(args))
+    except caparg.ParseError as exc:
+        return exc.message
+
+
+class EquivalenceTester(unittest.TestCase):
+
+    """
+    The native engine parses like the argparse engine
+    """
+
+    def test_equivalence(self):
+        """
+        Both engines accept and reject the same command lines
+        """
+        argparse_command = _make_command('argparse')
+        native_command = _make_command('native')
+        for args in _COMMAND_LINES:
+            self.assertEqual(_outcome(native_command, args),
+                             _outcome(argparse_command, args),
+                             args)
+
+    def test_help(self):
+        """
+        Asking the native engine for help raises ParseError with usage
+        """
+        native_command = _make_command('native')
+        with self.assertRaises(caparg.ParseError) as context:
+            native_command.parse(['drink', '--help'])
+        self.assertIn('--size SIZE', context.exception.message)
+        self.assertIn('[--name NAME]', context.exception.message)
+        self.assertIn('what', context.exception.message)
+        with self.assertRaises(caparg.ParseError):
+            native_command.parse(['eat', '-h'])
+
+    def test_ambiguous(self):
+        """
+        An ambiguous option prefix raises ParseError
+        """
+        native_command = _make_command('native')
+        with self.assertRaises(caparg.ParseError) as context:
+            native_command.parse(['drink', 'water', '--size', 'large',
+                                  '--nam', 'x'])
+        self.assertIn('ambiguous', context.exception.message)
+
+    def test_unknown_engine(self):
+        """
+        Asking for an unknown engine raises ValueError
+        """
+        with self.assertRaises(ValueError):
+            caparg.command('', _engine='fast')
@@ -0,0 +1,153 @@
+"""
+Testing arguments from iterators and response files.
+"""
+from typing import List
+import io
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+import caparg
+from caparg import _response
+
+
+def _make_command(engine='argparse'):
+    command = caparg.command
+    return command('',
+                   command('eat',
+                           caparg.positional('meal', type=str),
+                           what=caparg.option(type=List[str])),
+                   command('remote add',
+                           caparg.positional('name', type=str)),
+                   _engine=engine,
+                   _response_files=True)
+
+
+class ResponseTester(unittest.TestCase):
+
+    """
+    Tests for iterators of arguments, and response files
+    """
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def _write(self, name, data):
+        path = os.path.join(self.directory, name)
+        with open(path, 'wb') as fpout:
+            fpout.write(data)
+        return path
+
+    def test_iterator(self):
+        """
+        Arguments can be any iterator
+        """
+        simple = caparg.command('',
+                                caparg.command('remote add',
+                                               caparg.positional('name',
+                                                                 type=str)))
+        parsed = simple.parse(iter(['remote', 'add', 'origin']))
+        self.assertEqual(list(parsed['__caparg_subcommand__']),
+                         ['remote', 'add'])
+        self.assertEqual(parsed['name'], 'origin')
+        with self.assertRaises(caparg.ParseError):
+            simple.parse(iter(['remote', 'origin']))
+
+    def test_newlines(self):
+        """
+        Response files without NUL characters are split on newlines
+        """
+        path = self._write('args', b'lunch\r\n--what\nrice\n--what\nbeans\n')
+        for engine in ['argparse', 'native']:
+            parsed = _make_command(engine).parse(['eat', '@' + path])
+            self.assertEqual(parsed['meal'], 'lunch')
+            self.assertEqual(parsed['what'], ['rice', 'beans'])
+
+    def test_nul(self):
+        """
+        Response files with NUL characters are split on them
+        """
+        path = self._write('args', b'remote\0add\0with\nnewline')
+        parsed = _make_command('native').parse(['@' + path])
+        self.assertEqual(list(parsed['__caparg_subcommand__']),
+                         ['remote', 'add'])
+        self.assertEqual(parsed['name'], 'with\nnewline')
+
+    def test_nested(self):
+        """
+        Response files can refer to other response files
+        """
+        inner = self._write('inner', b'--what\nrice\n')
+        outer = self._write('outer', b'eat\n@' + inner.encode('ascii') +
+                            b'\nlunch\n')
+        parsed = _make_command('native').parse(['@' + outer])
+        self.assertEqual(parsed['meal'], 'lunch')
+        self.assertEqual(parsed['what'], ['rice'])
+
+    def test_cycle(self):
+        """
+        Response files including themselves raise ParseError
+        """
+        first = os.path.join(self.directory, 'first')
+        second = self._write('second', b'--what\nrice\n@' +
+                             first.encode('ascii'))
+        self._write('first', b'eat\n@' + second.encode('ascii'))
+        for engine in ['argparse', 'native']:
+            with self.assertRaises(caparg.ParseError) as context:
+                _make_command(engine).parse(['@' + first])
+            self.assertEqual(context.exception.message,
+                             'response file includes itself: ' + first)
+        twice = self._write('twice', b'eat\n@' + second.encode('ascii') +
+                            b'\n@' + second.encode('ascii'))
+        self._write('second', b'--what\nrice\n')
+        parsed = _make_command().parse(['@' + twice, 'lunch'])
+        self.assertEqual(parsed['what'], ['rice', 'rice'])
+
+    def test_empty(self):
+        """
+        Empty response files have no arguments
+        """
+        path = self._write('args', b'')
+        parsed = _make_command().parse(['eat', '@' + path, 'lunch'])
+        self.assertEqual(parsed['meal'], 'lunch')
+
+    def test_missing(self):
+        """
+        Missing response files raise ParseError
+        """
+        path = os.path.join(self.directory, 'missing')
+        with self.assertRaises(caparg.ParseError):
+            _make_command().parse(['eat', '@' + path])
+
+    def test_not_enabled(self):
+        """
+        Without response files, @ is not special
+        """
+        simple = caparg.command('',
+                                caparg.command('eat',
+                                               caparg.positional('meal',
+                                                                 type=str)))
+        parsed = simple.parse(['eat', '@lunch'])
+        self.assertEqual(parsed['meal'], '@lunch')
+
+    def test_stdin(self):
+        """
+        Response file - is standard input
+        """
+        stdin = io.BytesIO(b'lunch\n--what\nrice')
+        self.addCleanup(setattr, sys, 'stdin', sys.stdin)
+        sys.stdin = stdin
+        parsed = _make_command('native').parse(['eat', '@-'])
+        self.assertEqual(parsed['meal'], 'lunch')
+        self.assertEqual(parsed['what'], ['rice'])
+
+    def test_stream_blocks(self):
+        """
+        Streams are split correctly across blocks
+        """
+        stream = io.BytesIO(b'one\0two\0three\0')
+        self.assertEqual(list(_response._split_stream(stream, size=5)),
+                         ['one', 'two', 'three'])
@@ -0,0 +1,85 @@
+"""
+Testing parse results.
+"""
+from typing import List
+import pickle
+import unittest
+
+import caparg
+
+
+def _parse(args):
+    command = caparg.command
+    option = caparg.option
+    simple = command('',
+                     command('eat',
+                             what=option(type=List[str]),
+                             where=option(type=str),
+                             items=option(type=str),
+                             alot=option(type=bool)))
+    return simple.parse(args)
+
+
+class ResultTester(unittest.TestCase):
+
+    """
+    Tests for parse results
+    """
+
+    def test_mapping(self):
+        """
+        Results are mappings of the options that have values
+        """
+        parsed = _parse(['eat', '--where', 'cafe'])
+        self.assertEqual(sorted(parsed),
+                         ['__caparg_subcommand__', 'alot', 'where'])
+        self.assertEqual(len(parsed), 3)
+        self.assertIn('where', parsed)
+        self.assertNotIn('what', parsed)
+        self.assertNotIn('nothing', parsed)
+        self.assertEqual(parsed.get('what', 'nothing'), 'nothing')
+        self.assertEqual(parsed['where'], 'cafe')
+        with self.assertRaises(KeyError):
+            parsed['what']  # pylint: disable=pointless-statement
+        self.assertEqual(dict(parsed.items())['where'], 'cafe')
+        self.assertIn('cafe', list(parsed.values()))
+
+    def test_attributes(self):
+        """
+        Options can be read as attributes
+        """
+        parsed = _parse(['eat', '--where', 'cafe', '--items', 'many'])
+        self.assertEqual(parsed.where, 'cafe')
+        self.assertFalse(parsed.alot)
+        with self.assertRaises(AttributeError):
+            parsed.what  # pylint: disable=pointless-statement
+        # Mapping methods are not shadowed by options
+        self.assertEqual(parsed['items'], 'many')
+        self.assertEqual(len(list(parsed.items())), 4)
+
+    def test_equality(self):
+        """
+        Results are equal to mappings with the same items
+        """
+        parsed = _parse(['eat', '--where', 'cafe'])
+        self.assertEqual(parsed, _parse(['eat', '--where', 'cafe']))
+        self.assertEqual(parsed, dict(parsed))
+        self.assertNotEqual(parsed, _parse(['eat', '--where', 'home']))
+        self.assertFalse(parsed == 5)
+        self.assertTrue(parsed != 5)
+        self.assertEqual(hash(parsed), hash(_parse(['eat', '--where',
+                                                    'cafe'])))
+
+    def test_pickle(self):
+        """
+        Results survive pickling
+        """
+        parsed = _parse(['eat', '--what', 'rice'])
+        self.assertEqual(pickle.loads(pickle.dumps(parsed)), parsed)
+
+    def test_repr(self):
+        """
+        Results show their items
+        """
+        self.assertIn("where='cafe'", repr(_parse(['eat', '--where',
+                                                   'cafe'])))
@@ -0,0 +1,258 @@
+"""
+Testing the parse server and its client.
+"""
+from typing import List
+import array
+import concurrent.futures
+import io
+import os
+import pathlib
+import shutil
+import socket
+import struct
+import tempfile
+import threading
+import unittest
+
+import caparg
+from caparg import _client, _server
+from caparg.test.helper_subcommands import PARSER
+
+
+def _mirror(parsed):
+    return dict(mirrored=parsed['name'], ids=parsed['ids'])
+
+
+def _fail(_parsed):
+    raise RuntimeError("broken")
+
+
+def _make_command():
+    command = caparg.command
+    return command('', PARSER,
+                   command('mirror',
+                           caparg.positional('name', type=str),
+                           ids=caparg.option(type=List[int]),
+                           _handler=_mirror),
+                   command('fail', _handler=_fail))
+
+
+class ServerTester(unittest.TestCase):
+
+    """
+    Tests for answering requests on a Unix socket
+    """
+
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.path = os.path.join(directory, 'caparg.sock')
+        self.server = self.start(self.path)
+
+    def start(self, path, **settings):
+        """
+        Start a server in a thread, stopped at cleanup
+        """
+        settings.setdefault('workers', 3)
+        server = _make_command().server(path, **settings)
+        thread = threading.Thread(target=server.serve_forever,
+                                  args=(0.01,))
+        thread.start()
+        self.addCleanup(thread.join)
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        return server
+
+    def test_parse(self):
+        """
+        Parsed values come back as plain dicts and lists
+        """
+        parsed = _client.request(self.path, 'parse',
+                                 ['add', '--name', 'n', '--cmd', 'c',
+                                  '--messages', 'm', '--config', 'x'])
+        self.assertEqual(parsed['__caparg_subcommand__'], ['add'])
+        self.assertEqual(parsed['name'], 'n')
+        self.assertEqual(parsed['arg'], [])
+        self.assertEqual(parsed['env'], {})
+
+    def test_parse_error(self):
+        """
+        Invalid command lines raise RemoteError with the message
+        """
+        with self.assertRaises(_client.RemoteError) as context:
+            _client.request(self.path, 'parse', ['add'])
+        self.assertEqual(context.exception.kind, 'parse')
+        self.assertIn('required', context.exception.message)
+
+    def test_help(self):
+        """
+        Asking for help is a parse error, with the usage
+        """
+        with self.assertRaises(_client.RemoteError) as context:
+            _client.request(self.path, 'parse', ['mirror', '--help'])
+        self.assertEqual(context.exception.kind, 'parse')
+        self.assertIn('usage: mirror', context.exception.message)
+
+    def test_dispatch(self):
+        """
+        Handlers run in the server, and their results come back
+        """
+        self.assertEqual(_client.request(self.path, 'dispatch',
+                                         ['mirror', 'origin',
+                                          '--ids', '1', '--ids', '2']),
+                         dict(mirrored='origin', ids=[1, 2]))
+        with self.assertRaises(_client.RemoteError) as context:
+            _client.request(self.path, 'dispatch', ['fail'])
+        self.assertEqual(context.exception.kind, 'handler')
+        self.assertIn('broken', context.exception.message)
+
+    def test_bad_requests(self):
+        """
+        Malformed requests are answered with errors
+        """
+        with self.assertRaises(_client.RemoteError) as context:
+            _client.request(self.path, 'frobnicate', [])
+        self.assertEqual(context.exception.kind, 'request')
+        for message in ['parse', ('parse', 5)]:
+            with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+                sock.connect(self.path)
+                _client.send_message(sock, message)
+                self.assertEqual(_client.receive_message(sock)[0],
+                                 'request')
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.connect(self.path)
+            sock.sendall(struct.pack('!I', _client.MAX_MESSAGE + 1))
+            self.assertEqual(_client.receive_message(sock)[0], 'request')
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.connect(self.path)
+            sock.sendall(struct.pack('!I', 3) + b'\xff\xff\xff')
+            self.assertEqual(_client.receive_message(sock)[0], 'request')
+
+    def test_cut_short(self):
+        """
+        Messages cut short or empty are errors, and so are missing replies
+        """
+        first, second = socket.socketpair()
+        with first, second:
+            first.sendall(struct.pack('!I', 10) + b'abc')
+            first.shutdown(socket.SHUT_WR)
+            with self.assertRaises(ValueError):
+                _client.receive_message(second)
+        first, second = socket.socketpair()
+        with first, second:
+            first.sendall(struct.pack('!I', 0))
+            with self.assertRaises(ValueError):
+                _client.receive_message(second)
+        path = self.path + '.closing'
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as listener:
+            listener.bind(path)
+            listener.listen(1)
+
+            def close():
+                connection, _address = listener.accept()
+                with connection:
+                    _client.receive_message(connection)
+            thread = threading.Thread(target=close)
+            thread.start()
+            with self.assertRaises(_client.RemoteError) as context:
+                _client.request(path, 'parse', [])
+            thread.join()
+        self.assertIn('closed', context.exception.message)
+
+    def test_concurrent(self):
+        """
+        Many clients at once are all answered
+        """
+        def parse(index):
+            return _client.request(self.path, 'parse',
+                                   ['mirror', str(index)])['name']
+
+        with concurrent.futures.ThreadPoolExecutor(8) as executor:
+            names = list(executor.map(parse, range(50)))
+        self.assertEqual(names, [str(index) for index in range(50)])
+
+    def test_main(self):
+        """
+        The client script prints JSON, and exits 2 on invalid input
+        """
+        stdout, stderr = io.StringIO(), io.StringIO()
+        self.assertEqual(_client.main([self.path, 'parse', 'mirror', 'x',
+                                       '--ids', '1'], stdout, stderr), 0)
+        self.assertEqual(stdout.getvalue(),
+                         '{"__caparg_subcommand__": ["mirror"], '
+                         '"ids": [1], "name": "x"}\n')
+        self.assertEqual(_client.main([self.path, 'parse', 'nope'],
+                                      stdout, stderr), 2)
+        self.assertIn('unknown command: nope', stderr.getvalue())
+        self.assertEqual(_client.main([self.path, 'dispatch', 'fail'],
+                                      stdout, stderr), 1)
+        self.assertEqual(_client.main([self.path], stdout, stderr), 1)
+        self.assertEqual(_client.main([self.path + '.missing', 'parse'],
+                                      stdout, stderr), 1)
+        self.assertIn('cannot reach server', stderr.getvalue())
+
+    def test_idle(self):
+        """
+        Idle connections are closed, so they do not keep the workers
+        """
+        path = self.path + '.idle'
+        self.start(path, workers=1, idle_timeout=0.05)
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.connect(path)
+            parsed = _client.request(path, 'parse', ['mirror', 'x'],
+                                     timeout=3)
+            self.assertEqual(parsed['name'], 'x')
+            self.assertIsNone(_client.receive_message(sock))
+
+    def test_running(self):
+        """
+        A second server cannot take over the socket of a running one
+        """
+        with self.assertRaises(OSError):
+            _make_command().server(self.path)
+
+    def test_stale(self):
+        """
+        A socket left behind by a server which is gone is replaced
+        """
+        path = self.path + '.stale'
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.bind(path)
+        self.start(path)
+        parsed = _client.request(path, 'parse', ['mirror', 'x'])
+        self.assertEqual(parsed['name'], 'x')
+
+    def test_not_socket(self):
+        """
+        A path which is not a socket is not replaced
+        """
+        path = self.path + '.file'
+        with open(path, 'w'):
+            pass
+        with self.assertRaises(OSError):
+            _make_command().server(path)
+
+    def test_client_gone(self):
+        """
+        Clients leaving before their answer do not disturb the server
+        """
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.connect(self.path)
+            _client.send_message(sock, ('parse', ['mirror', 'x']))
+        self.assertEqual(
+            _client.request(self.path, 'parse', ['mirror', 'y'])['name'],
+            'y')
+
+    def test_socket_removed(self):
+        """
+        The server closes cleanly if its socket was removed
+        """
+        os.unlink(self.path)
+
+    def test_plain(self):
+        """
+        Values which marshal cannot dump are turned into plain ones
+        """
+        self.assertEqual(_server.plain({'paths': {pathlib.PurePath('a')},
+                                        'ids': array.array('q', [1])}),
+                         {'paths': ['a'], 'ids': [1]})
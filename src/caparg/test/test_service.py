@@ -0,0 +1,143 @@
+"""
+Testing the asyncio parsing service.
+"""
+import asyncio
+import threading
+import unittest
+
+import caparg
+
+
+def _make_command(loaded=None):
+    command = caparg.command
+    things = [command('eat', where=caparg.option(type=str, required=True)),
+              command('drink', caparg.positional('what', type=str)),
+              caparg.lazy('broken', 'caparg.test.no_such_module:COMMAND')]
+    if loaded is not None:
+        def load():
+            loaded.wait()
+            return command('slow')
+        things.append(caparg.lazy('slow', load))
+    return command('', *things)
+
+
+class ServiceTester(unittest.TestCase):
+
+    """
+    Asyncio parsing service tests
+    """
+
+    def test_concurrent(self):
+        """
+        Command lines from many coroutines are all parsed
+        """
+        command = _make_command()
+
+        async def run():
+            async with command.service(workers=2, batch_size=8) as service:
+                return await asyncio.gather(*[
+                    service.parse(['drink', str(index)])
+                    for index in range(100)])
+
+        results = asyncio.run(run())
+        self.assertEqual([result['what'] for result in results],
+                         [str(index) for index in range(100)])
+
+    def test_error(self):
+        """
+        Errors are raised for their own command line, not the whole batch
+        """
+        command = _make_command()
+
+        async def run():
+            async with command.service() as service:
+                return await asyncio.gather(service.parse(['eat']),
+                                            service.parse(['eat', '--help']),
+                                            service.parse(['broken']),
+                                            service.parse(['eat', '--where',
+                                                           'cafe']),
+                                            return_exceptions=True)
+
+        error, usage, broken, result = asyncio.run(run())
+        self.assertIsInstance(error, caparg.ParseError)
+        self.assertIsInstance(usage, caparg.ParseError)
+        self.assertIn('usage: eat', usage.message)
+        self.assertIsInstance(broken, ImportError)
+        self.assertEqual(result['where'], 'cafe')
+
+    def test_own_parsers(self):
+        """
+        Workers do not use the command's shared compiled parser
+        """
+        command = _make_command()
+
+        async def run():
+            async with command.service(workers=1) as service:
+                return await service.parse(['drink', 'water'])
+
+        asyncio.run(run())
+        self.assertEqual(len(command.compile()._parsers), 0)
+
+    def test_back_pressure(self):
+        """
+        Submitting waits while too many command lines are pending
+        """
+        loaded = threading.Event()
+        command = _make_command(loaded)
+
+        async def run():
+            async with command.service(workers=1,
+                                       max_pending=1) as service:
+                first = await service.submit(['slow'])
+                second = asyncio.ensure_future(service.submit(['eat']))
+                _done, waiting = await asyncio.wait([second], timeout=0.05)
+                self.assertEqual(waiting, {second})
+                loaded.set()
+                await first
+                with self.assertRaises(caparg.ParseError):
+                    await (await second)
+
+        asyncio.run(run())
+
+    def test_closed(self):
+        """
+        Parsing after the service is closed fails
+        """
+        command = _make_command()
+
+        async def run():
+            service = command.service()
+            await service.close()
+            with self.assertRaises(RuntimeError):
+                await service.parse(['drink', 'water'])
+
+        asyncio.run(run())
+
+    def test_close_pending(self):
+        """
+        Closing parses what was submitted, except what was cancelled
+        """
+        command = _make_command()
+
+        async def run():
+            service = command.service()
+            cancelled = await service.submit(['drink', 'tea'])
+            submitted = await service.submit(['drink', 'water'])
+            cancelled.cancel()
+            await service.close()
+            return await submitted
+
+        self.assertEqual(asyncio.run(run())['what'], 'water')
+
+    def test_processes(self):
+        """
+        Command lines can be parsed in worker processes
+        """
+        command = _make_command()
+
+        async def run():
+            async with command.service(workers=1,
+                                       processes=True) as service:
+                return await service.parse(['drink', 'water'])
+
+        self.assertEqual(asyncio.run(run())['what'], 'water')
@@ -0,0 +1,208 @@
+"""
+Testing option values from the environment and configuration files.
+"""
+from typing import Dict, List
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+import caparg
+from caparg import _sources
+
+_ENGINES = ('argparse', 'native', 'codegen')
+
+
+def _make_command(engine='argparse', **settings):
+    command = caparg.command
+    option = caparg.option
+    return command('',
+                   caparg.options(config=option(type=str, required=True)),
+                   command('remote add',
+                           caparg.positional('name', type=str),
+                           url=option(type=str, required=True),
+                           verbose=option(type=bool),
+                           retries=option(type=int, have_default=True),
+                           tags=option(type=List[str]),
+                           env=option(type=Dict[str, str])),
+                   _engine=engine, _env_prefix='CAPARG_TEST_', **settings)
+
+
+class SourcesTester(unittest.TestCase):
+
+    """
+    Tests for layered option values
+    """
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.clear_environment()
+        self.addCleanup(self.clear_environment)
+
+    def clear_environment(self):
+        """
+        Remove the test's environment variables
+        """
+        for name in list(os.environ):
+            if name.startswith('CAPARG_TEST_'):
+                del os.environ[name]
+
+    def write(self, name, content):
+        """
+        Write a configuration file
+
+        Returns:
+            its path
+        """
+        path = os.path.join(self.directory, name)
+        with open(path, 'w') as fpout:
+            fpout.write(content)
+        return path
+
+    def parse(self, args, **settings):
+        """
+        Parse with every engine, checking they agree
+
+        Returns:
+            the result, or the error message
+        """
+        outcomes = []
+        for engine in _ENGINES:
+            try:
+                outcomes.append(dict(_make_command(engine, **settings)
+                                     .parse(args)))
+            except caparg.ParseError as exc:
+                outcomes.append(exc.message)
+        for outcome in outcomes[1:]:
+            self.assertEqual(outcome, outcomes[0])
+        return outcomes[0]
+
+    def test_precedence(self):
+        """
+        The command line wins, then the environment, then the first file
+        """
+        first = self.write('first.json', json.dumps({
+            'remote add': {'url': 'first-section'},
+            'url': 'first-top', 'config': 'first'}))
+        second = self.write('second.toml',
+                            'config = "second"\nretries = 7\n'
+                            '["remote add"]\nurl = "second-section"\n')
+        files = dict(_config_files=[first, second])
+        parsed = self.parse(['remote', 'add', 'origin'], **files)
+        self.assertEqual((parsed['url'], parsed['config'],
+                          parsed['retries']),
+                         ('first-section', 'first', 7))
+        os.environ['CAPARG_TEST_URL'] = 'environment'
+        parsed = self.parse(['remote', 'add', 'origin'], **files)
+        self.assertEqual(parsed['url'], 'environment')
+        parsed = self.parse(['remote', 'add', 'origin', '--url', 'argv'],
+                            **files)
+        self.assertEqual(parsed['url'], 'argv')
+
+    def test_required_after_merge(self):
+        """
+        Required options are checked after the sources are merged
+        """
+        message = self.parse(['remote', 'add', 'origin'])
+        self.assertEqual(message, 'the following arguments are required: '
+                                  '--config, --url')
+        os.environ['CAPARG_TEST_CONFIG'] = 'c'
+        os.environ['CAPARG_TEST_URL'] = 'u'
+        parsed = self.parse(['remote', 'add', 'origin'])
+        self.assertEqual(parsed, {
+            '__caparg_subcommand__': ['remote', 'add'], 'name': 'origin',
+            'config': 'c', 'url': 'u', 'verbose': False, 'retries': 0})
+        message = self.parse(['remote', 'add'])
+        self.assertIn('required', message)
+
+    def test_types(self):
+        """
+        Booleans, lists and maps can come from strings or JSON values
+        """
+        os.environ['CAPARG_TEST_VERBOSE'] = 'yes'
+        os.environ['CAPARG_TEST_TAGS'] = 'a, b,,c'
+        path = self.write('tool.json', json.dumps({
+            'config': 'c', 'url': 'u', 'env': {'A': 1},
+            'retries': 3}))
+        parsed = self.parse(['remote', 'add', 'origin'],
+                            _config_files=[path])
+        self.assertEqual((parsed['verbose'], list(parsed['tags']),
+                          dict(parsed['env']), parsed['retries']),
+                         (True, ['a', 'b', 'c'], {'A': '1'}, 3))
+        os.environ['CAPARG_TEST_VERBOSE'] = 'off'
+        os.environ['CAPARG_TEST_TAGS'] = json.dumps(['x'])
+        path = self.write('list.json', json.dumps({
+            'config': 'c', 'url': 'u', 'verbose': True, 'tags': ['y', 2]}))
+        parsed = self.parse(['remote', 'add', 'origin'],
+                            _config_files=[path])
+        self.assertFalse(parsed['verbose'])
+        self.assertEqual(list(parsed['tags']), ['["x"]'])
+        self.clear_environment()
+        parsed = self.parse(['remote', 'add', 'origin'],
+                            _config_files=[path])
+        self.assertEqual(list(parsed['tags']), ['y', '2'])
+        self.assertTrue(parsed['verbose'])
+
+    def test_invalid(self):
+        """
+        Invalid values say where they are from
+        """
+        os.environ['CAPARG_TEST_CONFIG'] = 'c'
+        os.environ['CAPARG_TEST_URL'] = 'u'
+        os.environ['CAPARG_TEST_VERBOSE'] = 'maybe'
+        message = self.parse(['remote', 'add', 'origin'])
+        self.assertEqual(message, "argument --verbose: invalid bool value: "
+                                  "'maybe' (from CAPARG_TEST_VERBOSE)")
+        del os.environ['CAPARG_TEST_VERBOSE']
+        path = self.write('tool.ini', '[remote add]\nretries = many\n')
+        message = self.parse(['remote', 'add', 'origin'],
+                             _config_files=[path])
+        self.assertEqual(message, "argument --retries: invalid int value: "
+                                  "'many' (from retries in {})".format(path))
+
+    def test_ini(self):
+        """
+        INI files have a section per subcommand and defaults
+        """
+        path = self.write('tool.cfg', '[DEFAULT]\nconfig = c\nurl = top\n'
+                                      '[remote add]\nurl = section\n'
+                                      'verbose = true\n')
+        parsed = self.parse(['remote', 'add', 'origin'],
+                            _config_files=[path])
+        self.assertEqual((parsed['config'], parsed['url'],
+                          parsed['verbose']), ('c', 'section', True))
+
+    def test_bad_files(self):
+        """
+        Missing files are skipped, and broken ones are errors
+        """
+        os.environ['CAPARG_TEST_URL'] = 'u'
+        missing = os.path.join(self.directory, 'missing.json')
+        broken = self.write('broken.json', '{')
+        not_table = self.write('list.json', '[]')
+        for path in (broken, not_table):
+            message = self.parse(['remote', 'add', 'origin'],
+                                 _config_files=[missing, path])
+            self.assertTrue(message.startswith(
+                'cannot read configuration ' + path), message)
+
+    def test_file_cache(self):
+        """
+        Files are parsed again only when they change
+        """
+        path = self.write('tool.json', json.dumps({'config': 'c'}))
+        first = _sources.read(path)
+        self.assertIs(_sources.read(path), first)
+        self.write('tool.json', json.dumps({'config': 'changed'}))
+        self.assertEqual(_sources.read(path), {'config': 'changed'})
+
+    def test_no_result_cache(self):
+        """
+        Results are not cached when options can come from sources
+        """
+        os.environ['CAPARG_TEST_CONFIG'] = 'c'
+        parser = _make_command(_result_cache_size=10).compile()
+        parser.parse_args(['remote', 'add', 'origin', '--url', 'u'])
+        self.assertEqual(parser.result_cache_stats().size, 0)
@@ -2,9 +2,41 @@
 Testing for Captain Arguments' sub-commmands!
 """
 from typing import List
+import collections.abc
+import enum
+import pickle
+import threading
 import unittest
 
 import caparg
+from caparg.test import helper_subcommands
+
+
+class Color(enum.Enum):
+
+    """
+    Colors, which have no default
+    """
+
+    red = 'r'
+
+
+class _NoSlicing(collections.abc.Sequence):
+
+    """
+    A sequence which cannot be sliced, so cannot be copied in parts
+    """
+
+    def __init__(self, items):
+        self._items = items
+
+    def __len__(self):  # pragma: no cover
+        return len(self._items)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):  # pragma: no cover
+            raise AssertionError("sliced", index)
+        return self._items[index]
 
 
 class SubcommandTester(unittest.TestCase):
@@ -163,3 +195,482 @@ class SubcommandTester(unittest.TestCase):
                                              have_default=True)))
         parsed = simple.parse(['eat'])
         self.assertEqual(list(parsed['what']), [])
+
+    def test_compile_memoized(self):
+        """
+        Compiling a command twice returns the same parser
+        """
+        command = caparg.command
+        simple = command('',
+                         command('eat',
+                                 what=caparg.option(type=str)))
+        self.assertIs(simple.compile(), simple.compile())
+
+    def test_compile_reused(self):
+        """
+        A compiled parser can parse several command lines
+        """
+        command = caparg.command
+        simple = command('',
+                         command('eat',
+                                 what=caparg.option(type=List[str])))
+        parser = simple.compile()
+        first = parser.parse_args(['eat', '--what', 'rice'])
+        second = parser.parse_args(['eat', '--what', 'beans'])
+        self.assertEqual(first['what'], ['rice'])
+        self.assertEqual(second['what'], ['beans'])
+
+    def test_longest_subcommand(self):
+        """
+        The longest matching subcommand wins
+        """
+        command = caparg.command
+        simple = command('',
+                         command('remote',
+                                 caparg.positional('name', type=str)),
+                         command('remote add',
+                                 caparg.positional('name', type=str)))
+        parsed = simple.parse(['remote', 'add', 'origin'])
+        self.assertEqual(list(parsed['__caparg_subcommand__']),
+                         ['remote', 'add'])
+        self.assertEqual(parsed['name'], 'origin')
+        parsed = simple.parse(['remote', 'origin'])
+        self.assertEqual(list(parsed['__caparg_subcommand__']),
+                         ['remote'])
+        self.assertEqual(parsed['name'], 'origin')
+
+    def test_long_argv(self):
+        """
+        Long command lines are matched without looking past the subcommand
+        """
+        command = caparg.command
+        simple = command('',
+                         command('eat',
+                                 what=caparg.option(type=List[str])))
+        args = ['eat'] + ['--what', 'rice'] * 500
+        parsed = simple.parse(args)
+        self.assertEqual(len(parsed['what']), 500)
+
+    def test_argv_not_copied(self):
+        """
+        Sequences are parsed without slicing, and typos in tuples are shown
+        """
+        command = caparg.command
+        args = _NoSlicing(['eat'] + ['--what', 'rice'] * 500)
+        for engine in ('argparse', 'native'):
+            simple = command('',
+                             command('eat',
+                                     what=caparg.option(type=List[str])),
+                             _engine=engine)
+            parsed = simple.parse(args)
+            self.assertEqual(len(parsed['what']), 500)
+        with self.assertRaises(caparg.ParseError) as context:
+            simple.parse(('et', 'now'))
+        self.assertEqual(context.exception.message.splitlines()[:2],
+                         ['unknown command: et', 'did you mean: eat'])
+
+    def test_parse_many(self):
+        """
+        Parsing many command lines reports errors in place
+        """
+        command = caparg.command
+        simple = command('',
+                         command('eat',
+                                 what=caparg.option(type=str)))
+        results = list(simple.parse_many([['eat', '--what', 'rice'],
+                                          ['drink'],
+                                          ['eat', '-h'],
+                                          ['eat']]))
+        self.assertEqual(results[0]['what'], 'rice')
+        self.assertIsInstance(results[1], caparg.ParseError)
+        self.assertIsInstance(results[2], caparg.ParseError)
+        self.assertNotIn('what', results[3])
+
+    def test_parse_many_other_errors(self):
+        """
+        Parsing many command lines returns other errors in place too
+        """
+        command = caparg.command
+        simple = command('',
+                         command('eat'),
+                         caparg.lazy('broken',
+                                     'caparg.test.no_such_module:COMMAND'))
+        results = list(simple.parse_many([['broken'], ['eat']]))
+        self.assertIsInstance(results[0], ImportError)
+        self.assertEqual(results[1]['__caparg_subcommand__'], ['eat'])
+
+    def test_parse_many_processes(self):
+        """
+        Parsing many command lines in processes keeps their order
+        """
+        command = caparg.command
+        simple = command('',
+                         command('eat',
+                                 what=caparg.option(type=str)))
+        argvs = [['eat', '--what', str(i)] for i in range(10)] + [['drink']]
+        results = list(simple.parse_many(argvs, processes=2, chunksize=3))
+        self.assertEqual([result['what'] for result in results[:-1]],
+                         [str(i) for i in range(10)])
+        self.assertIsInstance(results[-1], caparg.ParseError)
+
+    def test_parse_error_pickle(self):
+        """
+        ParseError survives pickling
+        """
+        error = pickle.loads(pickle.dumps(caparg.ParseError('bad')))
+        self.assertEqual(error.message, 'bad')
+
+    def test_lazy_factory(self):
+        """
+        A lazy subcommand is loaded only when it is parsed
+        """
+        command = caparg.command
+        loaded = []
+
+        def load():
+            loaded.append(True)
+            return command('',
+                           caparg.command('lunch'),
+                           what=caparg.option(type=str))
+
+        simple = command('',
+                         caparg.options(where=caparg.option(type=str)),
+                         command('drink'),
+                         caparg.lazy('eat', load))
+        simple.parse(['drink'])
+        self.assertEqual(loaded, [])
+        parsed = dict(simple.parse(['eat', 'lunch', '--where', 'cafe']))
+        self.assertEqual(loaded, [True])
+        self.assertEqual(list(parsed.pop('__caparg_subcommand__')),
+                         ['eat', 'lunch'])
+        self.assertEqual(parsed, dict(where='cafe'))
+        parsed = simple.parse(['eat', '--what', 'rice'])
+        self.assertEqual(parsed['what'], 'rice')
+        self.assertEqual(loaded, [True])
+
+    def test_lazy_import(self):
+        """
+        A lazy subcommand can be given as an import path
+        """
+        simple = caparg.command(
+            '',
+            caparg.lazy('tool', 'caparg.test.helper_subcommands:PARSER'))
+        parsed = simple.parse(['tool', 'remote', 'add', 'origin', 'url',
+                               '--messages', 'm', '--config', 'c'])
+        self.assertEqual(list(parsed['__caparg_subcommand__']),
+                         ['tool', 'remote', 'add'])
+        self.assertEqual(parsed['url'], 'url')
+
+    def test_lazy_help(self):
+        """
+        Failing to parse lists lazy subcommands without loading them
+        """
+        simple = caparg.command('',
+                                caparg.lazy('eat', 'no.such.module:COMMAND'))
+        with self.assertRaises(caparg.ParseError) as context:
+            simple.parse(['drink'])
+        self.assertIn('eat', context.exception.message)
+
+    def test_inherit_order(self):
+        """
+        Inherited positionals come in order, from the top down
+        """
+        command = caparg.command
+        positional = caparg.positional
+        simple = command('',
+                         positional('first', type=str),
+                         command('eat',
+                                 positional('second', type=str),
+                                 command('lunch',
+                                         positional('third', type=str))))
+        parsed = simple.parse(['eat', 'lunch', '1', '2', '3'])
+        self.assertEqual([parsed['first'], parsed['second'], parsed['third']],
+                         ['1', '2', '3'])
+
+    def test_help_options(self):
+        """
+        Help lists every subcommand with its options
+        """
+        command = caparg.command
+        option = caparg.option
+        simple = command('',
+                         command('eat',
+                                 caparg.positional('what', type=str),
+                                 where=option(type=str, required=True)),
+                         command('drink',
+                                 caparg.options(alot=option(type=bool)),
+                                 cups=option(type=List[str])))
+        self.assertEqual(simple.compile().help().splitlines(), [
+            'Usage:',
+            '    drink [--alot] [--cups CUPS ...]',
+            '    eat what --where WHERE',
+        ])
+
+    def test_help_branch(self):
+        """
+        A typo in a subcommand only lists its branch
+        """
+        command = caparg.command
+        simple = command('',
+                         command('remote add'),
+                         command('remote remove'),
+                         command('restart'))
+        with self.assertRaises(caparg.ParseError) as context:
+            simple.parse(['remote', 'ad'])
+        self.assertEqual(context.exception.message.splitlines(), [
+            'unknown command: remote ad',
+            'did you mean: remote add',
+            'Usage:',
+            '    remote add',
+            '    remote remove',
+        ])
+
+    def test_child_typo(self):
+        """
+        A typo of a sub-subcommand, after a subcommand, gets a suggestion
+        """
+        parser = helper_subcommands.PARSER
+        common = ['--messages', 'm', '--config', 'c']
+        with self.assertRaises(caparg.ParseError) as context:
+            parser.parse(['remote', 'ad', 'x', 'y'] + common)
+        self.assertEqual(context.exception.message,
+                         'unrecognized arguments: ad x y\n'
+                         'did you mean: remote add')
+        with self.assertRaises(caparg.ParseError) as context:
+            parser.parse(['remote', 'xyz'] + common)
+        self.assertEqual(context.exception.message,
+                         'unrecognized arguments: xyz')
+        with self.assertRaises(caparg.ParseError) as context:
+            parser.parse(['remote', '--verbsoe'] + common)
+        self.assertNotIn('remote', context.exception.message)
+        with self.assertRaises(caparg.ParseError) as context:
+            parser.parse(['remote'])
+        self.assertNotIn('did you mean', context.exception.message)
+
+    def test_help_bounded(self):
+        """
+        Errors list a bounded number of subcommands
+        """
+        simple = caparg.command('', *[caparg.command('eat{}'.format(index))
+                                      for index in range(100)])
+        with self.assertRaises(caparg.ParseError) as context:
+            simple.parse(['eat1000'])
+        lines = context.exception.message.splitlines()
+        self.assertEqual(lines[:2], ['unknown command: eat1000',
+                                     'did you mean: eat10'])
+        self.assertLess(len(lines), 30)
+        self.assertEqual(lines[-1], '    ...')
+
+    def test_unknown_option(self):
+        """
+        Unknown options get suggestions, with either engine
+        """
+        for engine in ['argparse', 'native']:
+            simple = caparg.command(
+                '',
+                caparg.command('eat', verbose=caparg.option(type=bool),
+                               version=caparg.option(type=str)),
+                _engine=engine)
+            with self.assertRaises(caparg.ParseError) as context:
+                simple.parse(['eat', '--verbsoe', 'x'])
+            self.assertEqual(context.exception.message,
+                             'unrecognized arguments: --verbsoe x\n'
+                             'did you mean: --verbose')
+            with self.assertRaises(caparg.ParseError) as context:
+                simple.parse(['eat'] + ['x'] * 100)
+            self.assertEqual(context.exception.message,
+                             'unrecognized arguments: ' + 'x ' * 10 + '...')
+
+    def test_long_unknown(self):
+        """
+        Long unknown words are rejected without a search, and cut short
+        """
+        for engine in ['argparse', 'native']:
+            simple = caparg.command(
+                '',
+                caparg.command('eat', verbose=caparg.option(type=bool)),
+                _engine=engine)
+            word = 'x' * 100000
+            with self.assertRaises(caparg.ParseError) as context:
+                simple.parse([word])
+            self.assertEqual(context.exception.message.splitlines()[0],
+                             'unknown command: ' + 'x' * 60 + '...')
+            with self.assertRaises(caparg.ParseError) as context:
+                simple.parse(['eat', '--' + word])
+            self.assertEqual(context.exception.message,
+                             'unrecognized arguments: --' + 'x' * 58 + '...')
+
+    def test_help_lazy_loaded(self):
+        """
+        Help is rendered again after a lazy subcommand is loaded
+        """
+        simple = caparg.command(
+            '',
+            caparg.lazy('tool', 'caparg.test.helper_subcommands:PARSER'))
+        parser = simple.compile()
+        self.assertEqual(parser.help(), 'Usage:\n    tool\n')
+        self.assertEqual(parser.help(), 'Usage:\n    tool\n')
+        with self.assertRaises(caparg.ParseError):
+            parser.parse_args(['tool', 'nothing'])
+        self.assertIn('tool remote add', parser.help())
+
+    def test_validate(self):
+        """
+        Validating a tree returns the compiled parser
+        """
+        simple = caparg.command('',
+                                caparg.command('eat',
+                                               what=caparg.option(type=str),
+                                               alot=caparg.option(type=bool)))
+        parser = simple.validate()
+        self.assertIs(simple.validate(), parser)
+        self.assertIs(simple.compile(), parser)
+        self.assertEqual(parser.parse_args(['eat', '--what', 'rice'])['what'],
+                         'rice')
+
+    def test_validate_reentrant(self):
+        """
+        Lazy subcommands can compile commands while they are loaded
+        """
+        plugin = caparg.command('', caparg.command('run'))
+
+        def load():
+            plugin.validate()
+            plugin.compile()
+            return plugin
+
+        simple = caparg.command('', caparg.lazy('plugin', load))
+        results = []
+        thread = threading.Thread(target=lambda: results.append(
+            simple.validate()))
+        thread.daemon = True
+        thread.start()
+        thread.join(10)
+        self.assertEqual(results, [simple.compile()])
+        self.assertEqual(
+            list(results[0].parse_args(['plugin', 'run'])
+                 ['__caparg_subcommand__']), ['plugin', 'run'])
+
+    def test_validate_conflicts(self):
+        """
+        Validation reports every conflict in the tree
+        """
+        command = caparg.command
+        option = caparg.option
+        simple = command('',
+                         caparg.options(where=option(type=str)),
+                         command('remote',
+                                 command('add',
+                                         where=option(type=str))),
+                         command('remote add'),
+                         command('eat',
+                                 caparg.positional('what', type=str,
+                                                   have_default=True),
+                                 caparg.positional('all', type=List[str]),
+                                 size=option(type=complex),
+                                 color=option(type=Color,
+                                              have_default=True)),
+                         caparg.lazy('drink', lambda: command(
+                             'drink', where=option(type=str))))
+        with self.assertRaises(caparg.InvalidCommand) as context:
+            simple.validate()
+        self.assertEqual(sorted(context.exception.problems), sorted([
+            'remote add: duplicate name: where',
+            'duplicate subcommand: remote add',
+            'positional what: positionals cannot have defaults',
+            'positional all: positionals cannot collect values',
+            "option --size: no converter for <class 'complex'>",
+            "option --color: <enum 'Color'> has no default",
+            'drink: duplicate name: where',
+        ]))
+        self.assertIn('duplicate subcommand', str(context.exception))
+        error = pickle.loads(pickle.dumps(context.exception))
+        self.assertEqual(error.problems, context.exception.problems)
+
+    def test_validate_unknown_positional(self):
+        """
+        Positionals of types without a converter are reported
+        """
+        simple = caparg.command('',
+                                caparg.command('eat',
+                                               caparg.positional(
+                                                   'what', type=complex)))
+        with self.assertRaises(caparg.InvalidCommand) as context:
+            simple.validate()
+        self.assertEqual(context.exception.problems,
+                         ("positional what: no converter for "
+                          "<class 'complex'>",))
+
+    def test_parser_cache(self):
+        """
+        Prepared subcommand parsers are kept in a bounded LRU cache
+        """
+        command = caparg.command
+        simple = command('', command('eat'), command('drink'),
+                         command('sleep'), _parser_cache_size=2)
+        parser = simple.compile()
+        for args in [['eat'], ['drink'], ['eat'], ['sleep'], ['eat']]:
+            parser.parse_args(args)
+        stats = parser.parser_cache_stats()
+        self.assertEqual((stats.hits, stats.misses, stats.evictions,
+                          stats.size, stats.max_size),
+                         (2, 3, 1, 2, 2))
+        parser.parse_args(['drink'])
+        self.assertEqual(parser.parser_cache_stats().misses, 4)
+
+    def test_result_cache(self):
+        """
+        Results and errors of repeated command lines are cached
+        """
+        command = caparg.command
+        simple = command('', command('eat',
+                                     what=caparg.option(type=str)),
+                         _result_cache_size=2)
+        parser = simple.compile()
+        first = parser.parse_args(['eat', '--what', 'rice'])
+        self.assertIs(parser.parse_args(('eat', '--what', 'rice')), first)
+        for _ in range(2):
+            with self.assertRaises(caparg.ParseError) as context:
+                parser.parse_args(['sleep'])
+            self.assertIn('unknown command: sleep',
+                          context.exception.message)
+        parser.parse_args(['eat'])
+        stats = parser.result_cache_stats()
+        self.assertEqual((stats.hits, stats.misses, stats.evictions,
+                          stats.size, stats.max_size),
+                         (2, 3, 1, 2, 2))
+        self.assertEqual(stats.hit_rate, 0.4)
+        self.assertGreater(stats.size_bytes, 0)
+        self.assertIsNot(parser.parse_args(['eat', '--what', 'rice']),
+                         first)
+
+    def test_result_cache_bytes(self):
+        """
+        The result cache can be bounded by bytes
+        """
+        command = caparg.command
+        simple = command('', command('eat',
+                                     what=caparg.option(type=str)),
+                         _result_cache_size=None,
+                         _result_cache_bytes=1000)
+        parser = simple.compile()
+        self.assertEqual(parser.result_cache_stats().hit_rate, 0.0)
+        for index in range(100):
+            parser.parse_args(['eat', '--what', str(index)])
+        stats = parser.result_cache_stats()
+        self.assertLessEqual(stats.size_bytes, 1000)
+        self.assertGreater(stats.evictions, 0)
+        self.assertEqual(stats.size + stats.evictions, 100)
+
+    def test_result_cache_off(self):
+        """
+        Results are not cached by default, or with response files
+        """
+        command = caparg.command
+        for settings in [{}, dict(_result_cache_size=10,
+                                  _response_files=True)]:
+            simple = command('', command('eat'), **settings)
+            parser = simple.compile()
+            parser.parse_args(['eat'])
+            parser.parse_args(['eat'])
+            self.assertEqual(parser.result_cache_stats().size, 0)